@@ -0,0 +1,108 @@
+"""
+Benchmark of get_features_from_response on a synthetic multi-year archive pull.
+
+Compares the vectorized decoder with the previous pandas groupby
+implementation (kept below for reference) and checks that both return
+the same frame. The old decoder averaged in float32, the new one in float64,
+so a day whose mean falls on a rounding tie may differ by one unit of the
+last kept decimal.
+
+    python benchmarks/bench_decode.py --years 10
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "flood_forecasting_app"))
+
+from data_collection_utils import DAILY_COLUMNS, HOURLY_COLUMNS, get_features_from_response  # noqa: E402
+from meteo_encoding import decode_responses, encode_response  # noqa: E402
+
+
+def legacy_get_features_from_response(responses):
+    response = responses[0]
+
+    hourly = response.Hourly()
+    hourly_data = {"date": pd.date_range(
+        start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = hourly.Interval()),
+        inclusive = "left"
+    )}
+    for i, column in enumerate(HOURLY_COLUMNS):
+        hourly_data[column] = hourly.Variables(i).ValuesAsNumpy()
+    hourly_dataframe = pd.DataFrame(data = hourly_data)
+
+    daily = response.Daily()
+    daily_data = {"date": pd.date_range(
+        start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
+        end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
+        freq = pd.Timedelta(seconds = daily.Interval()),
+        inclusive = "left")}
+    for i, column in enumerate(DAILY_COLUMNS):
+        daily_data[column] = daily.Variables(i).ValuesAsNumpy()
+    daily_dataframe = pd.DataFrame(data = daily_data)
+
+    hourly_dataframe["date"] = pd.to_datetime(hourly_dataframe["date"])
+    hourly_dataframe["date"] = hourly_dataframe["date"].dt.date
+    daily_avg = hourly_dataframe.groupby("date").mean(numeric_only=True).reset_index()
+    for column, decimals in HOURLY_COLUMNS.items():
+        daily_avg[column] = daily_avg[column].round(decimals)
+
+    daily_dataframe["date"] = pd.to_datetime(pd.to_datetime(daily_dataframe["date"]))
+    daily_dataframe["date"] = daily_dataframe["date"].dt.date
+    return daily_dataframe.merge(daily_avg, on="date")
+
+
+def synthetic_archive_payload(years, seed=0):
+    rng = np.random.default_rng(seed)
+    start = int(pd.Timestamp("2015-01-01").timestamp())
+    n_days = int(365.25 * years)
+    n_hours = n_days * 24
+
+    hourly = [rng.normal(1010, 5, n_hours)] + [rng.uniform(0.2, 0.5, n_hours) for _ in range(4)]
+    daily = [rng.gamma(1.0, 5.0, n_days) for _ in DAILY_COLUMNS]
+    return encode_response(24.80, 92.35, daily=(start, 86400, daily), hourly=(start, 3600, hourly))
+
+
+def best_of(function, argument, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    responses = decode_responses(synthetic_archive_payload(args.years))
+
+    legacy_time, legacy = best_of(legacy_get_features_from_response, responses, args.repeat)
+    new_time, new = best_of(get_features_from_response, responses, args.repeat)
+
+    # Same columns and values; only the date dtype changes (datetime64 instead of date objects)
+    assert list(legacy.columns) == list(new.columns)
+    assert (pd.to_datetime(legacy["date"]).values == new["date"].values).all()
+    pd.testing.assert_frame_equal(legacy[DAILY_COLUMNS], new[DAILY_COLUMNS])
+    ties = 0
+    for column, decimals in HOURLY_COLUMNS.items():
+        difference = np.abs(legacy[column].to_numpy(np.float64) - new[column].to_numpy(np.float64))
+        assert (difference <= 10.0 ** -decimals * 1.01).all(), column
+        ties += int((difference > 1e-6).sum())
+
+    print(f"{len(new)} days, {len(new) * 24} hourly rows, {ties} rounding ties")
+    print(f"legacy groupby decoder : {legacy_time * 1000:8.1f} ms")
+    print(f"vectorized decoder     : {new_time * 1000:8.1f} ms  ({legacy_time / new_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the inference backends on the shipped models.
+
+Times single-row latency and batch throughput of the scikit-learn API
+(`model.predict` / `predict_proba`), FastPredictor on the booster
+(`inplace_predict`) and FastPredictor on the compiled NumPy trees.
+
+    python benchmarks/bench_inference.py --rows 100000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "flood_forecasting_app"))
+
+from fast_inference import FastPredictor  # noqa: E402
+from modeling_utils import flood_features, model_registry, regression_features  # noqa: E402
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="batch size for the throughput test")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'model':<16}{'backend':<10}{'1 row (ms)':>12}{'batch (rows/s)':>18}")
+    for name, columns in [("rain_model", regression_features), ("discharge_model", regression_features),
+                          ("flood_model", flood_features)]:
+        model = model_registry.get(name)
+        # Pandas-derived float64 input, as predict_flood builds it
+        batch = rng.normal(size=(args.rows, len(columns))) * 50 + 50
+        row = batch[:1]
+        method = "predict_proba" if hasattr(model, "classes_") else "predict"
+
+        backends = {"sklearn": model}
+        for backend in ["booster", "numpy"]:
+            backends[backend] = FastPredictor(model, backend)
+
+        for backend, predictor in backends.items():
+            predict = getattr(predictor, method)
+            single = best_of(lambda: predict(row), args.repeat * 20)
+            bulk = best_of(lambda: predict(batch), args.repeat)
+            print(f"{name:<16}{backend:<10}{single * 1000:>12.3f}{args.rows / bulk:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Streaming flood alerts.
+
+The AlertEngine consumes observations one at a time, daily or hourly:
+(gauge, time, discharge, flood probability). It keeps a small state per
+gauge, so each observation is evaluated in O(1) whatever the history.
+The rules come from the "alerts" entries of locations.json:
+
+- levels: discharge thresholds (e.g. warning / danger). A level is raised
+  when the discharge reaches it and cleared only once it falls below
+  `level * (1 - hysteresis)`, so a river hovering around a threshold does
+  not flap;
+- rise_per_day: rate of rise of the discharge over the last
+  `rise_window_hours`, in the same unit per day;
+- flood_proba / flood_days: the model's flood probability at or above
+  `flood_proba` on `flood_days` consecutive observations.
+
+Only transitions are sent: an alert is "raised" once and "cleared" once.
+The APIs revise the last RECENT_DAYS days, which every refresh fetches
+again, so the engine keeps the observations of that window with the
+rules state from before each one. An observation already seen with the
+same values is ignored; a revised one rewinds the state to before it and
+evaluates it and the following observations again, sending only the
+transitions against the alerts already sent. Feeding overlapping windows
+thus sends nothing twice but still catches revisions; observations older
+than the window are settled and ignored. The state can be saved to a
+JSON file, to survive restarts and to be shared by the processes that
+take turns refreshing.
+
+Alerts go to pluggable sinks: a JSON-lines file, a webhook, or a local
+queue for in-process consumers.
+"""
+import datetime
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_collection_utils import RECENT_DAYS
+from instrumentation import count
+from locations import ALERT_RULES
+
+HOURS_PER_DAY = 24
+
+
+class FileSink:
+    """Appends each alert as one JSON line."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def send(self, alert):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert) + "\n")
+
+
+class WebhookSink:
+    """POSTs each alert as JSON; delivery errors are reported, never raised."""
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        import requests  # only needed with a webhook configured
+
+        try:
+            requests.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+        except Exception as e:
+            count("alert_delivery_errors")
+            print("Error sending the alert to the webhook: ", e)
+
+
+class QueueSink:
+    """Puts each alert on a queue.Queue (or anything with `put`)."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def send(self, alert):
+        self.queue.put(alert)
+
+
+class GaugeState:
+    """
+    What the rules of one gauge need to remember: O(1) in the length of the
+    stream, plus the observations of the revisable window, each with the
+    rules state from before it (its checkpoint).
+    """
+
+    def __init__(self):
+        self.last_time = None        # hours since the epoch of the last observation
+        self.active = set()          # alert keys currently raised
+        self.recent = deque()        # (hours, discharge) within the rise window
+        self.proba_run = 0           # consecutive observations at or above flood_proba
+        self.observed = deque()      # (time, hours, discharge, proba, (active, recent, proba_run) before it)
+
+    def checkpoint(self, time, hours, discharge, proba, was_active):
+        self.observed.append((time, hours, discharge, proba, (set(was_active), deque(self.recent), self.proba_run)))
+
+    def prune(self, revisable_hours):
+        while len(self.observed) > 1 and self.observed[0][1] < self.last_time - revisable_hours:
+            self.observed.popleft()
+
+    def rewind(self, hours):
+        """
+        Drops the observations from `hours` on and restores the rules state
+        from before them. Returns the alert keys raised at that point and
+        the dropped observations, or None if `hours` is before the window.
+        """
+        index = next((i for i, item in enumerate(self.observed) if item[1] >= hours), None)
+        if index is None or (index == 0 and hours < self.observed[0][1]):
+            return None
+        dropped = [self.observed.pop() for _ in range(len(self.observed) - index)][::-1]
+        active, recent, self.proba_run = dropped[0][4]
+        self.recent = deque(recent)
+        return set(active), [item[:4] for item in dropped]
+
+    def to_dict(self):
+        observed = [{"time": time, "hours": hours, "discharge": discharge, "proba": proba,
+                     "active": sorted(active), "recent": list(recent), "proba_run": proba_run}
+                    for time, hours, discharge, proba, (active, recent, proba_run) in self.observed]
+        return {"last_time": self.last_time, "active": sorted(self.active),
+                "recent": list(self.recent), "proba_run": self.proba_run, "observed": observed}
+
+    @classmethod
+    def from_dict(cls, values):
+        state = cls()
+        state.last_time = values["last_time"]
+        state.active = set(values["active"])
+        state.recent = deque(tuple(item) for item in values["recent"])
+        state.proba_run = values["proba_run"]
+        for item in values.get("observed", []):
+            state.observed.append((item["time"], item["hours"], item["discharge"], item["proba"],
+                                   (set(item["active"]), deque(tuple(point) for point in item["recent"]),
+                                    item["proba_run"])))
+        return state
+
+
+def _same(value, other):
+    return value == other or (math.isnan(value) and math.isnan(other))
+
+
+def _hours(time):
+    """Hours since the epoch of an ISO time (naive times are taken as UTC)."""
+    moment = datetime.datetime.fromisoformat(str(time))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp() / 3600
+
+
+class AlertEngine:
+
+    def __init__(self, rules=ALERT_RULES, sinks=(), hysteresis=0.05, rise_window_hours=24,
+                 revisable_days=RECENT_DAYS, state_path=None):
+        self.rules = rules
+        self.sinks = list(sinks)
+        self.hysteresis = hysteresis
+        self.rise_window_hours = rise_window_hours
+        self.revisable_hours = revisable_days * HOURS_PER_DAY
+        self.state_path = Path(state_path) if state_path is not None else None
+        self.states = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Replaces the in-memory state by the saved one, e.g. written by another process."""
+        if self.state_path is None or not self.state_path.exists():
+            return
+        with open(self.state_path, encoding="utf-8") as f:
+            states = {gauge: GaugeState.from_dict(values) for gauge, values in json.load(f).items()}
+        with self._lock:
+            self.states = states
+
+    def observe(self, gauge, time, discharge, proba=math.nan):
+        """Evaluates one observation; returns the alerts it raised or cleared (already sent)."""
+        rules = self.rules.get(gauge)
+        if rules is None:
+            return []
+
+        time, hours, discharge, proba = str(time), _hours(time), float(discharge), float(proba)
+        with self._lock:
+            state = self.states.setdefault(gauge, GaugeState())
+            replay = [(time, hours, discharge, proba)]
+            if state.last_time is not None and hours <= state.last_time:
+                # Already seen, or a revision: overlapping windows are replayed by every refresh
+                previous = next((item for item in state.observed if item[1] == hours), None)
+                if previous is not None and _same(previous[2], discharge) and _same(previous[3], proba):
+                    return []
+                rewound = state.rewind(hours)
+                if rewound is None:
+                    return []  # settled: older than the revisable window
+                was_active, dropped = rewound
+                # The observations after the revised one are evaluated again, in order
+                replay += [item for item in dropped if item[1] != hours]
+            else:
+                was_active = set(state.active)
+
+            alerts = []
+            for time, hours, discharge, proba in replay:
+                state.checkpoint(time, hours, discharge, proba, was_active)
+                alerts += self._evaluate(gauge, rules, state, was_active, time, hours, discharge, proba)
+                was_active = set(state.active)
+            state.last_time = max(state.last_time if state.last_time is not None else hours, hours)
+            state.prune(self.revisable_hours)
+
+        for alert in alerts:
+            count("alerts_" + alert["state"])
+            for sink in self.sinks:
+                sink.send(alert)
+        return alerts
+
+    def _evaluate(self, gauge, rules, state, was_active, time, hours, discharge, proba):
+        # Hysteresis follows the alerts raised before this observation (`was_active`); transitions
+        # are against those already sent (`state.active`), so a re-evaluation only sends changes
+        conditions = {}
+        if not math.isnan(discharge):
+            # Thresholds, with hysteresis on the way down
+            for level, threshold in rules.get("levels", {}).items():
+                key = f"level:{level}"
+                active = key in was_active
+                conditions[key] = (discharge >= threshold if not active
+                                   else discharge >= threshold * (1 - self.hysteresis), discharge, threshold)
+
+            # Rate of rise over the window (amortized O(1): each point is pushed and popped once)
+            if "rise_per_day" in rules:
+                recent = state.recent
+                while recent and hours - recent[0][0] > self.rise_window_hours:
+                    recent.popleft()
+                if recent:
+                    then, previous = recent[0]
+                    rate = (discharge - previous) / (hours - then) * HOURS_PER_DAY
+                    threshold = rules["rise_per_day"]
+                    active = "rise" in was_active
+                    conditions["rise"] = (rate >= threshold if not active
+                                          else rate >= threshold * (1 - self.hysteresis), rate, threshold)
+                recent.append((hours, discharge))
+
+        if "flood_proba" in rules and not math.isnan(proba):
+            threshold = rules["flood_proba"]
+            active = "flood_proba" in was_active
+            above = proba >= (threshold if not active else threshold * (1 - self.hysteresis))
+            state.proba_run = state.proba_run + 1 if above else 0
+            conditions["flood_proba"] = (state.proba_run >= rules.get("flood_days", 1), proba, threshold)
+
+        alerts = []
+        for key, (on, value, threshold) in conditions.items():
+            if on == (key in state.active):
+                continue
+            if on:
+                state.active.add(key)
+            else:
+                state.active.discard(key)
+            alerts.append({
+                "gauge": gauge,
+                "rule": key,
+                "state": "raised" if on else "cleared",
+                "time": time,
+                "value": round(value, 3),
+                "threshold": threshold,
+            })
+        return alerts
+
+    def observe_frame(self, data, gauges=None, proba_col="proba"):
+        """
+        Feeds the observed rows of a pipeline output (forecast rows are
+        predictions, not observations) for every gauge with rules.
+        Returns all the alerts sent.
+        """
+        if "forecast" in data.columns:
+            data = data[~data["forecast"].astype(bool)]
+        gauges = [gauge for gauge in (gauges or self.rules) if gauge in data.columns]
+        times = [moment.isoformat() for moment in pd.to_datetime(data["date"])]
+        discharges = {gauge: data[gauge].to_numpy(dtype=float) for gauge in gauges}
+        probas = data[proba_col].to_numpy(dtype=float) if proba_col in data.columns else np.full(len(data), np.nan)
+
+        alerts = []
+        for i, time in enumerate(times):
+            for gauge in gauges:
+                alerts += self.observe(gauge, time, discharges[gauge][i], probas[i])
+        self.save()
+        return alerts
+
+    def save(self):
+        if self.state_path is None:
+            return
+        with self._lock:
+            values = {gauge: state.to_dict() for gauge, state in self.states.items()}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(values, f)
+        os.replace(tmp_path, self.state_path)
+
+
+BASE_DIR = Path(__file__).resolve().parent
+ALERT_DIR = BASE_DIR/"alerts"
+
+
+def engine_from_env():
+    """
+    The engine of the refresh scheduler. Alerts are appended to
+    FLOOD_ALERT_FILE (default alerts/alerts.jsonl) and also POSTed to
+    FLOOD_ALERT_WEBHOOK if set; the state is kept in alerts/state.json.
+    """
+    sinks = [FileSink(os.environ.get("FLOOD_ALERT_FILE", ALERT_DIR/"alerts.jsonl"))]
+    if os.environ.get("FLOOD_ALERT_WEBHOOK"):
+        sinks.append(WebhookSink(os.environ["FLOOD_ALERT_WEBHOOK"]))
+    return AlertEngine(sinks=sinks, state_path=ALERT_DIR/"state.json")
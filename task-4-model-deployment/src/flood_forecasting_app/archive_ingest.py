@@ -0,0 +1,166 @@
+"""
+Converts the historical CSV/XLSX archive into one Parquet file.
+
+Inputs, all daily and joined on the date:
+- the Open-Meteo daily weather and the river discharges of task-1;
+- the daily pressure and soil moisture means of task-1;
+- the `flooded` labels of task-2 (AllData_After_EDA.csv);
+- the CWC rain gauge of Rainfall_Karimganj.xlsx, summed per day (needs the
+  optional openpyxl dependency, skipped without it).
+
+Columns use the names of the fetch_and_process_data output and dtypes are
+downcast (float32 values, int8 flags, dates stored as days), so a slice of
+the archive can be concatenated or merged on "date" with freshly fetched
+data. The file is sorted by date and written in row groups of a year of
+days: a `load_archive` call only reads the columns and years it asks for.
+
+    python archive_ingest.py --output data_store/history.parquet
+"""
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parent
+REPO_DIR = BASE_DIR.parents[2]
+TASK1_DIR = REPO_DIR/"task-1-data-collection"
+TASK2_DIR = REPO_DIR/"task-2-data-preprocessing"/"DATA FILES"
+
+ARCHIVE_FILE = BASE_DIR/"data_store"/"history.parquet"
+
+# Open-Meteo exports: glob pattern under task-1 -> renames to the fetch column names
+OPEN_METEO_FILES = {
+    "dailyData*/dailyData/open-meteo-*.csv": {"wind_direction_10m_dominant (°)": "wind_direction_10m_dominant"},
+    "riverDischarges*/riverDischarges/LongaiRiver/open-meteo-*.csv": {"river_discharge (m³/s)": "Longai_discharge (m³/s)"},
+    "riverDischarges*/riverDischarges/KushiyaraRiver/open-meteo-*.csv": {"river_discharge (m³/s)": "Kushi_discharge (m³/s)"},
+    "riverDischarges*/riverDischarges/SinglaRiver/open-meteo-*.csv": {"river_discharge (m³/s)": "Singla_discharge (m³/s)"},
+    "open-meteo-24.85N92.35E.csv": {"river_discharge (m³/s)": "unknown_discharge (m³/s)"},
+}
+
+# Non-cumulative series of the CWC gauge workbook: data type code -> column.
+# The "acumm" series (IPC, MPC) are running totals and are left out.
+GAUGE_RAINFALL = {
+    "MPS": "gauge_rain_srg (mm)",
+    "MPM": "gauge_rain_telemetry (mm)",
+}
+
+FLAG_COLUMNS = ["flooded"]
+
+ROW_GROUP_DAYS = 366
+
+
+def find_export(pattern):
+    matches = sorted(TASK1_DIR.glob(pattern))
+    if not matches:
+        raise FileNotFoundError(f"No file matches {TASK1_DIR/pattern}")
+    return matches[0]
+
+
+def read_open_meteo_csv(path, renames=None):
+    """An Open-Meteo CSV export: three metadata lines, a blank line, then the daily table."""
+    data = pd.read_csv(path, skiprows=3, parse_dates=["time"])
+    data = data.rename(columns={"time": "date", **(renames or {})})
+    return data.set_index("date")
+
+
+def read_daily_means(path=TASK1_DIR/"daily_avg_slp_and_soil_moisture.csv"):
+    return pd.read_csv(path, parse_dates=["date"]).set_index("date")
+
+
+def read_flood_labels(path=TASK2_DIR/"AllData_After_EDA.csv"):
+    data = pd.read_csv(path, usecols=["Date", *FLAG_COLUMNS], parse_dates=["Date"])
+    return data.rename(columns={"Date": "date"}).set_index("date")
+
+
+def read_gauge_rainfall(path=TASK1_DIR/"Rainfall_Karimganj.xlsx"):
+    """Daily rain totals of the CWC gauge, or None when openpyxl is not installed."""
+    try:
+        raw = pd.read_excel(path, sheet_name=1, header=6, usecols=[0, 2, 3])
+    except ImportError:
+        print("openpyxl is not installed, skipping the rain gauge workbook")
+        return None
+
+    raw.columns = ["code", "time", "value"]
+    raw = raw[raw["code"].isin(GAUGE_RAINFALL)]
+    raw["date"] = pd.to_datetime(raw["time"]).dt.normalize()
+    daily = raw.pivot_table(index="date", columns="code", values="value", aggfunc="sum")
+    return daily.rename(columns=GAUGE_RAINFALL)
+
+
+def downcast(data):
+    """float32 values and nullable int8 flags."""
+    data = data.copy()
+    for column in data.columns:
+        if column in FLAG_COLUMNS:
+            data[column] = data[column].astype("Int8")
+        else:
+            data[column] = data[column].astype(np.float32)
+    return data
+
+
+def build_archive(output=ARCHIVE_FILE, gauge_rainfall=True):
+    """Reads every source, joins them on the date and writes the Parquet file. Returns the table."""
+    frames = [read_open_meteo_csv(find_export(pattern), renames) for pattern, renames in OPEN_METEO_FILES.items()]
+    frames += [read_daily_means(), read_flood_labels()]
+    if gauge_rainfall:
+        rainfall = read_gauge_rainfall()
+        if rainfall is not None:
+            frames.append(rainfall)
+
+    data = downcast(pd.concat(frames, axis=1, join="outer").sort_index())
+    data.index = data.index.astype("datetime64[s]")
+
+    fields = [pa.field("date", pa.date32(), nullable=False)]
+    fields += [pa.field(column, pa.int8() if column in FLAG_COLUMNS else pa.float32()) for column in data.columns]
+    table = pa.Table.from_pandas(data.reset_index(), schema=pa.schema(fields), preserve_index=False)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, compression="zstd", row_group_size=ROW_GROUP_DAYS)
+    os.replace(tmp_path, output)
+    return table
+
+
+def load_archive(columns=None, start_date=None, end_date=None, path=ARCHIVE_FILE):
+    """
+    Reads a date window of the archive, only the requested `columns`, as a
+    DataFrame with a datetime64[ns] "date" column like the fetched data.
+    """
+
+    try:
+        if columns is not None:
+            columns = ["date"] + [column for column in columns if column != "date"]
+        filters = []
+        if start_date is not None:
+            filters.append(("date", ">=", pd.Timestamp(start_date).date()))
+        if end_date is not None:
+            filters.append(("date", "<=", pd.Timestamp(end_date).date()))
+
+        table = pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+        data = table.to_pandas(date_as_object=False, types_mapper={pa.int8(): pd.Int8Dtype()}.get)
+        data["date"] = data["date"].astype("datetime64[ns]")
+        return data
+
+    except Exception as e:
+        print("Error loading the archive: ", e)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=str(ARCHIVE_FILE))
+    parser.add_argument("--no-gauge-rainfall", action="store_true", help="skip the XLSX rain gauge workbook")
+    args = parser.parse_args(argv)
+
+    table = build_archive(args.output, gauge_rainfall=not args.no_gauge_rainfall)
+    size = Path(args.output).stat().st_size
+    print(f"{table.num_rows} days x {table.num_columns - 1} columns written to {args.output} ({size / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
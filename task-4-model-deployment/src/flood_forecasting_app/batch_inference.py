@@ -0,0 +1,171 @@
+"""
+Headless batch scoring of the flood forecasting pipeline.
+
+Scores a daily history file (CSV or Parquet, e.g. AllData_After_EDA.csv) or a
+list of date windows fetched from Open-Meteo, and writes the predictions to
+CSV or Parquet:
+
+    python batch_inference.py --input "../../../task-2-data-preprocessing/DATA FILES/AllData_After_EDA.csv" --output backtest.parquet
+    python batch_inference.py --window 2024-06-01:2024-06-30 --window 2024-07-01:2024-07-31 --output june_july.csv
+
+Input files are read in chunks and each chunk is scored in a process pool;
+at most `2 x workers` chunks are in flight, so memory stays bounded
+whatever the size of the input.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import MAX_WINDOW
+from modeling_utils import input_columns, model_registry, predict_flood
+
+PREDICTION_COLUMNS = ["predicted_rain", "predicted_discharge", "flood", "proba"]
+
+
+def _init_worker():
+    # One XGBoost thread per process: the pool provides the parallelism
+    for name in model_registry.files:
+        model_registry.get(name).set_params(n_jobs=1)
+
+
+def normalize_input(chunk):
+    """Maps an archive file onto the column layout fetch_and_process_data returns."""
+    chunk = chunk.rename(columns={"Date": "date", "time": "date"})
+    missing = [col for col in input_columns if col not in chunk.columns]
+    for col in missing:
+        chunk[col] = np.nan  # scored as missing values by XGBoost
+    return chunk, missing
+
+
+def score_chunk(chunk, context_rows=0, keep_columns=()):
+    """Scores every row of `chunk`; the first `context_rows` rows only feed the rolling windows."""
+    data = predict_flood(chunk, backfill=True)
+    data = data.iloc[context_rows:]
+    columns = ["date"] + [col for col in keep_columns if col in data.columns] + PREDICTION_COLUMNS
+    return data[columns].reset_index(drop=True)
+
+
+def read_chunks(path, chunk_size):
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def file_tasks(path, chunk_size, keep_columns):
+    """Yields (chunk, context_rows, keep_columns), carrying the last days over chunk boundaries."""
+    context = None
+    reported = False
+    for chunk in read_chunks(path, chunk_size):
+        chunk, missing = normalize_input(chunk)
+        if missing and not reported:
+            print(f"Columns missing from the input, scored as NaN: {missing}", file=sys.stderr)
+            reported = True
+
+        context_rows = 0 if context is None else len(context)
+        if context is not None:
+            chunk = pd.concat([context, chunk], ignore_index=True)
+        context = chunk.iloc[-(MAX_WINDOW - 1):]
+        yield chunk, context_rows, keep_columns
+
+
+def window_tasks(windows, keep_columns):
+    from data_collection_utils import fetch_and_process_data_incremental
+
+    for window in windows:
+        start_date, end_date = window.split(":")
+        data = fetch_and_process_data_incremental(start_date, end_date)
+        if data is None:
+            print(f"Skipping window {window}: the data could not be fetched", file=sys.stderr)
+            continue
+        data["window"] = window
+        yield data, 0, ("window",) + tuple(keep_columns)
+
+
+class PredictionWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._parquet = None
+        self._header = True
+        if self.path.exists():
+            self.path.unlink()
+
+    def write(self, frame):
+        if self.path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def run(tasks, output, workers):
+    writer = PredictionWriter(output)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def flush_one():
+        nonlocal rows
+        result = pending.popleft().result()
+        writer.write(result)
+        rows += len(result)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for chunk, context_rows, keep_columns in tasks:
+                pending.append(pool.submit(score_chunk, chunk, context_rows, keep_columns))
+                if len(pending) >= 2 * workers:
+                    flush_one()  # results are written in input order
+            while pending:
+                flush_one()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f} s ({rows / elapsed if elapsed else 0:.0f} rows/s) -> {output}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="daily history file (.csv or .parquet)")
+    source.add_argument("--window", action="append", metavar="START:END",
+                        help="date window to fetch and score, can be repeated")
+    parser.add_argument("--output", required=True, help="predictions file (.csv or .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows per chunk (default: 50000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--keep", action="append", default=[], metavar="COLUMN",
+                        help="input column copied to the output, e.g. the observed flood label")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        tasks = file_tasks(args.input, args.chunk_size, args.keep)
+    else:
+        tasks = window_tasks(args.window, args.keep)
+    run(tasks, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
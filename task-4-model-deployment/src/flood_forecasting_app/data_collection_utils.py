@@ -1,23 +1,121 @@
-import openmeteo_requests
-import requests_cache
+import numpy as np
 import pandas as pd
-from retry_requests import retry
-
-
-def fetch_meteo_data(start_date="2025-02-22" , end_date = "2025-03-03"  , fetch_target = False, coords = (24.80, 92.35)):
+import contextvars
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from timeseries_store import TimeSeriesStore
+from locations import ARCHIVE_COORDS, GAUGES
+from instrumentation import count, stage
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+# FLOOD_OPENMETEO_URL points both APIs at another server, e.g. the local
+# stand-in of openmeteo_stub.py. FLOOD_HTTP_CACHE=0 disables the HTTP cache.
+OPENMETEO_URL = os.environ.get("FLOOD_OPENMETEO_URL", "").rstrip("/")
+ARCHIVE_URL = f"{OPENMETEO_URL}/v1/archive" if OPENMETEO_URL else "https://archive-api.open-meteo.com/v1/archive"
+FLOOD_URL = f"{OPENMETEO_URL}/v1/flood" if OPENMETEO_URL else "https://flood-api.open-meteo.com/v1/flood"
+HTTP_CACHE = os.environ.get("FLOOD_HTTP_CACHE", "1") != "0"
+
+# Days the APIs may still revise (the archive lags, the flood API forecasts recent
+# days): fetches reaching into them skip the HTTP cache, which never expires, so
+# every refresh of the day gets the current values. The store keeps them unsettled too.
+RECENT_DAYS = 7
+
+
+# Pooled sessions (cached and uncached) and one bounded pool shared by every fetch in the process
+_clients = {}
+_client_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="openmeteo")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_default_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TimeSeriesStore(os.environ.get("FLOOD_DATA_STORE", BASE_DIR/"data_store"),
+                                     finalize_after_days=RECENT_DAYS)
+        return _store
+
+
+def get_openmeteo_client(cached=HTTP_CACHE):
+    with _client_lock:
+        if cached not in _clients:
+            # Imported on the first fetch: pages served from the snapshot never load them
+            import openmeteo_requests
+            import requests
+            import requests_cache
+            from retry_requests import retry
+
+            # Setup the Open-Meteo API client with cache and retry on error
+            if cached:
+                session = requests_cache.CachedSession('.cache', expire_after = -1)
+            else:
+                session = requests.Session()
+            session.hooks["response"].append(_record_response)
+            retry_session = retry(session, retries = 5, backoff_factor = 0.2)
+            _clients[cached] = openmeteo_requests.Client(session = retry_session)
+        return _clients[cached]
+
+
+def submit_fetch(*args, **kwargs):
+    """
+    Runs fetch_meteo_data on the shared pool. The call runs in the caller's
+    context, so its timings land in the current pipeline run.
+    """
+    return _executor.submit(contextvars.copy_context().run, fetch_meteo_data, *args, **kwargs)
+
+
+def is_recent(end_date):
+    """Whether a window ending on `end_date` includes days the APIs may still revise."""
+    settled = datetime.date.today() - datetime.timedelta(days=RECENT_DAYS)
+    return datetime.date.fromisoformat(str(end_date)[:10]) > settled
+
+
+def _record_response(response, *args, **kwargs):
+    # Cache hits/misses and urllib3 retries, for the pipeline metrics
+    count("http_cache_hits" if getattr(response, "from_cache", False) else "http_cache_misses")
+    retries = getattr(getattr(response.raw, "retries", None), "history", None)
+    if retries:
+        count("http_retries", len(retries))
+    return response
+
+
+@stage("network")
+def fetch_meteo_data(start_date="2025-02-22" , end_date = "2025-03-03"  , fetch_target = False, coords = ARCHIVE_COORDS,
+                     hourly_extra = False):
+    """
+    Fetches Open-Meteo data for one or several locations.
+
+    `coords` is either a single (latitude, longitude) pair or a list of pairs;
+    with a list, all locations are requested in one call and the API returns
+    one response per location, in the same order.
+    With `hourly_extra`, the archive call also requests the hourly variables
+    of HOURLY_EXTRA_COLUMNS, after those of HOURLY_COLUMNS.
+    Windows ending in the last RECENT_DAYS days bypass the HTTP cache.
+    """
 
     try:
-        # Setup the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after = -1)
-        retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-        openmeteo = openmeteo_requests.Client(session = retry_session)
+        openmeteo = get_openmeteo_client(HTTP_CACHE and not is_recent(end_date))
+
+        if isinstance(coords[0], (tuple, list)):
+            latitude = [lat for lat, _ in coords]
+            longitude = [lon for _, lon in coords]
+        else:
+            latitude, longitude = coords
 
         # If we are fetching the target, we need to use the flood API, otherwise we use the archive API
         if fetch_target:
-            URL = "https://flood-api.open-meteo.com/v1/flood"
+            URL = FLOOD_URL
             params = {
-                "latitude": coords[0],
-                "longitude": coords[1],
+                "latitude": latitude,
+                "longitude": longitude,
                 "daily": "river_discharge",
                 "start_date": start_date,
                 "end_date": end_date,
@@ -25,14 +123,15 @@ def fetch_meteo_data(start_date="2025-02-22" , end_date = "2025-03-03"  , fetch_
             }
         
         else :
-            URL = "https://archive-api.open-meteo.com/v1/archive"
+            URL = ARCHIVE_URL
             params = {
-                "latitude": coords[0],
-                "longitude": coords[1],
+                "latitude": latitude,
+                "longitude": longitude,
                 "start_date": start_date, #depends on model development team
                 "end_date": end_date,
                 "hourly": ["pressure_msl","soil_moisture_0_to_7cm","soil_moisture_7_to_28cm",
-                           "soil_moisture_28_to_100cm", "soil_moisture_100_to_255cm" ], #variables based on final dataset
+                           "soil_moisture_28_to_100cm", "soil_moisture_100_to_255cm" ]
+                          + (["rain", "temperature_2m"] if hourly_extra else []), #variables based on final dataset
                 "daily": ["precipitation_sum", "wind_speed_10m_max",
                            "wind_direction_10m_dominant", "et0_fao_evapotranspiration",
                            "wind_gusts_10m_max","temperature_2m_max","temperature_2m_min" ,
@@ -49,116 +148,115 @@ def fetch_meteo_data(start_date="2025-02-22" , end_date = "2025-03-03"  , fetch_
         return None
     
 
-def get_features_from_response(responses):
+## Column names of the archive variables, in the order they are requested.
+# Hourly values are averaged per day and rounded to the given number of decimals.
+HOURLY_COLUMNS = {
+    "pressure_msl (hPa)": 1,
+    "soil_moisture_0_to_7cm (m³/m³)": 3,
+    "soil_moisture_7_to_28cm (m³/m³)": 3,
+    "soil_moisture_28_to_100cm (m³/m³)": 3,
+    "soil_moisture_100_to_255cm (m³/m³)": 3,
+}
+
+# Hourly variables only requested by the hourly mode (hourly_forecasting.py)
+HOURLY_EXTRA_COLUMNS = ["rain (mm)", "temperature_2m (°C)"]
+
+DAILY_COLUMNS = [
+    "precipitation_sum (mm)", "wind_speed_10m_max (m/s)",
+    "wind_direction_10m_dominant", "et0_fao_evapotranspiration (mm)",
+    "wind_gusts_10m_max (m/s)", "temperature_2m_max (°C)",
+    "temperature_2m_min (°C)", "temperature_2m_mean (°C)",
+    "rain_sum (mm)",
+]
+
+SECONDS_PER_DAY = 86400
+
+
+def read_variables(section, n_variables=None):
+    """
+    Copies the first `n_variables` variables (default: all) of a FlatBuffers
+    section into one preallocated (variables x time steps) float32 block,
+    and returns it with the unix timestamps of the time steps.
+    """
+    times = np.arange(section.Time(), section.TimeEnd(), section.Interval(), dtype=np.int64)
+    n_variables = section.VariablesLength() if n_variables is None else n_variables
+
+    block = np.empty((n_variables, len(times)), dtype=np.float32)
+    for i in range(n_variables):
+        block[i] = section.Variables(i).ValuesAsNumpy()
+    return times, block
+
+
+def daily_means(times, block):
+    """
+    Averages a (variables x hours) block per UTC day, ignoring NaNs like a
+    pandas groupby mean. Returns the day numbers (days since epoch) and a
+    (variables x days) block of float64 means.
+    """
+    days = times // SECONDS_PER_DAY
+    if len(times) == 0:
+        return days, np.empty((block.shape[0], 0))
+
+    valid = ~np.isnan(block)
+    values = np.where(valid, block, 0).astype(np.float64)
+
+    steps_per_day = SECONDS_PER_DAY // int(times[1] - times[0]) if len(times) > 1 else 1
+    if times[0] % SECONDS_PER_DAY == 0 and len(times) % steps_per_day == 0:
+        # Whole days only: every day is a fixed-width bin of the hourly axis
+        shape = (block.shape[0], len(times) // steps_per_day, steps_per_day)
+        sums = values.reshape(shape).sum(axis=2)
+        counts = valid.reshape(shape).sum(axis=2)
+        day_keys = days[::steps_per_day]
+    else:
+        starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+        sums = np.add.reduceat(values, starts, axis=1)
+        counts = np.add.reduceat(valid, starts, axis=1)
+        day_keys = days[starts]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return day_keys, sums / counts
+
+
+@stage("decode")
+def get_features_from_response(responses, index = 0):
 
     try:
-        response = responses[0]
-        
-        ## Process hourly data. The order of variables needs to be the same as requested.
-        hourly = response.Hourly()
-        hourly_pressure_msl = hourly.Variables(0).ValuesAsNumpy()
-        hourly_soil_moisture_0_to_7cm = hourly.Variables(1).ValuesAsNumpy()
-        hourly_soil_moisture_7_to_28cm = hourly.Variables(2).ValuesAsNumpy()
-        hourly_soil_moisture_28_to_100cm = hourly.Variables(3).ValuesAsNumpy()
-        hourly_soil_moisture_100_to_255cm = hourly.Variables(4).ValuesAsNumpy()
+        response = responses[index]
 
+        ## Process hourly data. The order of variables needs to be the same as requested.
+        hourly_times, hourly_block = read_variables(response.Hourly(), len(HOURLY_COLUMNS))
+        hourly_days, hourly_means = daily_means(hourly_times, hourly_block)
 
-        hourly_data = {"date": pd.date_range(
-            start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = hourly.Interval()),
-            inclusive = "left"
-        )}
+        ## Process daily data. The order of variables needs to be the same as requested.
+        daily_times, daily_block = read_variables(response.Daily(), len(DAILY_COLUMNS))
+        daily_days = daily_times // SECONDS_PER_DAY
 
-        hourly_data["pressure_msl (hPa)"] = hourly_pressure_msl
-        hourly_data["soil_moisture_0_to_7cm (m³/m³)"] = hourly_soil_moisture_0_to_7cm
-        hourly_data["soil_moisture_7_to_28cm (m³/m³)"] = hourly_soil_moisture_7_to_28cm
-        hourly_data["soil_moisture_28_to_100cm (m³/m³)"] = hourly_soil_moisture_28_to_100cm
-        hourly_data["soil_moisture_100_to_255cm (m³/m³)"] = hourly_soil_moisture_100_to_255cm
+        ## Join both on their day keys (inner join, like a merge on the date)
+        days, daily_idx, hourly_idx = np.intersect1d(daily_days, hourly_days, assume_unique=True, return_indices=True)
 
-        hourly_dataframe = pd.DataFrame(data = hourly_data)
+        merged = {"date": days.astype("datetime64[D]").astype("datetime64[ns]")}
+        for i, column in enumerate(DAILY_COLUMNS):
+            merged[column] = daily_block[i, daily_idx]
+        for i, (column, decimals) in enumerate(HOURLY_COLUMNS.items()):
+            merged[column] = hourly_means[i, hourly_idx].round(decimals).astype(np.float32)
 
-        ## Process daily data. The order of variables needs to be the same as requested.
-        daily = response.Daily()
-        daily_precipitation_sum = daily.Variables(0).ValuesAsNumpy()
-        daily_wind_speed_10m_max = daily.Variables(1).ValuesAsNumpy()
-        daily_wind_direction_10m_dominant = daily.Variables(2).ValuesAsNumpy()
-        daily_et0_fao_evapotranspiration = daily.Variables(3).ValuesAsNumpy()
-        daily_wind_gusts_10m_max = daily.Variables(4).ValuesAsNumpy()
-        daily_temperature_2m_max = daily.Variables(5).ValuesAsNumpy()
-        daily_temperature_2m_min = daily.Variables(6).ValuesAsNumpy()
-        daily_temperature_2m_mean = daily.Variables(7).ValuesAsNumpy()
-        daily_rain_sum = daily.Variables(8).ValuesAsNumpy()
-
-        daily_data = {"date": pd.date_range(
-        start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-        end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-        freq = pd.Timedelta(seconds = daily.Interval()),
-        inclusive = "left")}
-
-        daily_data["precipitation_sum (mm)"] = daily_precipitation_sum
-        daily_data["wind_speed_10m_max (m/s)"] = daily_wind_speed_10m_max
-        daily_data["wind_direction_10m_dominant"] = daily_wind_direction_10m_dominant
-        daily_data["et0_fao_evapotranspiration (mm)"] = daily_et0_fao_evapotranspiration
-        daily_data["wind_gusts_10m_max (m/s)"] = daily_wind_gusts_10m_max
-        daily_data["temperature_2m_max (°C)"] = daily_temperature_2m_max
-        daily_data["temperature_2m_min (°C)"] = daily_temperature_2m_min
-        daily_data["temperature_2m_mean (°C)"] = daily_temperature_2m_mean
-        daily_data["rain_sum (mm)"] = daily_rain_sum
-
-        daily_dataframe = pd.DataFrame(data = daily_data)
-
-        ## group the hourly dataset by day and calculate the daily average
-
-        # Convert 'date' column to datetime format and extract only the date part
-        hourly_dataframe["date"] = pd.to_datetime(hourly_dataframe["date"])
-        hourly_dataframe["date"] = hourly_dataframe["date"].dt.date
-
-        # Compute daily averages: gathers data by date, takes mean of gathered data if data are numeric( if not it doesn't take them into account)
-        daily_avg = hourly_dataframe.groupby("date").mean(numeric_only=True).reset_index()
-
-        # Format output, rounds pressure_msl to one decimal place and soil moisture to 3 decimal places
-        daily_avg["pressure_msl (hPa)"] = daily_avg["pressure_msl (hPa)"].round(1)
-        daily_avg["soil_moisture_0_to_7cm (m³/m³)"] = daily_avg["soil_moisture_0_to_7cm (m³/m³)"].round(3)
-        daily_avg["soil_moisture_7_to_28cm (m³/m³)"] = daily_avg["soil_moisture_7_to_28cm (m³/m³)"].round(3)
-        daily_avg["soil_moisture_28_to_100cm (m³/m³)"] = daily_avg["soil_moisture_28_to_100cm (m³/m³)"].round(3)
-        daily_avg["soil_moisture_100_to_255cm (m³/m³)"] = daily_avg["soil_moisture_100_to_255cm (m³/m³)"].round(3)
-
-        ## Get the date for the daily dataset
-        # Convert 'date' column to datetime format and extract only the date part
-        daily_dataframe["date"] = pd.to_datetime(pd.to_datetime(daily_dataframe["date"]))
-        daily_dataframe["date"] = daily_dataframe["date"].dt.date
-
-        ## Merge the daily average and daily datasets
-        merged_df = daily_dataframe.merge(daily_avg, on="date")
-        return merged_df
+        return pd.DataFrame(merged)
     
     except Exception as e:
         print("Error processing the features: ", e)
         return None
 
-def get_target_from_response(responses , name = "Longai_discharge (m³/s)"):
+@stage("decode")
+def get_target_from_response(responses , name = "Longai_discharge (m³/s)", index = 0):
 
     try:
-        response = responses[0]
-        daily = response.Daily()
-        daily_river_discharge = daily.Variables(0).ValuesAsNumpy()
-
-        daily_data = {"date": pd.date_range(
-            start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = daily.Interval()),
-            inclusive = "left"
-        )}
-
-        daily_data[name] = daily_river_discharge
-
-        daily_dataframe = pd.DataFrame(data = daily_data)
-
-        # Convert 'date' column to datetime format and extract only the date part
-        daily_dataframe["date"] = pd.to_datetime(pd.to_datetime(daily_dataframe["date"]))
-        daily_dataframe["date"] = daily_dataframe["date"].dt.date
+        response = responses[index]
+        times, block = read_variables(response.Daily(), 1)
 
+        daily_dataframe = pd.DataFrame({
+            "date": (times // SECONDS_PER_DAY).astype("datetime64[D]").astype("datetime64[ns]"),
+            name: block[0],
+        })
         return daily_dataframe
     
     except Exception as e:
@@ -166,6 +264,7 @@ def get_target_from_response(responses , name = "Longai_discharge (m³/s)"):
         return None
     
     
+@stage("merge")
 def merge_features_target(features, target):
 
     try:
@@ -177,58 +276,54 @@ def merge_features_target(features, target):
         return None
 
 
-def fetch_and_process_data(start_date="2025-02-22", end_date="2025-03-03"):
+def fetch_raw_data(start_date="2025-02-22", end_date="2025-03-03", gauges=GAUGES):
+    """
+    Runs the archive call and one batched flood call concurrently.
+    Returns the daily features and a {column: discharge dataframe} dict,
+    or (None, None) if any call failed.
+    """
 
     try:
-        # Fetch the data
-        responses = fetch_meteo_data(start_date, end_date)
-        if responses is None:
-            return None
+        names = list(gauges)
+        features_future = submit_fetch(start_date, end_date)
+        target_future = submit_fetch(start_date, end_date, fetch_target = True, coords = [gauges[name] for name in names])
+
+        responses = features_future.result()
+        target_responses = target_future.result()
+        if responses is None or target_responses is None:
+            return None, None
 
         # Process the features
         features = get_features_from_response(responses)
         if features is None:
-            return None
+            return None, None
 
-        # Fetch the target
-        longai_target_responses = fetch_meteo_data(start_date, end_date, fetch_target = True)
-        if longai_target_responses is None:
-            return None
-        
-        kushiyara_target_responses = fetch_meteo_data(start_date, end_date, fetch_target = True , coords = (24.6266, 91.7782))
-        if kushiyara_target_responses is None:
-            return None
-        
-        singla_target_responses = fetch_meteo_data(start_date, end_date, fetch_target = True , coords=(24.68216,92.4457))
-        if singla_target_responses is None:
-            return None
-        
-        unknown_target_responses = fetch_meteo_data(start_date, end_date, fetch_target = True , coords=(24.85,92.32))
-        if unknown_target_responses is None:
-            return None
+        # Process the target, one response per gauge in request order
+        targets = {}
+        for index, name in enumerate(names):
+            river_discharge_data = get_target_from_response(target_responses, name = name, index = index)
+            if river_discharge_data is None:
+                return None, None
+            targets[name] = river_discharge_data
 
-        # Process the target
-        longai_river_discharge_data = get_target_from_response(longai_target_responses)
-        if longai_river_discharge_data is None:
-            return None
-        
-        kushiyara_river_discharge_data = get_target_from_response(kushiyara_target_responses , name = "Kushi_discharge (m³/s)")
-        if kushiyara_river_discharge_data is None:
-            return None
-        
-        singla_river_discharge_data = get_target_from_response(singla_target_responses , name = "Singla_discharge (m³/s)")
-        if singla_river_discharge_data is None:
-            return None
-        
-        unknown_river_discharge_data = get_target_from_response(unknown_target_responses , name = "unknown_discharge (m³/s)")
-        if unknown_river_discharge_data is None:
+        return features, targets
+
+    except Exception as e:
+        print("Error fetching the raw data: ", e)
+        return None, None
+
+
+def fetch_and_process_data(start_date="2025-02-22", end_date="2025-03-03"):
+
+    try:
+        features, targets = fetch_raw_data(start_date, end_date)
+        if features is None:
             return None
 
         # Merge the features and target
-        merged_df = merge_features_target(features, longai_river_discharge_data)
-        merged_df = merge_features_target(merged_df, kushiyara_river_discharge_data)
-        merged_df = merge_features_target(merged_df, singla_river_discharge_data)
-        merged_df = merge_features_target(merged_df, unknown_river_discharge_data)
+        merged_df = features
+        for river_discharge_data in targets.values():
+            merged_df = merge_features_target(merged_df, river_discharge_data)
         if merged_df is None:
             return None
         
@@ -238,4 +333,52 @@ def fetch_and_process_data(start_date="2025-02-22", end_date="2025-03-03"):
     except Exception as e:
         print("Error fetching and processing the data: ", e)
         return None
-    
+
+
+def fetch_and_process_data_incremental(start_date="2025-02-22", end_date="2025-03-03", store=None):
+    """
+    Same output as fetch_and_process_data, but backed by a local TimeSeriesStore:
+    only the days missing from the store are downloaded, then the window is
+    read back from disk. The last days are never settled in the store, so
+    they are downloaded again on each call, past the HTTP cache.
+    """
+
+    try:
+        store = store or get_default_store()
+
+        # Find the span that is missing for at least one of the series
+        gaps = store.missing_ranges("archive", ARCHIVE_COORDS, start_date, end_date)
+        for coords in GAUGES.values():
+            gaps += store.missing_ranges("flood", coords, start_date, end_date)
+
+        count("store_days_missing", sum((gap_end - gap_start).days + 1 for gap_start, gap_end in gaps))
+        if gaps:
+            fetch_start = min(gap_start for gap_start, _ in gaps)
+            fetch_end = max(gap_end for _, gap_end in gaps)
+            features, targets = fetch_raw_data(str(fetch_start), str(fetch_end))
+            if features is None:
+                return None
+
+            store.append("archive", ARCHIVE_COORDS, features)
+            for name, river_discharge_data in targets.items():
+                store.append("flood", GAUGES[name], river_discharge_data.rename(columns={name: "river_discharge"}))
+
+        # Read the requested window back from the store
+        with stage("store_read"):
+            features = store.read("archive", ARCHIVE_COORDS, start_date, end_date)
+            targets = {name: store.read("flood", coords, start_date, end_date) for name, coords in GAUGES.items()}
+        if features is None or any(target is None for target in targets.values()):
+            return None
+
+        merged_df = features
+        for name, river_discharge_data in targets.items():
+            merged_df = merge_features_target(merged_df, river_discharge_data.rename(columns={"river_discharge": name}))
+        if merged_df is None:
+            return None
+
+        merged_df.interpolate(method="linear", inplace=True)
+        return merged_df
+
+    except Exception as e:
+        print("Error fetching and processing the data incrementally: ", e)
+        return None
@@ -0,0 +1,80 @@
+"""
+Reduction of long series to about screen resolution before plotting.
+
+Both methods return the positions of the points to draw, so several
+columns of a frame can be reduced consistently:
+- `minmax_indices` keeps the lowest and the highest point of each bucket,
+  so every peak (and trough) of the series is drawn exactly;
+- `lttb_indices` (Largest-Triangle-Three-Buckets) keeps one point per
+  bucket, the one that best preserves the visual shape of the line.
+
+`downsample_indices` adds the points that must always be drawn (first,
+last, and e.g. the days with a flood marker) to either method.
+"""
+import numpy as np
+
+
+def minmax_indices(y, n_buckets):
+    """Positions of the minimum and maximum of `y` in each of `n_buckets` equal buckets."""
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+
+    bucket = np.arange(n) * n_buckets // n
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    # Sorted by bucket, then by value: each bucket's minimum comes first and its maximum last
+    order = np.lexsort((y, bucket))
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def lttb_indices(x, y, n_out):
+    """Positions of the `n_out` points picked by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # First and last points are kept; the others are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        # Area of the triangle (previous point, candidate, mean of the next bucket)
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_indices(x, y, max_points, method="minmax", keep=None):
+    """
+    Positions of at most about `max_points` points of the series (x, y),
+    plus the positions in `keep`. NaNs are skipped once the series is
+    reduced. Series that already fit are returned whole.
+    """
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if method == "lttb":
+        x = np.asarray(x)
+        x = x.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+        picked = valid[lttb_indices(x[valid], y[valid], max_points)]
+    elif method == "minmax":
+        picked = valid[minmax_indices(y[valid], max_points // 2)]
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    always = [0, n - 1] if keep is None else np.concatenate([[0, n - 1], np.asarray(keep, dtype=np.int64)])
+    return np.union1d(picked, np.clip(always, 0, n - 1))
@@ -0,0 +1,105 @@
+"""
+Uncertainty bands of the forecast, from an ensemble of perturbed members.
+
+predict_flood gives one value per day. Here `members` copies of the last
+observed days are run through the same recursion: the inputs of the last
+observed day are perturbed (measurement error), and each member's
+predicted rain and discharge get the models' own next-day error before
+becoming the next day's inputs, so the spread compounds over the horizon.
+The noise is log-normal on 1 + value, with the spreads of the shipped
+models' next-day errors over 2015-2025.
+
+The members live in (days x members) arrays: at each horizon step, every
+member is scored in one batched call per model, and the rolling windows
+run on the last MAX_WINDOW days only. The cost is that of one forecast
+with `members` rows per call instead of one. With zero spreads, every
+member reproduces the point forecast exactly.
+
+The bands are added as "<column>_q10" / "<column>_q90" (for the default
+quantiles) on the last observed row and the forecast rows.
+"""
+import numpy as np
+
+from feature_engine import MAX_WINDOW, compute_window_features
+from instrumentation import stage
+from modeling_utils import add_interactions, input_columns, recursive_inputs, score_features
+
+ENSEMBLE_MEMBERS = 50
+QUANTILES = (0.1, 0.9)
+
+# Standard deviations of log(1 + value)
+INPUT_SPREAD = {"rain_sum (mm)": 0.2, "Longai_discharge (m³/s)": 0.03}
+MODEL_SPREAD = {"predicted_rain": 0.9, "predicted_discharge": 0.07}
+
+
+def band_column(name, quantile):
+    return f"{name}_q{round(quantile * 100)}"
+
+
+def _perturb(rng, values, spread):
+    if not spread:
+        return values
+    noise = np.exp(rng.normal(0.0, spread, size=values.shape))
+    return np.maximum((values + 1) * noise - 1, 0)
+
+
+@stage("ensemble")
+def add_ensemble_bands(data, members=ENSEMBLE_MEMBERS, quantiles=QUANTILES, input_spread=INPUT_SPREAD,
+                       model_spread=MODEL_SPREAD, seed=0):
+    """
+    Adds the quantile columns to a predict_flood output (with or without
+    forecast rows) and returns it; on error, returns it without bands.
+    """
+
+    try:
+        return _add_bands(data, members, quantiles, input_spread, model_spread, seed)
+
+    except Exception as e:
+        print(f"An error occurred while computing the ensemble bands: {e}")
+        return data
+
+
+def _add_bands(data, members, quantiles, input_spread, model_spread, seed):
+    rng = np.random.default_rng(seed)
+
+    forecast = data["forecast"].to_numpy(dtype=bool)
+    observed = np.flatnonzero(~forecast)
+    rows = np.concatenate([observed[-1:], np.flatnonzero(forecast)])
+
+    # The last observed days, one column per member
+    tail = {column: np.repeat(data[column].to_numpy(dtype=np.float64)[observed[-MAX_WINDOW:], None], members, axis=1)
+            for column in input_columns}
+    for column, spread in input_spread.items():
+        tail[column][-1] = _perturb(rng, tail[column][-1], spread)
+
+    bands = {name: np.empty((len(rows), len(quantiles))) for name in ["predicted_rain", "predicted_discharge", "proba"]}
+    for step, row in enumerate(rows):
+        if step > 0:
+            # Each member's predictions become its next day's observations, other inputs persist
+            for column in tail:
+                tail[column] = np.vstack([tail[column][1:], tail[column][-1:]])
+            for prediction, columns in recursive_inputs.items():
+                for column in columns:
+                    if column in tail:
+                        tail[column][-1] = predicted[prediction]
+
+        features = {column: values[-1] for column, values in tail.items()}
+        features.update({name: values[-1] for name, values in compute_window_features(tail).items()})
+        month = data["date"].iloc[row].month
+        features["month"] = np.full(members, month)
+        features["season"] = np.full(members, month % 12 // 3)
+        add_interactions(features)
+
+        scores = score_features(features)
+        predicted = {name: _perturb(rng, scores[name].astype(np.float64), model_spread[name])
+                     for name in ["predicted_rain", "predicted_discharge"]}
+        predicted["proba"] = scores["proba"]
+        for name, values in predicted.items():
+            bands[name][step] = np.quantile(values, quantiles)
+
+    for name, values in bands.items():
+        for i, quantile in enumerate(quantiles):
+            column = band_column(name, quantile)
+            data[column] = np.nan
+            data.loc[data.index[rows], column] = values[:, i]
+    return data
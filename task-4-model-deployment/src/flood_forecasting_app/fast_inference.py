@@ -0,0 +1,168 @@
+"""
+Fast inference paths for the XGBoost models.
+
+FastPredictor skips the scikit-learn wrapper: inputs are converted once to a
+contiguous float32 array and scored with `Booster.inplace_predict`, without
+building a DMatrix. If the model is wrapped in a feature selector (an
+sklearn RFE with `support_` and `estimator_`), the column selection is
+applied to that array, or folded into the compiled trees.
+
+With `backend="numpy"` the trees are compiled into flat NumPy arrays and
+evaluated level by level for all rows and trees at once, which avoids the
+per-call overhead of XGBoost for single rows and small batches.
+"""
+import json
+import threading
+import weakref
+
+import numpy as np
+
+# Objectives whose raw score needs no link function other than a softmax,
+# and whose base_score is already a margin: the ones the numpy backend handles
+COMPILABLE_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "multi:softmax", "multi:softprob"}
+
+
+def as_float32(X):
+    """Contiguous float32 copy (or view) of a DataFrame / array, as XGBoost uses internally."""
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+class CompiledTrees:
+    """A boosted tree ensemble flattened into padded (trees x nodes) arrays."""
+
+    def __init__(self, booster, columns=None):
+        model = json.loads(booster.save_raw(raw_format="json"))
+        trees = model["learner"]["gradient_booster"]["model"]["trees"]
+        tree_info = model["learner"]["gradient_booster"]["model"]["tree_info"]
+
+        n_nodes = max(len(tree["left_children"]) for tree in trees)
+        shape = (len(trees), n_nodes)
+        self.left = np.full(shape, -1, dtype=np.int32)
+        self.right = np.full(shape, -1, dtype=np.int32)
+        self.feature = np.zeros(shape, dtype=np.int32)
+        self.threshold = np.zeros(shape, dtype=np.float32)
+        self.default_left = np.zeros(shape, dtype=bool)
+        for i, tree in enumerate(trees):
+            n = len(tree["left_children"])
+            self.left[i, :n] = tree["left_children"]
+            self.right[i, :n] = tree["right_children"]
+            self.feature[i, :n] = tree["split_indices"]
+            self.threshold[i, :n] = tree["split_conditions"]  # leaf value on leaves
+            self.default_left[i, :n] = tree["default_left"]
+
+        # Fold a feature selection in: tree features index the full input directly
+        if columns is not None:
+            self.feature = np.asarray(columns, dtype=np.int32)[self.feature]
+
+        self.is_leaf = self.left == -1
+        self.tree_class = np.asarray(tree_info, dtype=np.int32)
+        self.n_classes = int(self.tree_class.max()) + 1
+        self.depth = _max_depth(self.left, self.right)
+
+    def margin(self, X, base_margin, batch_size=4096):
+        """Raw scores, shape (rows, classes)."""
+        n_trees, n_nodes = self.left.shape
+        # Flat views: node j of tree t lives at t * n_nodes + j, so each level is a 1-d take
+        left, right = self.left.ravel(), self.right.ravel()
+        feature, threshold = self.feature.ravel(), self.threshold.ravel()
+        default_left, is_leaf = self.default_left.ravel(), self.is_leaf.ravel()
+        tree_offset = np.arange(n_trees, dtype=np.int64) * n_nodes
+
+        out = np.empty((len(X), self.n_classes), dtype=np.float32)
+        for start in range(0, len(X), batch_size):
+            batch = X[start:start + batch_size]
+            row_offset = np.arange(len(batch), dtype=np.int64)[:, None] * batch.shape[1]
+            flat_batch = batch.ravel()
+            node = np.broadcast_to(tree_offset, (len(batch), n_trees)).copy()
+            for _ in range(self.depth):
+                value = flat_batch.take(row_offset + feature.take(node))
+                go_left = np.where(np.isnan(value), default_left.take(node), value < threshold.take(node))
+                child = tree_offset + np.where(go_left, left.take(node), right.take(node))
+                node = np.where(is_leaf.take(node), node, child)
+            leaves = threshold.take(node)
+            for c in range(self.n_classes):
+                out[start:start + len(batch), c] = leaves[:, self.tree_class == c].sum(axis=1, dtype=np.float32)
+        return out + base_margin
+
+
+def _max_depth(left, right):
+    depth = np.zeros(left.shape, dtype=np.int32)
+    for i in range(left.shape[0]):
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if left[i, node] != -1:
+                for child in (left[i, node], right[i, node]):
+                    depth[i, child] = depth[i, node] + 1
+                    stack.append(child)
+    return int(depth.max())
+
+
+class FastPredictor:
+
+    def __init__(self, model, backend="booster"):
+        # An RFE-style selector is unwrapped, keeping its column selection
+        self.columns = None
+        if hasattr(model, "support_") and hasattr(model, "estimator_"):
+            self.columns = np.flatnonzero(model.support_)
+            model = model.estimator_
+
+        # No reference to the model itself: get_predictor's cache entry dies with it
+        self.booster = model.get_booster()
+        self.backend = backend
+        self.classes_ = getattr(model, "classes_", None)
+
+        config = json.loads(self.booster.save_config())["learner"]
+        self.objective = config["objective"]["name"]
+        self.base_margin = np.asarray(
+            json.loads(config["learner_model_param"]["base_score"]), dtype=np.float32)
+        self.compiled = None
+        if backend == "numpy":
+            if self.objective not in COMPILABLE_OBJECTIVES:
+                raise ValueError(f"The numpy backend does not support the {self.objective} objective")
+            self.compiled = CompiledTrees(self.booster, self.columns)
+
+    def _select(self, X):
+        X = as_float32(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.columns is not None and self.compiled is None:
+            X = np.ascontiguousarray(X[:, self.columns])
+        return X
+
+    def margin(self, X):
+        X = self._select(X)
+        if self.compiled is not None:
+            return self.compiled.margin(X, self.base_margin)
+        margin = self.booster.inplace_predict(X, predict_type="margin")
+        return margin.reshape(len(X), -1)
+
+    def predict(self, X):
+        """Same as the scikit-learn `predict`: values for regressors, labels for classifiers."""
+        if self.classes_ is not None:
+            return self.classes_[self.predict_proba(X).argmax(axis=1)]
+        if self.compiled is not None:
+            return self.margin(X)[:, 0]
+        return self.booster.inplace_predict(self._select(X), predict_type="value").reshape(-1)
+
+    def predict_proba(self, X):
+        margin = self.margin(X)
+        if margin.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        exp = np.exp(margin - margin.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+# model -> {backend: FastPredictor}; a model replaced in the registry drops its predictors
+_predictors = weakref.WeakKeyDictionary()
+_predictors_lock = threading.Lock()
+
+
+def get_predictor(model, backend="booster"):
+    """FastPredictor for a loaded model, built once per model object and backend."""
+    with _predictors_lock:
+        by_backend = _predictors.setdefault(model, {})
+        if backend not in by_backend:
+            by_backend[backend] = FastPredictor(model, backend)
+        return by_backend[backend]
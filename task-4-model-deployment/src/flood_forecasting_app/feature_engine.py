@@ -0,0 +1,124 @@
+from collections import deque
+
+import numpy as np
+
+
+# Rolling window features: (output column, source column, window in rows, aggregation).
+# Windows are trailing and use min_periods=1, like pandas' rolling().
+WINDOW_FEATURES = [
+    ("rain_last_3_days", "rain_sum (mm)", 3, "sum"),
+    ("rain_last_7_days", "rain_sum (mm)", 7, "sum"),
+    ("Longai_discharge_last_3_days", "Longai_discharge (m³/s)", 3, "sum"),
+    ("Kushi_discharge_last_3_days", "Kushi_discharge (m³/s)", 3, "sum"),
+    ("Singla_discharge_last_3_days", "Singla_discharge (m³/s)", 3, "sum"),
+    ("Longai_discharge_last_7_days", "Longai_discharge (m³/s)", 7, "sum"),
+    ("Kushi_discharge_last_7_days", "Kushi_discharge (m³/s)", 7, "sum"),
+    ("Singla_discharge_last_7_days", "Singla_discharge (m³/s)", 7, "sum"),
+    ("soil_moisture_trend", "soil_moisture_100_to_255cm (m³/m³)", 5, "mean"),
+]
+
+MAX_WINDOW = max(window for _, _, window, _ in WINDOW_FEATURES)
+
+
+def window_sources(specs=WINDOW_FEATURES):
+    return list(dict.fromkeys(source for _, source, _, _ in specs))
+
+
+def rolling_windows(values, windows):
+    """
+    Trailing window sums and counts of non-NaN values along axis 0, for
+    several window lengths at once, by differencing one cumulative sum.
+
+    `values` can have any number of trailing dimensions (e.g. days x sources,
+    or days x locations x sources). Returns {window: (sums, counts)}.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+
+    # Prepend a zero row so that cumsum[t + 1] - cumsum[t + 1 - w] is the sum over (t - w, t]
+    padding = np.zeros((1,) + values.shape[1:])
+    cumsum = np.concatenate([padding, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    cumcount = np.concatenate([padding, np.cumsum(valid, axis=0)])
+
+    n = values.shape[0]
+    lagged = np.maximum(np.arange(1, n + 1) - np.asarray(windows)[:, None], 0)
+    return {
+        window: (cumsum[1:] - cumsum[lag], cumcount[1:] - cumcount[lag])
+        for window, lag in zip(windows, lagged)
+    }
+
+
+def compute_window_features(data, specs=WINDOW_FEATURES):
+    """
+    Computes every rolling feature of `specs` in one pass over the stacked
+    source columns of `data` (a DataFrame or a {column: array} mapping).
+    The arrays may be 2-d (days x locations) to compute a whole grid at once.
+    Returns {output column: array}.
+    """
+    sources = window_sources(specs)
+    stacked = np.stack([np.asarray(data[source], dtype=np.float64) for source in sources], axis=-1)
+    windows = sorted({window for _, _, window, _ in specs})
+    rolled = rolling_windows(stacked, windows)
+
+    features = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name, source, window, how in specs:
+            sums, counts = rolled[window]
+            column = sources.index(source)
+            result = sums[..., column] if how == "sum" else sums[..., column] / counts[..., column]
+            features[name] = np.where(counts[..., column] > 0, result, np.nan)
+    return features
+
+
+class RollingFeatureState:
+    """
+    Streaming version of compute_window_features: keeps the last values and
+    running sums of each window, so appending one day costs O(1) whatever
+    the length of the history.
+    """
+
+    def __init__(self, specs=WINDOW_FEATURES):
+        self.specs = specs
+        self._windows = {(source, window): {"values": deque(maxlen=window), "sum": 0.0, "count": 0}
+                         for _, source, window, _ in specs}
+
+    @classmethod
+    def from_frame(cls, data, specs=WINDOW_FEATURES):
+        """Warms the state up with the last rows of `data`."""
+        state = cls(specs)
+        tail = data.iloc[-MAX_WINDOW:]
+        for source in window_sources(specs):
+            for value in tail[source].to_numpy(dtype=np.float64):
+                state._push(source, value)
+        return state
+
+    def _push(self, source, value):
+        for (window_source, _), window in self._windows.items():
+            if window_source != source:
+                continue
+            values = window["values"]
+            if len(values) == values.maxlen:
+                dropped = values[0]
+                if not np.isnan(dropped):
+                    window["sum"] -= dropped
+                    window["count"] -= 1
+            values.append(value)
+            if not np.isnan(value):
+                window["sum"] += value
+                window["count"] += 1
+
+    def update(self, row):
+        """Adds one day (a mapping with the source columns) and returns its window features."""
+        for source in window_sources(self.specs):
+            self._push(source, float(row[source]))
+
+        features = {}
+        for name, source, window_length, how in self.specs:
+            window = self._windows[(source, window_length)]
+            if window["count"] == 0:
+                features[name] = np.nan
+            elif how == "sum":
+                features[name] = window["sum"]
+            else:
+                features[name] = window["sum"] / window["count"]
+        return features
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+from instrumentation import count
+
+
+class ForecastCache:
+    """
+    Process-wide cache of pipeline results, shared by every session.
+
+    - entries expire after `ttl` seconds and the least recently used ones
+      are evicted beyond `maxsize`;
+    - concurrent requests for the same key are deduplicated: the first one
+      computes, the others wait for its result (single flight);
+    - with `disk_dir`, entries are also pickled to disk so they survive a
+      restart of the app; each write prunes the directory to the same TTL
+      and size.
+
+    `None` results (failed fetches) are returned but never cached.
+    """
+
+    def __init__(self, maxsize=64, ttl=3600, disk_dir=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            value = self._get_memory(key)
+            if value is not None:
+                self._hit()
+                return _copy(value)
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                count("forecast_cache_coalesced")
+
+        if not owner:
+            return _copy(future.result())
+
+        # Disk and compute run outside the lock: other keys are served meanwhile
+        try:
+            value = self._get_disk(key)
+            if value is not None:
+                with self._lock:
+                    self._hit()
+            else:
+                with self._lock:
+                    self.misses += 1
+                count("forecast_cache_misses")
+                value = compute()
+                if value is not None:
+                    self._put(key, value)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return _copy(value)
+
+    def _hit(self):
+        self.hits += 1
+        count("forecast_cache_hits")
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _get_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path)  # recently used: pruned last
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if entry["key"] != key or entry["expires_at"] < time.time():
+            return None
+        with self._lock:
+            self._remember(key, entry["expires_at"], entry["value"])
+        return entry["value"]
+
+    def _put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"key": key, "expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """
+        Deletes the expired files and the least recently used ones beyond
+        `maxsize`. A file's mtime is its last write or disk hit: one left
+        untouched for `ttl` seconds has expired.
+        """
+        files = []
+        for path in self.disk_dir.glob("*.pkl"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:  # pruned by another process
+                continue
+        files.sort(reverse=True)
+        oldest_valid = time.time() - self.ttl
+        for i, (mtime, path) in enumerate(files):
+            if i >= self.maxsize or mtime < oldest_valid:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _remember(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return self.disk_dir / (hashlib.sha256(repr(key).encode()).hexdigest() + ".pkl")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _copy(value):
+    # Callers get their own copy, so one session cannot alter another's data
+    return value.copy() if hasattr(value, "copy") else value
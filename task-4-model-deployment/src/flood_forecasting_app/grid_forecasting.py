@@ -0,0 +1,221 @@
+"""
+Flood risk for every cell of a lat/lon grid (see the "grids" of locations.json).
+
+The cells are fetched in chunks of multi-coordinate calls: one archive call
+and one flood call per chunk, with a bounded number of chunks in flight.
+Each response is decoded straight into one (locations x days x variables)
+float32 array, so memory grows linearly with the number of cells.
+
+Features are then built for all cells at once (the rolling windows run on
+a days x locations array) and each model scores the whole grid in a single
+call. Every cell uses its own river discharge in place of the Longai gauge;
+the other gauges of the basin are fetched once and shared by all cells.
+
+    python grid_forecasting.py --start 2025-02-01 --end 2025-03-01 --output grid.parquet
+"""
+import argparse
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from data_collection_utils import (DAILY_COLUMNS, HOURLY_COLUMNS, SECONDS_PER_DAY, daily_means,
+                                   read_variables, submit_fetch)
+from feature_engine import compute_window_features
+from instrumentation import pipeline_run, stage
+from locations import GAUGES, grid_points
+from modeling_utils import add_interactions, score_features
+
+# Variables stored per cell, in the order of the last axis of GridData.values
+LOCAL_DISCHARGE = "Longai_discharge (m³/s)"
+GRID_VARIABLES = DAILY_COLUMNS + list(HOURLY_COLUMNS) + ["river_discharge"]
+
+# Gauges shared by the whole basin: every one but the local river
+BASIN_GAUGES = {name: coords for name, coords in GAUGES.items() if name != LOCAL_DISCHARGE}
+
+
+class GridData:
+    """
+    Daily values of every grid cell as one (locations x days x variables)
+    float32 array, with the basin gauge discharges shared by all cells.
+    """
+
+    def __init__(self, points, dates, values, basin):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.dates = pd.DatetimeIndex(dates)
+        self.values = values
+        self.basin = basin
+
+    def __getitem__(self, name):
+        """(locations x days) view of one variable."""
+        return self.values[:, :, GRID_VARIABLES.index(name)]
+
+
+def _day_index(times, first_day, n_days):
+    days = times // SECONDS_PER_DAY - first_day
+    keep = (days >= 0) & (days < n_days)
+    return days[keep], keep
+
+
+def _fill_archive(values, responses, first_day):
+    """Decodes one archive response per cell into values[cell, day, variable]."""
+    n_daily, n_hourly = len(DAILY_COLUMNS), len(HOURLY_COLUMNS)
+    decimals = np.array(list(HOURLY_COLUMNS.values()))
+    for cell, response in enumerate(responses):
+        times, block = read_variables(response.Daily(), n_daily)
+        days, keep = _day_index(times, first_day, values.shape[1])
+        values[cell, days, :n_daily] = block[:, keep].T
+
+        hourly_times, hourly_block = read_variables(response.Hourly(), n_hourly)
+        hourly_days, means = daily_means(hourly_times, hourly_block)
+        days, keep = _day_index(hourly_days * SECONDS_PER_DAY, first_day, values.shape[1])
+        for i in range(n_hourly):
+            values[cell, days, n_daily + i] = means[i, keep].round(decimals[i])
+
+
+def _fill_discharge(values, responses, first_day):
+    for cell, response in enumerate(responses):
+        times, block = read_variables(response.Daily(), 1)
+        days, keep = _day_index(times, first_day, values.shape[1])
+        values[cell, days, -1] = block[0, keep]
+
+
+@stage("grid_fetch")
+def fetch_grid_data(start_date, end_date, points, chunk_size=100, max_inflight=4):
+    """
+    Fetches the archive variables and the river discharge of every point,
+    `chunk_size` points per call. Returns a GridData, or None if any call failed.
+    """
+
+    try:
+        dates = pd.date_range(start_date, end_date, freq="D")
+        first_day = dates[0].value // (SECONDS_PER_DAY * 10**9)
+        values = np.full((len(points), len(dates), len(GRID_VARIABLES)), np.nan, dtype=np.float32)
+
+        names = list(BASIN_GAUGES)
+        basin_future = submit_fetch(start_date, end_date, fetch_target = True,
+                                    coords = [BASIN_GAUGES[name] for name in names])
+
+        def collect(cells, archive_future, flood_future):
+            archive_responses, flood_responses = archive_future.result(), flood_future.result()
+            if archive_responses is None or flood_responses is None:
+                return False
+            with stage("grid_decode", rows=len(archive_responses)):
+                _fill_archive(values[cells], archive_responses, first_day)
+                _fill_discharge(values[cells], flood_responses, first_day)
+            return True
+
+        # Responses are decoded as chunks complete, so only a few are held at a time
+        pending = deque()
+        for start in range(0, len(points), chunk_size):
+            cells = slice(start, start + chunk_size)
+            coords = [tuple(point) for point in points[cells]]
+            pending.append((cells, submit_fetch(start_date, end_date, coords = coords),
+                            submit_fetch(start_date, end_date, fetch_target = True, coords = coords)))
+            if len(pending) >= max_inflight and not collect(*pending.popleft()):
+                return None
+        while pending:
+            if not collect(*pending.popleft()):
+                return None
+
+        basin_responses = basin_future.result()
+        if basin_responses is None:
+            return None
+        basin_values = np.full((len(names), len(dates), 1), np.nan, dtype=np.float32)
+        _fill_discharge(basin_values, basin_responses, first_day)
+        basin = {name: basin_values[i, :, 0] for i, name in enumerate(names)}
+
+        return GridData(points, dates, values, basin)
+
+    except Exception as e:
+        print("Error fetching the grid data: ", e)
+        return None
+
+
+def interpolate_days(grid):
+    """Linear interpolation of missing days, cell by cell, as fetch_and_process_data does."""
+    n_cells, n_days, n_variables = grid.values.shape
+    by_day = pd.DataFrame(grid.values.transpose(1, 0, 2).reshape(n_days, -1))
+    filled = by_day.interpolate(method="linear").to_numpy(dtype=np.float32)
+    grid.values = np.ascontiguousarray(filled.reshape(n_days, n_cells, n_variables).transpose(1, 0, 2))
+    for name, series in grid.basin.items():
+        grid.basin[name] = pd.Series(series).interpolate(method="linear").to_numpy(dtype=np.float32)
+    return grid
+
+
+@stage("grid_features")
+def grid_features(grid):
+    """
+    The model features of every cell and day, as {column: (days x locations)}
+    arrays (days first, the axis the rolling windows run along).
+    """
+    n_cells, n_days, _ = grid.values.shape
+    data = {name: grid[name].T for name in GRID_VARIABLES}
+    data[LOCAL_DISCHARGE] = data.pop("river_discharge")
+    for name, series in grid.basin.items():
+        data[name] = np.broadcast_to(series[:, None], (n_days, n_cells))
+
+    month = grid.dates.month.to_numpy()[:, None]
+    data["month"] = np.broadcast_to(month, (n_days, n_cells))
+    data["season"] = np.broadcast_to(month % 12 // 3, (n_days, n_cells))
+
+    data.update(compute_window_features(data))
+    add_interactions(data)
+    return data
+
+
+@stage("grid_predict")
+def score_grid(grid):
+    """Next-day rain, discharge and flood for every cell and day, as {column: (locations x days)}."""
+    features = grid_features(grid)
+    n_days, n_cells = features["month"].shape
+    predictions = score_features(features)
+    return {name: values.reshape(n_days, n_cells).T for name, values in predictions.items()}
+
+
+def to_frame(grid, predictions):
+    """Long (one row per cell and day) DataFrame of the grid predictions."""
+    n_cells, n_days, _ = grid.values.shape
+    frame = pd.DataFrame({
+        "latitude": np.repeat(grid.points[:, 0], n_days),
+        "longitude": np.repeat(grid.points[:, 1], n_days),
+        "date": np.tile(grid.dates.to_numpy(), n_cells),
+        "river_discharge": grid["river_discharge"].reshape(-1),
+    })
+    for name, values in predictions.items():
+        frame[name] = values.reshape(-1)
+    return frame
+
+
+def run_grid_forecast(start_date, end_date, grid="karimganj_district", chunk_size=100):
+    """fetch -> features -> predict over a whole grid; None if the data could not be fetched."""
+    with pipeline_run("grid_forecast"):
+        data = fetch_grid_data(start_date, end_date, grid_points(grid), chunk_size=chunk_size)
+        if data is None:
+            return None
+        data = interpolate_days(data)
+        return to_frame(data, score_grid(data))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--grid", default="karimganj_district", help="grid name in locations.json")
+    parser.add_argument("--chunk-size", type=int, default=100, help="locations per API call")
+    parser.add_argument("--output", required=True, help=".csv or .parquet file")
+    args = parser.parse_args(argv)
+
+    forecast = run_grid_forecast(args.start, args.end, args.grid, args.chunk_size)
+    if forecast is None:
+        raise SystemExit("Could not fetch the grid data")
+    if args.output.endswith(".parquet"):
+        forecast.to_parquet(args.output, index=False)
+    else:
+        forecast.to_csv(args.output, index=False)
+    n_cells = len(forecast[["latitude", "longitude"]].drop_duplicates())
+    print(f"{len(forecast)} rows ({n_cells} cells) written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
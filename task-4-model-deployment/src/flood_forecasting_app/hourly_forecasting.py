@@ -0,0 +1,231 @@
+"""
+Hourly forecasting mode (opt-in), for sub-daily lead time on flash floods.
+
+The daily pipeline averages the hourly pull to one value per day. Here the
+hourly values are kept instead, in an HourlyBuffer: one float32 column per
+variable over a fixed number of hours (30 days by default), written as a
+ring so the memory stays the same however long it runs. The flood API only
+has daily discharges, which hold for every hour of their day.
+
+Every hour then gets the features of the daily models, computed over the
+24 hours ending at that hour instead of the calendar day:
+- daily equivalents: trailing 24-hour sum (rain), mean, min and max;
+- the multi-day windows of feature_engine, taken over those equivalents
+  24, 48, ... hours back (the hours are folded into a days x 24 array, so
+  the same vectorized rolling windows apply).
+At 23:00 UTC these are exactly the daily features, and the predictions
+those of the daily pipeline; in between they follow the hourly rain and
+soil moisture. Like the daily rows, each hour predicts the next 24 hours.
+All the hours are scored in one call per model. Nothing goes through
+DataFrames: the features are plain arrays.
+
+    python hourly_forecasting.py --end 2025-03-01 --days 30 --last 48
+"""
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_collection_utils import HOURLY_COLUMNS, HOURLY_EXTRA_COLUMNS, SECONDS_PER_DAY, read_variables, submit_fetch
+from feature_engine import compute_window_features, rolling_windows
+from instrumentation import pipeline_run, stage
+from locations import GAUGES
+from modeling_utils import add_interactions, score_features
+
+HOURS_PER_DAY = 24
+SECONDS_PER_HOUR = 3600
+
+# Columns of the HourlyBuffer: the archive's hourly variables, then the gauges
+HOURLY_VARIABLES = list(HOURLY_COLUMNS) + HOURLY_EXTRA_COLUMNS + list(GAUGES)
+
+# Daily model inputs as aggregates of the trailing 24 hours: (column, hourly source, aggregation)
+DAILY_EQUIVALENTS = [
+    ("rain_sum (mm)", "rain (mm)", "sum"),
+    ("temperature_2m_max (°C)", "temperature_2m (°C)", "max"),
+    ("temperature_2m_min (°C)", "temperature_2m (°C)", "min"),
+    ("temperature_2m_mean (°C)", "temperature_2m (°C)", "mean"),
+] + [(column, column, "mean") for column in HOURLY_COLUMNS] + [(gauge, gauge, "mean") for gauge in GAUGES]
+
+
+class HourlyBuffer:
+    """
+    The last `capacity` hours of each variable, as one (hours x variables)
+    float32 array used as a ring: hour h lives in row h % capacity.
+    """
+
+    def __init__(self, variables=HOURLY_VARIABLES, capacity=30 * HOURS_PER_DAY):
+        self.variables = list(variables)
+        self.capacity = capacity
+        self.values = np.full((capacity, len(self.variables)), np.nan, dtype=np.float32)
+        self.last_hour = None  # hours since the epoch of the newest row
+
+    def write(self, hours, block, variables):
+        """
+        Writes a (variables x hours) block, e.g. as read_variables returns it.
+        Hours already in the buffer are overwritten, hours older than the
+        window are dropped, and newer hours push the oldest ones out.
+        """
+        hours = np.asarray(hours, dtype=np.int64)
+        if len(hours) == 0:
+            return
+        newest = int(hours.max())
+        if self.last_hour is None or newest > self.last_hour:
+            # Rows entering the window start empty, whatever they held before
+            first = newest - self.capacity + 1
+            if self.last_hour is not None:
+                first = max(first, self.last_hour + 1)
+            self.values[np.arange(first, newest + 1) % self.capacity] = np.nan
+            self.last_hour = newest
+
+        keep = hours > self.last_hour - self.capacity
+        columns = [self.variables.index(variable) for variable in variables]
+        self.values[np.ix_(hours[keep] % self.capacity, columns)] = np.asarray(block, dtype=np.float32)[:, keep].T
+
+    def window(self, n_hours=None):
+        """The hour numbers and the chronological (hours x variables) values of the last n_hours."""
+        n_hours = self.capacity if n_hours is None else min(n_hours, self.capacity)
+        hours = np.arange(self.last_hour - n_hours + 1, self.last_hour + 1)
+        return hours, self.values[hours % self.capacity]
+
+
+@stage("hourly_fetch")
+def fetch_hourly(start_date, end_date, buffer):
+    """Fetches the hourly archive variables and the gauge discharges into `buffer`; False if a call failed."""
+
+    try:
+        names = list(GAUGES)
+        archive_future = submit_fetch(start_date, end_date, hourly_extra = True)
+        flood_future = submit_fetch(start_date, end_date, fetch_target = True, coords = [GAUGES[name] for name in names])
+        archive_responses, flood_responses = archive_future.result(), flood_future.result()
+        if archive_responses is None or flood_responses is None:
+            return False
+
+        archive_variables = list(HOURLY_COLUMNS) + HOURLY_EXTRA_COLUMNS
+        times, block = read_variables(archive_responses[0].Hourly(), len(archive_variables))
+        buffer.write(times // SECONDS_PER_HOUR, block, archive_variables)
+
+        # Daily discharges hold for the 24 hours of their day
+        for index, name in enumerate(names):
+            times, block = read_variables(flood_responses[index].Daily(), 1)
+            hours = (times // SECONDS_PER_DAY * HOURS_PER_DAY)[:, None] + np.arange(HOURS_PER_DAY)
+            buffer.write(hours.reshape(-1), np.repeat(block, HOURS_PER_DAY, axis=1), [name])
+        return True
+
+    except Exception as e:
+        print("Error fetching the hourly data: ", e)
+        return False
+
+
+def trailing_day(values, how):
+    """Aggregate of each hour's trailing 24 hours (fewer at the start), ignoring NaNs."""
+    if how in ("sum", "mean"):
+        sums, counts = rolling_windows(values, [HOURS_PER_DAY])[HOURS_PER_DAY]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = sums if how == "sum" else sums / counts
+        return np.where(counts > 0, result, np.nan)
+
+    # min / max over a sliding view: NaNs (and the padding) can never win
+    fill = -np.inf if how == "max" else np.inf
+    padded = np.concatenate([np.full(HOURS_PER_DAY - 1, fill), np.where(np.isnan(values), fill, values)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, HOURS_PER_DAY)
+    result = windows.max(axis=1) if how == "max" else windows.min(axis=1)
+    return np.where(np.isinf(result), np.nan, result)
+
+
+def day_lagged_windows(data):
+    """
+    The multi-day window features at every hour, over the values 24, 48, ...
+    hours back: hours are folded into a (days x 24) array, front-padded with
+    NaNs, so the rolling windows run along the days for each hour of the day.
+    """
+    n_hours = len(next(iter(data.values())))
+    padding = -n_hours % HOURS_PER_DAY
+
+    def fold(values):
+        return np.concatenate([np.full(padding, np.nan), values]).reshape(-1, HOURS_PER_DAY)
+
+    windows = compute_window_features({name: fold(values) for name, values in data.items()})
+    return {name: values.reshape(-1)[padding:] for name, values in windows.items()}
+
+
+@stage("hourly_features")
+def hourly_features(hours, values, variables=HOURLY_VARIABLES):
+    """The daily model features at each hour, as {column: array over the hours}."""
+    values = values.astype(np.float64)
+    decimals = dict(HOURLY_COLUMNS)
+    data = {}
+    for column, source, how in DAILY_EQUIVALENTS:
+        data[column] = trailing_day(values[:, variables.index(source)], how)
+        if column in decimals:
+            data[column] = data[column].round(decimals[column])  # as the daily means are
+
+    month = (hours * SECONDS_PER_HOUR).astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+    data["month"] = month
+    data["season"] = month % 12 // 3
+
+    data.update(day_lagged_windows(data))
+    add_interactions(data)
+    return data
+
+
+@stage("hourly_predict")
+def score_hours(features):
+    """Next-24-hours rain, discharge and flood for every hour, one call per model."""
+    return score_features(features)
+
+
+class HourlyForecaster:
+    """An HourlyBuffer kept up to date incrementally, and scored on demand."""
+
+    def __init__(self, days=30):
+        self.buffer = HourlyBuffer(capacity=days * HOURS_PER_DAY)
+
+    def refresh(self, end_date):
+        """Fetches up to `end_date`, from the last (possibly partial) day held; False if a call failed."""
+        end_date = pd.Timestamp(end_date)
+        start_date = end_date - pd.Timedelta(hours=self.buffer.capacity - 1)
+        if self.buffer.last_hour is not None:
+            held = pd.Timestamp(self.buffer.last_hour * SECONDS_PER_HOUR, unit="s").normalize()
+            start_date = max(start_date, min(held, end_date))
+        return fetch_hourly(str(start_date.date()), str(end_date.date()), self.buffer)
+
+    def forecast(self, last_hours=None):
+        """
+        {"time": ..., "predicted_rain": ..., ...} arrays for the last `last_hours`
+        hours (all by default); the features still use the whole buffer.
+        """
+        hours, values = self.buffer.window()
+        predictions = score_hours(hourly_features(hours, values, self.buffer.variables))
+        keep = slice(-last_hours, None) if last_hours else slice(None)
+        result = {"time": (hours[keep] * SECONDS_PER_HOUR).astype("datetime64[s]")}
+        result.update({name: values[keep] for name, values in predictions.items()})
+        return result
+
+
+def run_hourly_forecast(end_date, days=30, last_hours=None):
+    """fetch -> features -> predict at hourly resolution; None if the data could not be fetched."""
+    with pipeline_run("hourly_forecast"):
+        forecaster = HourlyForecaster(days)
+        if not forecaster.refresh(end_date):
+            return None
+        return forecaster.forecast(last_hours)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--end", default=str(datetime.date.today()))
+    parser.add_argument("--days", type=int, default=30, help="days of hourly history kept")
+    parser.add_argument("--last", type=int, default=24, help="hours to print")
+    args = parser.parse_args(argv)
+
+    forecast = run_hourly_forecast(args.end, args.days, args.last)
+    if forecast is None:
+        raise SystemExit("Could not fetch the hourly data")
+    for i, time in enumerate(forecast["time"]):
+        print(f"{time}  rain {forecast['predicted_rain'][i]:7.2f} mm  "
+              f"discharge {forecast['predicted_discharge'][i]:8.2f} m³/s  flood {forecast['proba'][i]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Import-time report of the app pages, from `python -X importtime`.
+
+The top-level imports of each page are run in a fresh interpreter, as on
+a new worker, after `import streamlit` (the server has it loaded before
+any page runs): the report gives each page's own import time and its
+slowest modules. The best of a few runs is kept, to reduce the noise.
+
+    python import_report.py                          # print the report
+    python import_report.py --save imports.json      # store the totals, to track them
+    python import_report.py --baseline imports.json  # exit 1 if a page got 1.5x slower
+"""
+import argparse
+import ast
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Page scripts of app.py
+PAGES = {"main": "main.py", "about": "about.py"}
+PRELOADED = "streamlit"
+
+# Differences below this are noise, whatever the ratio
+TIME_SLACK_MS = 20
+
+
+def page_modules(page):
+    """Modules imported at the top level of a page script."""
+    tree = ast.parse((BASE_DIR / PAGES[page]).read_text(encoding="utf-8"))
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return [module for module in dict.fromkeys(modules) if module != PRELOADED]
+
+
+def parse_importtime(stderr, after=PRELOADED):
+    """
+    [(module, cumulative microseconds, depth)] of the -X importtime lines
+    that follow the top-level import of `after`.
+    """
+    entries, started = [], after is None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        module = name.strip()
+        if started:
+            entries.append((module, int(cumulative), depth))
+        elif module == after and depth == 0:
+            started = True
+    return entries
+
+
+def measure_page(page, top=10):
+    """Total import time of a page in ms, and its `top` slowest packages."""
+    modules = page_modules(page)
+    code = f"import {PRELOADED}\n" + "".join(f"import {module}\n" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BASE_DIR,
+                            capture_output=True, text=True, check=True)
+    entries = parse_importtime(result.stderr)
+
+    total = sum(cumulative for _, cumulative, depth in entries if depth == 0)
+    slowest = {}
+    for module, cumulative, _ in sorted(entries, key=lambda entry: -entry[1]):
+        package = module.split(".")[0]
+        if package not in slowest:
+            slowest[package] = cumulative / 1000
+    return {"total_ms": total / 1000, "modules": dict(list(slowest.items())[:top])}
+
+
+def report(repeat=3, top=10):
+    pages = {}
+    for page in PAGES:
+        runs = [measure_page(page, top) for _ in range(repeat)]
+        pages[page] = min(runs, key=lambda run: run["total_ms"])
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page, the fastest is kept")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages listed per page")
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="JSON report to compare with")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    pages = report(args.repeat, args.top)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["pages"]
+
+    regressions = []
+    for page, result in pages.items():
+        line = f"{page:<8}{result['total_ms']:>9.1f} ms"
+        if page in baseline:
+            before = baseline[page]["total_ms"]
+            line += f"   (baseline {before:.1f} ms)"
+            if result["total_ms"] > max(before * args.threshold, before + TIME_SLACK_MS):
+                regressions.append(page)
+        print(line)
+        for module, milliseconds in result["modules"].items():
+            print(f"    {module:<32}{milliseconds:>9.1f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "pages": pages}, f, indent=2)
+            f.write("\n")
+    if regressions:
+        raise SystemExit(f"Import time regressed past {args.threshold}x the baseline: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
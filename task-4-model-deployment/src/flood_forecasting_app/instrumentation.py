@@ -0,0 +1,247 @@
+"""
+Per-stage timing and counters for the forecasting pipeline.
+
+    with pipeline_run("forecast"):          # one structured log line per run
+        with stage("network"):              # or @stage("network") on a function
+            ...
+        count("http_cache_hits")
+
+Every stage also feeds process-wide metrics, exposed in the Prometheus text
+format by `render_metrics()`, on an HTTP endpoint (`start_metrics_server`)
+and/or in a file rewritten after each run.
+
+Environment variables:
+- FLOOD_METRICS_PORT: serve /metrics on this port (see start_from_env)
+- FLOOD_METRICS_FILE: rewrite this file after each pipeline run
+- FLOOD_PROFILE_DIR: profile each pipeline run with cProfile and dump a
+  .prof file there (open with pstats or snakeviz). For sampling in
+  production, py-spy can attach to the process without this hook.
+- FLOOD_LOG_LEVEL: log the structured run lines to stderr at this level
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger("flood_forecasting")
+if os.environ.get("FLOOD_LOG_LEVEL"):
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(os.environ["FLOOD_LOG_LEVEL"].upper())
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class Metrics:
+    """Process-wide stage durations and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.stage_rows = defaultdict(int)
+        self.stage_max_seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    def observe(self, name, seconds, rows=None):
+        with self._lock:
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += 1
+            self.stage_max_seconds[name] = max(self.stage_max_seconds[name], seconds)
+            if rows is not None:
+                self.stage_rows[name] += rows
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP flood_stage_seconds Wall time spent in each pipeline stage.",
+                "# TYPE flood_stage_seconds summary",
+            ]
+            for name in sorted(self.stage_calls):
+                lines.append(f'flood_stage_seconds_sum{{stage="{name}"}} {self.stage_seconds[name]:.6f}')
+                lines.append(f'flood_stage_seconds_count{{stage="{name}"}} {self.stage_calls[name]}')
+            lines += ["# HELP flood_stage_max_seconds Slowest call of each stage.",
+                      "# TYPE flood_stage_max_seconds gauge"]
+            for name in sorted(self.stage_calls):
+                lines.append(f'flood_stage_max_seconds{{stage="{name}"}} {self.stage_max_seconds[name]:.6f}')
+            lines += ["# HELP flood_stage_rows_total Rows processed by each stage.",
+                      "# TYPE flood_stage_rows_total counter"]
+            for name in sorted(self.stage_rows):
+                lines.append(f'flood_stage_rows_total{{stage="{name}"}} {self.stage_rows[name]}')
+            lines += ["# HELP flood_events_total Cache hits and misses, retries and other events.",
+                      "# TYPE flood_events_total counter"]
+            for name in sorted(self.counters):
+                lines.append(f'flood_events_total{{event="{name}"}} {self.counters[name]}')
+            return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class PipelineRun:
+    """Stages and counters of one pipeline run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows):
+        with self._lock:
+            self.stages.append({"stage": name, "seconds": round(seconds, 6), "rows": rows})
+
+    def increment(self, name, value):
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self, seconds):
+        return {"run": self.name, "seconds": round(seconds, 6), "stages": self.stages, "counters": dict(self.counters)}
+
+
+class pipeline_run:
+    """Context manager grouping the stages of one run; logs a JSON summary at the end."""
+
+    def __init__(self, name):
+        self.run = PipelineRun(name)
+        self._profiler = None
+
+    def __enter__(self):
+        self._token = _current_run.set(self.run)
+        if os.environ.get("FLOOD_PROFILE_DIR"):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self.run
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        _current_run.reset(self._token)
+        metrics.observe(f"run:{self.run.name}", seconds)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            profile_dir = Path(os.environ["FLOOD_PROFILE_DIR"])
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            self._profiler.dump_stats(profile_dir / f"{self.run.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+
+        logger.info(json.dumps(self.run.summary(seconds)))
+        if os.environ.get("FLOOD_METRICS_FILE"):
+            write_metrics_file(os.environ["FLOOD_METRICS_FILE"])
+        return False
+
+
+class stage:
+    """Times a block or a function as one pipeline stage."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self._start, self.rows)
+        return False
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                _record(self.name, time.perf_counter() - start, _count_rows(result))
+        return wrapper
+
+
+def _count_rows(result):
+    # DataFrames, arrays and response lists; tuples of results count their first item
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    shape = getattr(result, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(result, list):
+        return len(result)
+    return None
+
+
+def _record(name, seconds, rows):
+    metrics.observe(name, seconds, rows)
+    run = _current_run.get()
+    if run is not None:
+        run.record(name, seconds, rows)
+
+
+def count(name, value=1):
+    """Increments an event counter (cache hit, retry, ...)."""
+    metrics.increment(name, value)
+    run = _current_run.get()
+    if run is not None:
+        run.increment(name, value)
+
+
+def render_metrics():
+    return metrics.render()
+
+
+def write_metrics_file(path):
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(render_metrics())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serves /metrics from a daemon thread; started once per process."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def start_from_env():
+    if os.environ.get("FLOOD_METRICS_PORT"):
+        try:
+            start_metrics_server(int(os.environ["FLOOD_METRICS_PORT"]))
+        except OSError as e:
+            # Another worker of the host already serves the port
+            print("Metrics endpoint not started: ", e)
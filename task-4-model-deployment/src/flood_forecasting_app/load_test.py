@@ -0,0 +1,155 @@
+"""
+Load test of the dashboard pipeline against the Open-Meteo stand-in.
+
+Starts openmeteo_stub.StubServer (or uses --url), points the app at it and
+runs N concurrent sessions. Each session makes --requests page loads, doing
+what main.py does on a snapshot miss: cached_forecast (or run_pipeline with
+--uncached) for a window, then the feature evolution and the plot. Windows
+are drawn from --windows distinct date ranges of the replayed period, so
+the share of forecast cache hits can be tuned.
+
+By default the local store and the forecast cache start empty and the HTTP
+cache is off, so the fetch costs are measured, not hidden.
+
+    python load_test.py --sessions 16 --requests 10 --windows 8 --latency 0.05 --failure-rate 0.02
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    values = np.percentile(latencies, [50, 95, 99])
+    return {"p50": values[0], "p95": values[1], "p99": values[2], "max": max(latencies)}
+
+
+def make_windows(count, days, seed=0, first=datetime.date(2016, 1, 1), last=datetime.date(2024, 12, 31)):
+    """`count` distinct (start, end) windows of `days` days inside the replayed period."""
+    rng = random.Random(seed)
+    ends = rng.sample(range((first - datetime.date.min).days + days, (last - datetime.date.min).days), count)
+    windows = []
+    for end in ends:
+        end = datetime.date.min + datetime.timedelta(days=end)
+        windows.append((str(end - datetime.timedelta(days=days - 1)), str(end)))
+    return windows
+
+
+def run_load(sessions, requests, windows, horizon=3, uncached=False, seed=0):
+    """Runs the sessions and returns the per-request latencies and the failure count."""
+    # Imported here: the endpoints and the store location are read from the environment at import
+    import pipeline
+    from ui_utils import get_feature_evolution, plot_and_display_data_predictions
+
+    def page_load(start_date, end_date):
+        if uncached:
+            data = pipeline.run_pipeline(start_date, end_date, horizon)
+        else:
+            data = pipeline.cached_forecast(start_date, end_date, horizon)
+        if data is None:
+            return False
+        get_feature_evolution(data[~data["forecast"]])
+        plot_and_display_data_predictions(data)
+        return True
+
+    barrier = threading.Barrier(sessions)
+
+    def session(index):
+        rng = random.Random(seed + index)
+        results = []
+        barrier.wait()
+        for _ in range(requests):
+            start_date, end_date = rng.choice(windows)
+            started = time.perf_counter()
+            try:
+                ok = page_load(start_date, end_date)
+            except Exception as e:
+                print("Error in session: ", e)
+                ok = False
+            results.append((time.perf_counter() - started, ok))
+        return results
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = [result for session_results in executor.map(session, range(sessions)) for result in session_results]
+    latencies = [seconds for seconds, ok in results if ok]
+    return latencies, sum(not ok for _, ok in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent dashboard sessions")
+    parser.add_argument("--requests", type=int, default=5, help="page loads per session")
+    parser.add_argument("--windows", type=int, default=4, help="distinct date windows requested")
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--horizon", type=int, default=3)
+    parser.add_argument("--uncached", action="store_true", help="run the pipeline on every page load")
+    parser.add_argument("--url", help="use a running stand-in (or any Open-Meteo server) instead of starting one")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--store", help="local store directory to use (default: a fresh temporary one)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None:
+        from openmeteo_stub import StubServer
+        server = StubServer(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                            seed=args.seed).start()
+    os.environ["FLOOD_OPENMETEO_URL"] = args.url or server.url
+    os.environ["FLOOD_HTTP_CACHE"] = "0"
+    tmp_dir = tempfile.TemporaryDirectory() if args.store is None else None
+    os.environ["FLOOD_DATA_STORE"] = args.store or tmp_dir.name
+
+    import pipeline
+    from forecast_cache import ForecastCache
+    from instrumentation import metrics
+    pipeline.forecast_cache = ForecastCache(maxsize=64, ttl=3600)  # in memory only, empty
+
+    windows = make_windows(args.windows, args.window_days, args.seed)
+    started = time.perf_counter()
+    try:
+        latencies, failures = run_load(args.sessions, args.requests, windows, args.horizon, args.uncached, args.seed)
+    finally:
+        if server is not None:
+            server.stop()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    wall = time.perf_counter() - started
+
+    total = args.sessions * args.requests
+    report = {
+        "sessions": args.sessions,
+        "requests": total,
+        "failures": failures,
+        "seconds": wall,
+        "throughput": total / wall,
+        "latency": percentiles(latencies),
+        "upstream_requests": server.requests if server is not None else None,
+        "counters": dict(metrics.counters),
+    }
+
+    print(f"{total} page loads by {args.sessions} sessions in {wall:.2f}s: "
+          f"{report['throughput']:.1f} loads/s, {failures} failed")
+    if latencies:
+        print("latency (ms): " + "  ".join(f"{name}={value * 1000:.1f}" for name, value in report["latency"].items()))
+    if server is not None:
+        print(f"upstream requests: {server.requests}")
+    print("events: " + ", ".join(f"{name}={value}" for name, value in sorted(report["counters"].items())))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
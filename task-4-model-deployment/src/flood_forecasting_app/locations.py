@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+LOCATIONS_FILE = BASE_DIR/"locations.json"
+
+
+def load_locations(path=LOCATIONS_FILE):
+    """Reads the location registry: archive point, river gauges and forecast grids."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def grid_points(name, locations=None):
+    """(latitude, longitude) of every cell centre of a grid, as an (n_cells, 2) array."""
+    spec = (locations or load_locations())["grids"][name]
+    step = spec["step"]
+    # Rounded so that the cell coordinates are stable keys (no 24.150000000000002)
+    latitudes = np.round(np.arange(spec["lat_min"], spec["lat_max"] + step / 2, step), 4)
+    longitudes = np.round(np.arange(spec["lon_min"], spec["lon_max"] + step / 2, step), 4)
+    lat_grid, lon_grid = np.meshgrid(latitudes, longitudes, indexing="ij")
+    return np.column_stack([lat_grid.ravel(), lon_grid.ravel()])
+
+
+_locations = load_locations()
+
+ARCHIVE_COORDS = tuple(_locations["archive"]["coords"])
+
+# River gauges queried on the flood API, keyed by the column they end up in
+GAUGES = {column: tuple(gauge["coords"]) for column, gauge in _locations["gauges"].items()}
+
+# Alert rules of each gauge (see alerting.py); gauges without rules are not watched
+ALERT_RULES = {column: gauge["alerts"] for column, gauge in _locations["gauges"].items() if "alerts" in gauge}
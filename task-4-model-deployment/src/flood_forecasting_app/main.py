@@ -1,7 +1,7 @@
 import streamlit as st
-from modeling_utils import  predict_flood
-from data_collection_utils import fetch_and_process_data 
-from ui_utils import plot_and_display_data_predictions , get_feature_evolution
+from refresh_scheduler import forecast_window, start_scheduler
+import instrumentation
+from ui_utils import MAX_PLOT_POINTS, plot_and_display_data_predictions , get_feature_evolution
 import datetime
 from datetime import timedelta
 import numpy as np
@@ -9,15 +9,24 @@ import numpy as np
 
 st.title("Flood Forecasting App 🌊")
 
+# Fetching and inference run in the background; pages read the latest snapshot
+start_scheduler()
+instrumentation.start_from_env()  # /metrics endpoint if FLOOD_METRICS_PORT is set
+
 
 @st.fragment(run_every="1d")
-def get_input(start_date = "2025-02-22", end_date = str(datetime.date.today())):
-    data = fetch_and_process_data(start_date, end_date)
-    return data
+def get_input(start_date = "2025-02-22", end_date = str(datetime.date.today()), horizon = 1):
+    return forecast_window(start_date, end_date, horizon)
 
 @st.fragment(run_every="1d1m")
 def plot_predictions(data):
-    fig = plot_and_display_data_predictions(data)
+    # Long windows are drawn downsampled: zooming re-renders the chosen range in more detail
+    x_range = None
+    first_date, last_date = data["date"].iloc[0].date(), data["date"].iloc[-1].date() + timedelta(days=1)
+    if len(data) > MAX_PLOT_POINTS // 2:
+        x_range = st.slider("Zoom", min_value=first_date, max_value=last_date,
+                            value=(first_date, last_date), format="YYYY-MM-DD")
+    fig = plot_and_display_data_predictions(data, x_range=x_range)
     st.plotly_chart(fig)
    
 
@@ -35,11 +44,15 @@ end_date = col2.date_input("End date", value = today)
 end_date = end_date if end_date <= today else today
 # end_date = end_date.strftime("%Y-%m-%d")
 
-data = get_input(start_date, end_date)
+horizon = st.slider("Forecast horizon (days)", min_value=1, max_value=7, value=3)
+
+data = get_input(start_date, end_date, horizon)
+if data.attrs.get("stale"):
+    st.info("This window is being computed in the background: showing the latest forecast for now.")
 
 # Printing descriptive statistics about the river
 col1, col2, col3 , col4 = st.columns(4)
-today_features , features_evolution = get_feature_evolution(data)
+today_features , features_evolution = get_feature_evolution(data[~data["forecast"]])
 today_precipitation , today_temperature , today_river_discharge , today_wind = today_features
 precipitation_diff , temperature_diff , river_discharge_diff , wind_diff = features_evolution
 
@@ -51,21 +64,18 @@ col4.metric("Wind", f"{today_wind:.2f} mph", "{:.2f}%".format(wind_diff))
 
 
 
-# Getting the model and making the prediction   
-data = predict_flood(data)
-
-
 # Displaying the prediction and the river discharge
 plot_predictions(data)
 
-# Display the flooded prediction
-flooded = data[data["flood"] == 1]
+# Display the flooded prediction, from the last observed day onwards
+upcoming = data.iloc[(~data["forecast"]).sum() - 1:]
+flooded = upcoming[upcoming["flood"] == 1]
 if not flooded.empty:
     st.markdown(
     '<p>There is a <span style="color:red">high chance</span> of flood on the following days:</p>',
     unsafe_allow_html=True)
 
-    st.write(flooded.index)
+    st.write(flooded["date"] + timedelta(days=1))  # predictions are for the next day
 else:
     st.markdown(
     '</p>There is a <span style="color:green">low chance</span> of flood in the next few days.</p>',
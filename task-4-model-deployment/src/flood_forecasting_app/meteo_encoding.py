@@ -0,0 +1,74 @@
+import flatbuffers
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+
+# Slot numbers of the fields we write, taken from the openmeteo_sdk schema
+_RESPONSE_FIELDS = 12
+_RESPONSE_LATITUDE, _RESPONSE_LONGITUDE, _RESPONSE_ELEVATION = 0, 1, 2
+_RESPONSE_DAILY, _RESPONSE_HOURLY = 10, 11
+
+_SECTION_FIELDS = 4
+_SECTION_TIME, _SECTION_TIME_END, _SECTION_INTERVAL, _SECTION_VARIABLES = 0, 1, 2, 3
+
+_VARIABLE_FIELDS = 4
+_VARIABLE_VARIABLE, _VARIABLE_VALUES = 0, 3
+
+
+def _encode_section(builder, start, interval, columns):
+    variables = []
+    for column in columns:
+        values = builder.CreateNumpyVector(np.ascontiguousarray(column, dtype=np.float32))
+        builder.StartObject(_VARIABLE_FIELDS)
+        builder.PrependUOffsetTRelativeSlot(_VARIABLE_VALUES, values, 0)
+        builder.PrependUint8Slot(_VARIABLE_VARIABLE, 0, 0)
+        variables.append(builder.EndObject())
+
+    builder.StartVector(4, len(variables), 4)
+    for variable in reversed(variables):
+        builder.PrependUOffsetTRelative(variable)
+    variables_vector = builder.EndVector()
+
+    length = len(columns[0]) if columns else 0
+    builder.StartObject(_SECTION_FIELDS)
+    builder.PrependUOffsetTRelativeSlot(_SECTION_VARIABLES, variables_vector, 0)
+    builder.PrependInt64Slot(_SECTION_TIME, int(start), 0)
+    builder.PrependInt64Slot(_SECTION_TIME_END, int(start) + length * int(interval), 0)
+    builder.PrependInt32Slot(_SECTION_INTERVAL, int(interval), 0)
+    return builder.EndObject()
+
+
+def encode_response(latitude, longitude, daily=None, hourly=None, elevation=0.0):
+    """
+    Encodes one Open-Meteo response in the size-prefixed FlatBuffers format
+    served by the API with `format=flatbuffers`.
+
+    `daily` and `hourly` are (start_unix_seconds, interval_seconds, columns)
+    tuples, where columns is a list of value arrays in request order.
+    Several encoded responses can be concatenated, like a multi-location reply.
+    """
+    builder = flatbuffers.Builder(1024)
+    daily_offset = _encode_section(builder, *daily) if daily is not None else None
+    hourly_offset = _encode_section(builder, *hourly) if hourly is not None else None
+
+    builder.StartObject(_RESPONSE_FIELDS)
+    if hourly_offset is not None:
+        builder.PrependUOffsetTRelativeSlot(_RESPONSE_HOURLY, hourly_offset, 0)
+    if daily_offset is not None:
+        builder.PrependUOffsetTRelativeSlot(_RESPONSE_DAILY, daily_offset, 0)
+    builder.PrependFloat32Slot(_RESPONSE_LATITUDE, latitude, 0.0)
+    builder.PrependFloat32Slot(_RESPONSE_LONGITUDE, longitude, 0.0)
+    builder.PrependFloat32Slot(_RESPONSE_ELEVATION, elevation, 0.0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+def decode_responses(payload):
+    """Splits a (possibly multi-location) payload into WeatherApiResponse objects."""
+    responses = []
+    position = 0
+    while position < len(payload):
+        length = int.from_bytes(payload[position:position + 4], byteorder="little")
+        responses.append(WeatherApiResponse.GetRootAs(payload, position + 4))
+        position += length + 4
+    return responses
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+from instrumentation import count, stage
+
+
+class ModelRegistry:
+    """
+    Process-wide, lazily populated cache of the joblib model artifacts.
+
+    A model is unpickled on first use only, with `mmap_mode="r"` so the
+    NumPy buffers stored in the file are memory-mapped and shared between
+    worker processes instead of copied into each one. Every session of the
+    app goes through the same registry, so a model is loaded once per process.
+
+    Files are re-checked at most every `check_interval` seconds: a changed
+    mtime or size triggers a hash of the file, and the model is reloaded only
+    if the content actually changed.
+    """
+
+    def __init__(self, model_dir, files, mmap_mode="r", check_interval=5.0):
+        self.model_dir = Path(model_dir)
+        self.files = dict(files)
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return self.model_dir / self.files[name]
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry["checked_at"] < self.check_interval:
+            return entry["model"]
+
+        with self._lock:
+            return self._refresh(name)
+
+    def _refresh(self, name):
+        path = self.path(name)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(name)
+        if entry is not None:
+            if entry["signature"] != signature:
+                digest = _file_digest(path)
+                if digest == entry["digest"]:
+                    entry["signature"] = signature
+                else:
+                    entry = None
+            if entry is not None:
+                entry["checked_at"] = time.monotonic()
+                return entry["model"]
+
+        digest = _file_digest(path)
+        import joblib  # loaded with the first model, not when the app starts
+
+        with stage("model_load"):
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+        count("model_loads")
+        self._entries[name] = {
+            "model": model,
+            "signature": signature,
+            "digest": digest,
+            "checked_at": time.monotonic(),
+        }
+        return model
+
+    def digest(self, name):
+        """Content hash of a model file (loads the model if needed)."""
+        self.get(name)
+        return self._entries[name]["digest"]
+
+    def version(self):
+        """Short identifier of the current set of models, for cache keys."""
+        combined = hashlib.sha256()
+        for name in sorted(self.files):
+            combined.update(self.digest(name).encode())
+        return combined.hexdigest()[:12]
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,23 +1,38 @@
-import joblib
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from model_registry import ModelRegistry
+from feature_engine import WINDOW_FEATURES, RollingFeatureState, compute_window_features, window_sources
+from instrumentation import stage
+from fast_inference import get_predictor
 
 BASE_DIR = Path(__file__).resolve().parent
 
+# The models are loaded on first use and shared by every session of the process
+model_registry = ModelRegistry(BASE_DIR/"models", {
+    "discharge_model": "discharge_model.joblib",
+    "rain_model": "rain_model.joblib",
+    "flood_model": "flood_clf_rfe.joblib",
+})
 
-# Helper function to load the models
-def load_model (model_path):
-    return joblib.load(model_path)
 
-# Load the models	
-discharge_model = load_model(BASE_DIR/"models/discharge_model.joblib")
-rain_model = load_model(BASE_DIR/"models/rain_model.joblib")
-flood_model = load_model(BASE_DIR/"models/flood_clf_rfe.joblib")
+def __getattr__(name):
+    # Keeps `modeling_utils.rain_model` & co. working without loading at import time
+    if name in model_registry.files:
+        return model_registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def add_interactions(data):
+    data['rain_soil_interaction'] = data['rain_sum (mm)'] * data['soil_moisture_100_to_255cm (m³/m³)']
+    data['rivers_interaction'] = data['Longai_discharge (m³/s)'] * data['Kushi_discharge (m³/s)'] * data['Singla_discharge (m³/s)']
+    return data
 
 
 # Helper function to preprocess the data
+@stage("features")
 def preprocess_data(data):
+    data = data.copy()
     try:
         data["date"] = pd.to_datetime(data["date"])
 
@@ -25,22 +40,15 @@ def preprocess_data(data):
         data['month'] = data['date'].dt.month
         data['season'] = data['month'] % 12 // 3
 
-        data['rain_last_3_days'] = data['rain_sum (mm)'].rolling(window=3, min_periods=1).sum()
-        data['rain_last_7_days'] = data['rain_sum (mm)'].rolling(window=7, min_periods=1).sum()
-        data['Longai_discharge_last_3_days'] = data['Longai_discharge (m³/s)'].rolling(window=3, min_periods=1).sum()
-        data['Kushi_discharge_last_3_days'] = data['Kushi_discharge (m³/s)'].rolling(window=3, min_periods=1).sum()
-        data['Singla_discharge_last_3_days'] = data['Singla_discharge (m³/s)'].rolling(window=3, min_periods=1).sum()
-        data['Longai_discharge_last_7_days'] = data['Longai_discharge (m³/s)'].rolling(window=7, min_periods=1).sum()
-        data['Kushi_discharge_last_7_days'] = data['Kushi_discharge (m³/s)'].rolling(window=7, min_periods=1).sum()
-        data['Singla_discharge_last_7_days'] = data['Singla_discharge (m³/s)'].rolling(window=7, min_periods=1).sum()
-        data['soil_moisture_trend'] = data['soil_moisture_100_to_255cm (m³/m³)'].rolling(window=5, min_periods=1).mean()
-        data['rain_soil_interaction'] = data['rain_sum (mm)'] * data['soil_moisture_100_to_255cm (m³/m³)']
-        data['rivers_interaction'] = data['Longai_discharge (m³/s)'] * data['Kushi_discharge (m³/s)'] * data['Singla_discharge (m³/s)']
+        # All rolling sums and means in one vectorized pass
+        for name, values in compute_window_features(data).items():
+            data[name] = values
+        add_interactions(data)
     
     except Exception as e:
         print(f"An error occurred during preprocessing: {e}")
         
-    return data.copy()
+    return data
     
 
          
@@ -67,37 +75,116 @@ flood_features = ['temperature_2m_min (°C)', 'temperature_2m_mean (°C)',
        'Kushi_discharge_last_7_days', 'Singla_discharge_last_7_days',
        'soil_moisture_trend', 'rivers_interaction']
 
-
-def predict_flood(data):
+# Features preprocess_data computes, and the raw columns it computes them from
+derived_features = {name for name, _, _, _ in WINDOW_FEATURES} | {
+    "month", "season", "rain_soil_interaction", "rivers_interaction"}
+input_columns = [col for col in dict.fromkeys(regression_features + flood_features + window_sources())
+                 if col not in derived_features]
+
+
+def feature_matrix(features, columns):
+    """
+    rows x columns float32 matrix of a DataFrame or of {column: array},
+    filled column by column; arrays of any shape (e.g. days x locations)
+    are flattened.
+    """
+    n_rows = np.size(features["month"])
+    X = np.empty((n_rows, len(columns)), dtype=np.float32)
+    for j, column in enumerate(columns):
+        X[:, j] = np.asarray(features[column]).reshape(-1)
+    return X
+
+
+def score_features(features):
+    """
+    Next-day rain, discharge and flood of every row of `features` (as for
+    feature_matrix), with one call per model: {"predicted_rain",
+    "predicted_discharge", "flood", "proba"} arrays.
+    """
+    # Booster-level predictors: float32 input, inplace_predict, no DMatrix
+    rain_model = get_predictor(model_registry.get("rain_model"))
+    discharge_model = get_predictor(model_registry.get("discharge_model"))
+    flood_model = get_predictor(model_registry.get("flood_model"))
+
+    X = feature_matrix(features, regression_features)
+    with stage("model_predict", rows=len(X)):
+        predictions = {
+            "predicted_rain": rain_model.predict(X),
+            "predicted_discharge": discharge_model.predict(X),
+        }
+        proba = flood_model.predict_proba(feature_matrix(features, flood_features))
+    predictions["flood"] = flood_model.classes_[proba.argmax(axis=1)]
+    predictions["proba"] = proba[:, 1]  # probability of class 1
+    return predictions
+
+
+# Model outputs fed back as next-day inputs by the recursive forecast
+recursive_inputs = {
+    "predicted_rain": ["rain_sum (mm)", "precipitation_sum (mm)"],
+    "predicted_discharge": ["Longai_discharge (m³/s)"],
+}
+
+def _next_day(data, state):
+    """
+    Builds the features of the day after the last row: predicted rain and
+    discharge become that day's observations, other variables persist.
+    The rolling features are updated in O(1) from the streaming `state`.
+    """
+    next_row = data.iloc[-1].copy()
+    next_row["date"] = next_row["date"] + pd.Timedelta(days=1)
+    for prediction, columns in recursive_inputs.items():
+        for col in columns:
+            next_row[col] = next_row[prediction]
+    next_row[["predicted_rain", "predicted_discharge", "flood", "proba"]] = np.nan
+    next_row["forecast"] = True
+
+    next_row["month"] = next_row["date"].month
+    next_row["season"] = next_row["month"] % 12 // 3
+    for name, value in state.update(next_row).items():
+        next_row[name] = value
+    add_interactions(next_row)
+
+    data.loc[len(data)] = next_row
+    return data
+
+
+def predict_flood(data, horizon=1, backfill=False):
+    """
+    Predicts next-day rain, discharge and flood.
+
+    By default only the last row is scored. With `backfill=True` every row of
+    the window is scored, with a single vectorized call per model. With
+    `horizon > 1`, `horizon - 1` forecast rows are appended (flagged in the
+    `forecast` column): each one takes the previous day's predicted rain and
+    discharge as observations, so the last row predicts `horizon` days ahead.
+    As for the observed rows, the predictions of a row are for the next day.
+    """
 
     try:  
         data = preprocess_data(data)
 
-        # Predict the rain and discharge
-        last_date = data.index[-1]
-        last_obs_regr = data.loc[last_date, regression_features].to_numpy().reshape(1, -1)
-        predicted_rain = rain_model.predict(last_obs_regr)[0]
-        predicted_discharge = discharge_model.predict(last_obs_regr)[0]
-
-        # Ensure columns exist and update values
-        for col, value in [('predicted_rain', predicted_rain), ('predicted_discharge', predicted_discharge)]:
+        for col in ["predicted_rain", "predicted_discharge", "flood", "proba"]:
             if col not in data.columns:
                 data[col] = np.nan  # Initialize column with NaN
-            data.at[last_date, col] = value
-
-        # Predict the flood
-        last_obs_flood = data.loc[last_date, flood_features].to_numpy().reshape(1, -1)
-        predicted_flood = flood_model.predict(last_obs_flood)[0]
-        predicted_flood_proba = flood_model.predict_proba(last_obs_flood)[:, 1][0]  # Extract probability for class 1
-
-        # Ensure flood-related columns exist and update values
-        for col, value in [('flood', predicted_flood), ('proba', predicted_flood_proba)]:
-            if col not in data.columns:
-                data[col] = np.nan
-            data.at[last_date, col] = value
-
-        return data.copy()
+        data["forecast"] = False
+        if horizon > 1:
+            data = data.reset_index(drop=True)  # forecast days are appended by position
+
+        # Score the whole window or the last row only
+        scored = data.index if backfill else data.index[-1:]
+        for col, values in score_features(data.loc[scored]).items():
+            data.loc[scored, col] = values
+
+        # Roll forward: each forecast day is scored from the previous day's predictions
+        state = RollingFeatureState.from_frame(data)
+        with stage("forecast_recursion", rows=horizon - 1):
+            for _ in range(horizon - 1):
+                data = _next_day(data, state)
+                for col, values in score_features(data.loc[data.index[-1:]]).items():
+                    data.loc[data.index[-1], col] = values[0]
+
+        return data
     
     except Exception as e:
         print(f"An error occurred during prediction: {e}")
-        return data.copy()
\ No newline at end of file
+        return data.copy()
@@ -0,0 +1,264 @@
+"""
+Local stand-in for the Open-Meteo archive and flood APIs.
+
+Serves /v1/archive and /v1/flood in the FlatBuffers format of the real
+service, replayed from the task-1 CSV exports (2015-2025):
+- archive: the daily variables of the daily export, and the hourly
+  pressure and soil moisture as their daily means repeated every hour
+  (hourly rain spreads the daily rain evenly, hourly temperature is the
+  daily mean);
+  every location gets the same (Karimganj) series;
+- flood: the river discharge of the nearest of the exported river points.
+
+Latency and failures can be injected to reproduce a slow or flaky service.
+Point the app at it with FLOOD_OPENMETEO_URL (and FLOOD_HTTP_CACHE=0 to
+measure the real request costs):
+
+    python openmeteo_stub.py --port 8765 --latency 0.05 --failure-rate 0.01
+    FLOOD_OPENMETEO_URL=http://127.0.0.1:8765 FLOOD_HTTP_CACHE=0 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from archive_ingest import OPEN_METEO_FILES, find_export, read_daily_means, read_open_meteo_csv
+from meteo_encoding import encode_response
+
+SECONDS_PER_DAY = 86400
+
+
+def _api_name(column):
+    # "rain_sum (mm)" -> "rain_sum"
+    return column.split(" (")[0]
+
+
+class ReplayData:
+    """The task-1 exports as float32 arrays over one daily time axis."""
+
+    def __init__(self):
+        frames, rivers = [], []
+        for pattern in OPEN_METEO_FILES:
+            path = find_export(pattern)
+            frame = read_open_meteo_csv(path)
+            if "river_discharge (m³/s)" in frame.columns:
+                location = pd.read_csv(path, nrows=1)
+                rivers.append(((float(location["latitude"][0]), float(location["longitude"][0])), frame))
+            else:
+                frames.append(frame)
+        hourly = read_daily_means()
+
+        dates = pd.date_range(min(frame.index.min() for frame in frames + [hourly]),
+                              max(frame.index.max() for frame in frames + [hourly]), freq="D")
+        self.first_day = dates[0].value // (SECONDS_PER_DAY * 10**9)
+        self.n_days = len(dates)
+
+        def columns(frame):
+            frame = frame.reindex(dates)
+            return {_api_name(column): frame[column].to_numpy(dtype=np.float32) for column in frame.columns}
+
+        self.daily = {}
+        for frame in frames:
+            self.daily.update(columns(frame))
+        self.hourly = columns(hourly)
+        if "rain_sum" in self.daily:
+            self.hourly["rain"] = self.daily["rain_sum"] / 24
+        if "temperature_2m_mean" in self.daily:
+            self.hourly["temperature_2m"] = self.daily["temperature_2m_mean"]
+        self.river_coords = np.array([coords for coords, _ in rivers])
+        self.rivers = [columns(frame)["river_discharge"] for _, frame in rivers]
+
+    def window(self, series, first_day, n_days):
+        """Values of `series` for n_days days from first_day, NaN outside the replayed period."""
+        index = np.arange(first_day, first_day + n_days) - self.first_day
+        inside = (index >= 0) & (index < self.n_days)
+        values = np.full(n_days, np.nan, dtype=np.float32)
+        values[inside] = series[index[inside]]
+        return values
+
+    def nearest_river(self, latitude, longitude):
+        distances = np.hypot(self.river_coords[:, 0] - latitude, self.river_coords[:, 1] - longitude)
+        return self.rivers[int(distances.argmin())]
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _values(query, name):
+    # Lists come either as repeated keys or comma-separated, like the real API accepts
+    return [value for item in query.get(name, []) for value in item.split(",") if value]
+
+
+def _locations(query):
+    latitudes = [float(value) for value in _values(query, "latitude")]
+    longitudes = [float(value) for value in _values(query, "longitude")]
+    if not latitudes or len(latitudes) != len(longitudes):
+        raise BadRequest("latitude and longitude must have the same number of values")
+    return list(zip(latitudes, longitudes))
+
+
+def _days(query):
+    try:
+        start = pd.Timestamp(query["start_date"][0])
+        end = pd.Timestamp(query["end_date"][0])
+    except (KeyError, ValueError):
+        raise BadRequest("start_date and end_date are required (yyyy-mm-dd)")
+    if end < start:
+        raise BadRequest("end_date is before start_date")
+    return start.value // (SECONDS_PER_DAY * 10**9), (end - start).days + 1
+
+
+def encode_archive(replay, query):
+    (first_day, n_days), locations = _days(query), _locations(query)
+    daily, hourly = _values(query, "daily"), _values(query, "hourly")
+    for name in daily:
+        if name not in replay.daily:
+            raise BadRequest(f"Cannot initialize variable '{name}'")
+    for name in hourly:
+        if name not in replay.hourly:
+            raise BadRequest(f"Cannot initialize variable '{name}'")
+
+    start = first_day * SECONDS_PER_DAY
+    daily_columns = [replay.window(replay.daily[name], first_day, n_days) for name in daily]
+    hourly_columns = [np.repeat(replay.window(replay.hourly[name], first_day, n_days), 24) for name in hourly]
+    payload = b""
+    for latitude, longitude in locations:
+        payload += encode_response(latitude, longitude,
+                                   daily=(start, SECONDS_PER_DAY, daily_columns) if daily else None,
+                                   hourly=(start, 3600, hourly_columns) if hourly else None)
+    return payload
+
+
+def encode_flood(replay, query):
+    (first_day, n_days), locations = _days(query), _locations(query)
+    if _values(query, "daily") != ["river_discharge"]:
+        raise BadRequest("Only daily=river_discharge is available")
+
+    start = first_day * SECONDS_PER_DAY
+    payload = b""
+    for latitude, longitude in locations:
+        discharge = replay.window(replay.nearest_river(latitude, longitude), first_day, n_days)
+        payload += encode_response(latitude, longitude, daily=(start, SECONDS_PER_DAY, [discharge]))
+    return payload
+
+
+ROUTES = {"/v1/archive": encode_archive, "/v1/flood": encode_flood}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the pooled sessions of the app
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        server.record_request()
+
+        delay = server.delay()
+        if delay > 0:
+            time.sleep(delay)
+        if server.should_fail():
+            return self._send_json(server.error_status, {"error": True, "reason": "Injected failure"})
+
+        encode = ROUTES.get(url.path)
+        if encode is None:
+            return self._send_json(404, {"error": True, "reason": "Not found"})
+        try:
+            payload = encode(server.replay, parse_qs(url.query))
+        except BadRequest as e:
+            return self._send_json(400, {"error": True, "reason": str(e)})
+        self._send(200, "application/x-flatbuffers", payload)
+
+    def _send_json(self, status, body):
+        self._send(status, "application/json", json.dumps(body).encode())
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Threaded stand-in server. Each request waits `latency` seconds plus a
+    uniform random `jitter`, and fails with `error_status` with probability
+    `failure_rate`.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, failure_rate=0.0,
+                 error_status=500, seed=None, replay=None):
+        super().__init__((host, port), StubHandler)
+        self.replay = replay or ReplayData()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.error_status = error_status
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def delay(self):
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def start(self):
+        """Serves from a background thread; returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, name="openmeteo-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds, uniform in [0, jitter]")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="status of the injected failures")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.failure_rate,
+                        args.error_status, args.seed)
+    print(f"Serving the Open-Meteo stand-in on {server.url} (FLOOD_OPENMETEO_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
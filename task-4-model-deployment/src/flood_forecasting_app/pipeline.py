@@ -0,0 +1,44 @@
+import datetime
+from pathlib import Path
+
+from data_collection_utils import fetch_and_process_data_incremental, get_default_store
+from ensemble import ENSEMBLE_MEMBERS, add_ensemble_bands
+from forecast_cache import ForecastCache
+from instrumentation import pipeline_run
+from modeling_utils import model_registry, predict_flood
+
+BASE_DIR = Path(__file__).resolve().parent
+
+forecast_cache = ForecastCache(maxsize=64, ttl=3600, disk_dir=BASE_DIR/"forecast_cache")
+
+
+def run_pipeline(start_date, end_date, horizon=1, backfill=True, members=ENSEMBLE_MEMBERS):
+    """
+    fetch -> preprocess -> predict for one date window, with the ensemble
+    bands of `members` members (0 for none); None if the data could not be fetched.
+    """
+    with pipeline_run("forecast"):
+        data = fetch_and_process_data_incremental(start_date, end_date)
+        if data is None:
+            return None
+        data = predict_flood(data, horizon=horizon, backfill=backfill)
+        return add_ensemble_bands(data, members) if members else data
+
+
+def data_revision(end_date):
+    """
+    Version of the upstream data for a window: windows older than the
+    store's finalization delay never change, recent ones change daily.
+    """
+    today = datetime.date.today()
+    end_date = datetime.date.fromisoformat(str(end_date))
+    if end_date < today - datetime.timedelta(days=get_default_store().finalize_after_days):
+        return "final"
+    return today.isoformat()
+
+
+def cached_forecast(start_date, end_date, horizon=1, backfill=True, members=ENSEMBLE_MEMBERS):
+    """run_pipeline through the process-wide cache, keyed by window, model version and data revision."""
+    key = (str(start_date), str(end_date), horizon, backfill, members,
+           model_registry.version(), data_revision(end_date))
+    return forecast_cache.get_or_compute(key, lambda: run_pipeline(start_date, end_date, horizon, backfill, members))
@@ -0,0 +1,331 @@
+"""
+Background refresh of the forecast, decoupled from Streamlit reruns.
+
+A scheduler thread runs fetch -> preprocess -> predict for the last
+`window_days` days every `interval` seconds, and right after midnight so
+the new day is served at once, and publishes the result as a snapshot
+file, replaced atomically. Pages only read the latest snapshot: a window
+it does not cover (another date range, or a new day before the refresh)
+is served clipped to what the snapshot covers, flagged stale, and
+requested from the scheduler thread, which computes it in the background
+for the next rerun. Only a cold start without any snapshot computes in
+the page.
+When several app processes run on the same host, a file lock makes sure
+only one of them refreshes at a time.
+
+Each refresh also feeds the new observations to the flood alert engine
+(alerting.py), so alerts do not wait for someone to open the page; a
+shorter interval catches rising water sooner.
+
+A new process starts warm: if the latest snapshot is for today and younger
+than the refresh interval (e.g. published by the previous process, or by
+`--once` at deploy time), the first refresh waits until it is due, and the
+first pages are served from that snapshot without fetching or loading the
+models.
+
+It can also run as a standalone worker:
+
+    python refresh_scheduler.py            # refresh every hour
+    python refresh_scheduler.py --once     # refresh once and exit
+"""
+import argparse
+import datetime
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from alerting import engine_from_env
+from modeling_utils import model_registry
+from pipeline import cached_forecast, run_pipeline
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the thread lock still applies
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent
+SNAPSHOT_DIR = BASE_DIR/"snapshots"
+SNAPSHOT_NAME = "latest.pkl"
+
+
+def publish_snapshot(data, meta, snapshot_dir=SNAPSHOT_DIR):
+    """Writes the snapshot next to the current one, then swaps it in with one rename."""
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    path = snapshot_dir / SNAPSHOT_NAME
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"meta": meta, "data": data}, f)
+    os.replace(tmp_path, path)
+
+
+_snapshot_cache = {"signature": None, "snapshot": None}
+_snapshot_lock = threading.Lock()
+
+
+def read_latest_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the latest {"meta": ..., "data": ...} snapshot, or None if none
+    was published yet. The file is only unpickled again when it changes.
+    """
+    path = Path(snapshot_dir) / SNAPSHOT_NAME
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _snapshot_lock:
+        if _snapshot_cache["signature"] != (path, mtime):
+            with open(path, "rb") as f:
+                _snapshot_cache["snapshot"] = pickle.load(f)
+            _snapshot_cache["signature"] = (path, mtime)
+        snapshot = _snapshot_cache["snapshot"]
+    return {"meta": snapshot["meta"], "data": snapshot["data"].copy()}
+
+
+def snapshot_window(snapshot, start_date, end_date, horizon):
+    """
+    Cuts a dashboard window out of a snapshot, or returns None if the
+    snapshot cannot serve it (window not covered, or longer horizon).
+    """
+    if snapshot is None:
+        return None
+    meta = snapshot["meta"]
+    if (str(end_date) != meta["end_date"] or str(start_date) < meta["start_date"]
+            or horizon > meta["horizon"]):
+        return None
+
+    data = snapshot["data"]
+    dates = data["date"].dt.date.astype(str)
+    observed = ~data["forecast"] & (dates >= str(start_date))
+    forecast_rows = data.index[data["forecast"]][:horizon - 1]
+    return data[observed | data.index.isin(forecast_rows)].reset_index(drop=True)
+
+
+def clip_snapshot(snapshot, start_date, end_date, horizon):
+    """
+    The part of `snapshot` that overlaps the requested window (all of it if
+    they do not overlap), flagged with `attrs["stale"]`.
+    """
+    meta = snapshot["meta"]
+    data = snapshot["data"]
+    start = max(str(start_date), meta["start_date"])
+    end = min(str(end_date), meta["end_date"])
+    if start > end:
+        start, end = meta["start_date"], meta["end_date"]
+
+    dates = data["date"].dt.date.astype(str)
+    observed = ~data["forecast"] & (dates >= start) & (dates <= end)
+    forecast_rows = data.index[data["forecast"]][:horizon - 1] if end == meta["end_date"] else []
+    data = data[observed | data.index.isin(forecast_rows)].reset_index(drop=True)
+    data.attrs["stale"] = True
+    return data
+
+
+def forecast_window(start_date, end_date, horizon, snapshot_dir=SNAPSHOT_DIR, scheduler=None):
+    """
+    The dashboard window, without network or model work in the page: from
+    the latest snapshot, or from a window the scheduler computed on request.
+    Otherwise the snapshot is served clipped and stale, and the window is
+    requested. Only a cold start before the first snapshot runs the
+    pipeline here, once for all sessions through the shared forecast cache.
+    """
+    scheduler = scheduler or _scheduler
+    snapshot = read_latest_snapshot(snapshot_dir)
+    if snapshot is None:
+        return cached_forecast(start_date, end_date, horizon)
+
+    data = snapshot_window(snapshot, start_date, end_date, horizon)
+    if data is not None:
+        return data
+    if scheduler is not None:
+        data = scheduler.window(start_date, end_date, horizon)
+        if data is not None:
+            return data
+        if snapshot["meta"]["end_date"] != str(datetime.date.today()):
+            scheduler.request_refresh()  # a new day the scheduler has not caught up with
+        scheduler.request_window(start_date, end_date, horizon)
+    return clip_snapshot(snapshot, start_date, end_date, horizon)
+
+
+class RefreshScheduler(threading.Thread):
+
+    # Requested windows kept for pages, and the shortest gap between two requested refreshes
+    max_windows = 16
+    min_requested_gap = 60
+
+    def __init__(self, interval=3600, window_days=30, horizon=7, snapshot_dir=SNAPSHOT_DIR, alert_engine=None):
+        super().__init__(name="refresh-scheduler", daemon=True)
+        self.interval = interval
+        self.window_days = window_days
+        self.horizon = horizon
+        self.snapshot_dir = Path(snapshot_dir)
+        self.alert_engine = alert_engine
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._refresh_requested = False
+        self._last_attempt = None
+        self._pending = OrderedDict()   # windows requested by pages, oldest first
+        self._windows = OrderedDict()   # window -> (computed at, data), least recently used first
+
+    def first_delay(self):
+        """Seconds until the first refresh: none unless today's snapshot is still fresh."""
+        snapshot = read_latest_snapshot(self.snapshot_dir)
+        if snapshot is None or snapshot["meta"]["end_date"] != str(datetime.date.today()):
+            return 0.0
+        generated_at = datetime.datetime.fromisoformat(snapshot["meta"]["generated_at"])
+        age = (datetime.datetime.now(datetime.timezone.utc) - generated_at).total_seconds()
+        return max(0.0, self.interval - age)
+
+    @staticmethod
+    def seconds_to_midnight(now=None):
+        """Seconds until the next local midnight, when today's snapshot goes out of date."""
+        now = now or datetime.datetime.now()
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        return (midnight - now).total_seconds() + 1  # wake once the date has changed
+
+    def next_delay(self, seconds_since_refresh, now=None):
+        """Seconds until the next refresh: the interval, cut short by midnight."""
+        return max(0.0, min(self.interval - seconds_since_refresh, self.seconds_to_midnight(now)))
+
+    def run(self):
+        refreshed_at = time.monotonic() - self.interval + self.first_delay()
+        refreshed_on = datetime.date.today()
+        while not self._stopped.is_set():
+            self._wake.wait(self.next_delay(time.monotonic() - refreshed_at))
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            if (time.monotonic() - refreshed_at >= self.interval or datetime.date.today() != refreshed_on
+                    or self._take_refresh_request()):
+                self._last_attempt = time.monotonic()
+                self.refresh_once()
+                refreshed_at, refreshed_on = time.monotonic(), datetime.date.today()
+            self.serve_requests()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def request_refresh(self):
+        """Asks for a refresh now, e.g. when a page finds the snapshot is from yesterday."""
+        with self._lock:
+            self._refresh_requested = True
+        self._wake.set()
+
+    def _take_refresh_request(self):
+        with self._lock:
+            requested, self._refresh_requested = self._refresh_requested, False
+        recent = self._last_attempt is not None and time.monotonic() - self._last_attempt < self.min_requested_gap
+        return requested and not recent
+
+    def request_window(self, start_date, end_date, horizon):
+        """Queues a window the snapshot does not cover; it is computed by the scheduler thread."""
+        key = (str(start_date), str(end_date), horizon)
+        with self._lock:
+            self._pending[key] = None
+            while len(self._pending) > self.max_windows:
+                self._pending.popitem(last=False)
+        self._wake.set()
+
+    def window(self, start_date, end_date, horizon):
+        """A requested window once computed, and younger than the refresh interval; else None."""
+        key = (str(start_date), str(end_date), horizon)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.interval:
+                return None
+            self._windows.move_to_end(key)
+            return entry[1].copy()
+
+    def serve_requests(self):
+        """Computes the requested windows, through the shared forecast cache."""
+        while not self._stopped.is_set():
+            with self._lock:
+                if not self._pending:
+                    return
+                key, _ = self._pending.popitem(last=False)
+            data = cached_forecast(*key)
+            if data is None:
+                continue
+            with self._lock:
+                self._windows[key] = (time.monotonic(), data)
+                self._windows.move_to_end(key)
+                while len(self._windows) > self.max_windows:
+                    self._windows.popitem(last=False)
+
+    def refresh_once(self):
+        """Runs the pipeline and publishes a snapshot; returns whether a snapshot was published."""
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.snapshot_dir / "refresh.lock", "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+
+            try:
+                end_date = datetime.date.today()
+                start_date = end_date - datetime.timedelta(days=self.window_days)
+                started = time.perf_counter()
+                data = run_pipeline(start_date, end_date, horizon=self.horizon)
+                if data is None:
+                    print("Refresh failed: the data could not be fetched")
+                    return False
+
+                publish_snapshot(data, {
+                    "start_date": str(start_date),
+                    "end_date": str(end_date),
+                    "horizon": self.horizon,
+                    "model_version": model_registry.version(),
+                    "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "duration_s": time.perf_counter() - started,
+                }, self.snapshot_dir)
+
+                if self.alert_engine is not None:
+                    # Another process may have refreshed (and alerted) since: go on from its state
+                    self.alert_engine.load()
+                    self.alert_engine.observe_frame(data)
+                return True
+
+            except Exception as e:
+                print("Error refreshing the forecast snapshot: ", e)
+                return False
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(**kwargs):
+    """Starts the process-wide scheduler thread once; later calls return the running one."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            kwargs.setdefault("alert_engine", engine_from_env())
+            _scheduler = RefreshScheduler(**kwargs)
+            _scheduler.start()
+        return _scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=3600, help="seconds between refreshes")
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--once", action="store_true", help="refresh once and exit")
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(args.interval, args.window_days, args.horizon, alert_engine=engine_from_env())
+    if args.once:
+        scheduler.refresh_once()
+    else:
+        scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
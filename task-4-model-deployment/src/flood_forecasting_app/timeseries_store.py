@@ -0,0 +1,187 @@
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the thread lock still applies
+    fcntl = None
+
+
+class TimeSeriesStore:
+    """
+    Append-only local store for daily Open-Meteo series.
+
+    Data is kept as one Parquet file per (dataset, location, month):
+
+        <root>/<dataset>/<lat>_<lon>/<YYYY-MM>.parquet
+
+    where `dataset` is the API the series comes from ("archive" or "flood")
+    and every requested variable is a column of the file. A JSON manifest
+    records the date ranges already downloaded for each location, so a
+    refresh only has to fetch the days that are missing.
+
+    The last `finalize_after_days` days are written but never marked as
+    covered: the archive API lags a few days behind and the flood API
+    returns forecasts for recent days, so those days are fetched again on
+    every refresh (bypassing the HTTP cache) until they settle.
+
+    Several processes can share a store: appends hold a file lock and merge
+    their coverage into the manifest on disk, which readers reload when it
+    changes.
+    """
+
+    def __init__(self, root, finalize_after_days=7):
+        self.root = Path(root)
+        self.finalize_after_days = finalize_after_days
+        self._lock = threading.Lock()
+        self._manifest_path = self.root / "manifest.json"
+        self._manifest_signature = None
+        self._manifest = None
+        self._reload_manifest()
+
+    @staticmethod
+    def location_key(dataset, coords):
+        return f"{dataset}/{coords[0]:.4f}_{coords[1]:.4f}"
+
+    def _reload_manifest(self, force=False):
+        """Re-reads the manifest if another store (or process) replaced it."""
+        try:
+            stat = os.stat(self._manifest_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if not force and self._manifest is not None and signature == self._manifest_signature:
+            return
+        if signature is None:
+            self._manifest = {"revision": 0, "covered": {}}
+        else:
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+        self._manifest_signature = signature
+
+    def _save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest_signature = None  # re-read on the next access
+
+    @property
+    def revision(self):
+        """Counter bumped on every append, usable as a data version."""
+        with self._lock:
+            self._reload_manifest()
+            return self._manifest["revision"]
+
+    def covered_ranges(self, dataset, coords):
+        with self._lock:
+            self._reload_manifest()
+            return self._covered_ranges(dataset, coords)
+
+    def _covered_ranges(self, dataset, coords):
+        key = self.location_key(dataset, coords)
+        return [(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end))
+                for start, end in self._manifest["covered"].get(key, [])]
+
+    def missing_ranges(self, dataset, coords, start_date, end_date):
+        """Returns the (start, end) date ranges of [start_date, end_date] not stored yet."""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        missing = []
+        cursor = start_date
+        for covered_start, covered_end in self.covered_ranges(dataset, coords):
+            if covered_end < cursor:
+                continue
+            if covered_start > end_date:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start - datetime.timedelta(days=1)))
+            cursor = max(cursor, covered_end + datetime.timedelta(days=1))
+        if cursor <= end_date:
+            missing.append((cursor, end_date))
+        return missing
+
+    def append(self, dataset, coords, frame):
+        """Writes the rows of `frame` (with a "date" column), replacing stored days it overlaps."""
+        if frame is None or frame.empty:
+            return
+
+        frame = frame.copy()
+        frame["date"] = pd.to_datetime(frame["date"]).astype("datetime64[ns]")
+        location_dir = self.root / self.location_key(dataset, coords)
+
+        with self._lock:
+            location_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.root / "manifest.lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._write(dataset, coords, frame, location_dir)
+
+    def _write(self, dataset, coords, frame, location_dir):
+        # Runs under both locks: the month files and the manifest are read, merged and replaced
+        self._reload_manifest(force=True)
+        for month, month_frame in frame.groupby(frame["date"].dt.strftime("%Y-%m")):
+            path = location_dir / f"{month}.parquet"
+            if path.exists():
+                stored = pd.read_parquet(path)
+                month_frame = pd.concat([stored, month_frame])
+            month_frame = (month_frame.drop_duplicates("date", keep="last")
+                                      .sort_values("date")
+                                      .reset_index(drop=True))
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            month_frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+        # Only days old enough to be final count as covered
+        last_final_day = datetime.date.today() - datetime.timedelta(days=self.finalize_after_days)
+        first_day = frame["date"].min().date()
+        last_day = min(frame["date"].max().date(), last_final_day)
+        if first_day <= last_day:
+            self._mark_covered(dataset, coords, first_day, last_day)
+        self._manifest["revision"] += 1
+        self._save_manifest()
+
+    def _mark_covered(self, dataset, coords, start_date, end_date):
+        ranges = self._covered_ranges(dataset, coords) + [(start_date, end_date)]
+        ranges.sort()
+        merged = [ranges[0]]
+        for range_start, range_end in ranges[1:]:
+            last_start, last_end = merged[-1]
+            if range_start <= last_end + datetime.timedelta(days=1):
+                merged[-1] = (last_start, max(last_end, range_end))
+            else:
+                merged.append((range_start, range_end))
+        key = self.location_key(dataset, coords)
+        self._manifest["covered"][key] = [[start.isoformat(), end.isoformat()] for start, end in merged]
+
+    def read(self, dataset, coords, start_date, end_date, columns=None):
+        """Reads the stored rows between start_date and end_date (inclusive)."""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        location_dir = self.root / self.location_key(dataset, coords)
+        if columns is not None:
+            columns = ["date"] + [col for col in columns if col != "date"]
+
+        frames = []
+        for month in pd.period_range(start_date, end_date, freq="M"):
+            path = location_dir / f"{month.strftime('%Y-%m')}.parquet"
+            if path.exists():
+                frames.append(pd.read_parquet(path, columns=columns))
+        if not frames:
+            return None
+
+        data = pd.concat(frames, ignore_index=True)
+        mask = (data["date"] >= pd.Timestamp(start_date)) & (data["date"] <= pd.Timestamp(end_date))
+        return data.loc[mask].reset_index(drop=True)
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
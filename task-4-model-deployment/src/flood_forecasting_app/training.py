@@ -0,0 +1,266 @@
+"""
+Retraining of the three models from the historical data.
+
+The features are built by the app's own preprocess_data, so training and
+serving cannot drift apart. For each model, the feature matrix and the
+target are cached on disk (data_store/training_cache) under a key of the
+data file, features and target: the time-series folds are contiguous
+slices of it, memory-mapped by the workers, so a new search on the same
+data skips the preprocessing and ships no arrays between processes.
+
+Every (model, hyperparameters, fold) fit of the search runs in a process
+pool over all the cores. The best hyperparameters of each model (lowest
+mean RMSE, or log loss for the flood classifier) are refitted on the whole
+history, and the artifacts are written to models/versions/<version>/ with
+a metadata.json: features, target, data hash, parameters and CV metrics.
+--promote then copies them over the served models, which the app's model
+registry picks up on its own.
+
+    python training.py                    # search and write a new version
+    python training.py --promote          # ... and serve it
+    python training.py --quick            # small grid, e.g. to check the setup
+
+The targets are the next day's values (--target-shift 1), as predict_flood
+reads the predictions; --target-shift 0 fits same-day values instead.
+Training needs scikit-learn (the "training" extra).
+"""
+import argparse
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost
+from sklearn.metrics import f1_score, log_loss, mean_absolute_error, recall_score, root_mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+
+from modeling_utils import flood_features, model_registry, preprocess_data, regression_features
+
+BASE_DIR = Path(__file__).resolve().parent
+TRAINING_DATA = BASE_DIR.parents[2]/"task-2-data-preprocessing"/"DATA FILES"/"AllData_B4_EDA.csv"
+MODELS_DIR = BASE_DIR/"models"
+FOLD_CACHE_DIR = BASE_DIR/"data_store"/"training_cache"
+
+# What each registry model learns, and how its candidates are compared
+MODELS = {
+    "rain_model": {"features": regression_features, "target": "rain_sum (mm)", "kind": "regression"},
+    "discharge_model": {"features": regression_features, "target": "Longai_discharge (m³/s)", "kind": "regression"},
+    "flood_model": {"features": flood_features, "target": "flooded", "kind": "classification"},
+}
+SELECTION_METRIC = {"regression": "rmse", "classification": "log_loss"}
+
+# The shipped models use 100 trees at learning rate 0.1
+PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [3, 5, 7],
+    "learning_rate": [0.05, 0.1],
+}
+QUICK_GRID = {"n_estimators": [50], "max_depth": [3, 5], "learning_rate": [0.1]}
+
+
+def load_training_data(path=TRAINING_DATA):
+    """The daily history in the fetch_and_process_data layout (csv or parquet)."""
+    path = Path(path)
+    data = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+    return data.rename(columns={"Date": "date"})
+
+
+def file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def make_estimator(kind, params, n_jobs=1):
+    if kind == "regression":
+        return xgboost.XGBRegressor(objective="reg:squarederror", random_state=42, n_jobs=n_jobs, **params)
+    # Same setup as the shipped classifier: softmax over three classes, of which
+    # only 0 and 1 occur. predict_proba then has three columns, the serving code
+    # reads column 1 and maps argmax through classes_
+    return xgboost.XGBClassifier(objective="multi:softmax", num_class=3, random_state=42, n_jobs=n_jobs, **params)
+
+
+def fold_cache(name, data_hash, target_shift, n_splits, cache_dir=FOLD_CACHE_DIR, data=None):
+    """
+    Directory holding X.npy (float32), y.npy and folds.json for one model,
+    written on the first call for this data and setup. `data` is a callable
+    returning the preprocessed history, only called on a cache miss.
+    """
+    spec = MODELS[name]
+    key = hashlib.sha256(json.dumps([data_hash, spec["features"], spec["target"],
+                                     target_shift, n_splits]).encode()).hexdigest()[:16]
+    directory = Path(cache_dir) / f"{name}-{key}"
+    if (directory / "folds.json").exists():
+        return directory
+
+    frame = data()
+    target = frame[spec["target"]].shift(-target_shift) if target_shift else frame[spec["target"]]
+    rows = target.notna().to_numpy()
+    X = frame.loc[rows, spec["features"]].to_numpy(dtype=np.float32)
+    y = target[rows].to_numpy(dtype=np.float64)
+
+    # Train on [0, train_end), test on [train_end, test_end): folds are slices
+    folds = [[int(train[-1]) + 1, int(test[-1]) + 1] for train, test in TimeSeriesSplit(n_splits).split(X)]
+
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / "X.npy", X)
+    np.save(directory / "y.npy", y)
+    with open(directory / "folds.json", "w", encoding="utf-8") as f:
+        json.dump(folds, f)  # written last: its presence marks a complete cache
+    return directory
+
+
+def scores(kind, y_true, predicted):
+    """Metrics of one fold; `predicted` is values for regressors, class-1 probabilities for the classifier."""
+    if kind == "regression":
+        return {"rmse": float(root_mean_squared_error(y_true, predicted)),
+                "mae": float(mean_absolute_error(y_true, predicted))}
+    labels = (predicted >= 0.5).astype(int)
+    return {"log_loss": float(log_loss(y_true, predicted, labels=[0, 1])),
+            "f1": float(f1_score(y_true, labels, zero_division=0)),
+            "recall": float(recall_score(y_true, labels, zero_division=0))}
+
+
+def evaluate_fold(task):
+    """One fit of the search, run in a worker: (name, cache directory, params, fold) -> metrics."""
+    name, directory, params, (train_end, test_end) = task
+    kind = MODELS[name]["kind"]
+    X = np.load(directory / "X.npy", mmap_mode="r")
+    y = np.load(directory / "y.npy", mmap_mode="r")
+
+    model = make_estimator(kind, params).fit(X[:train_end], y[:train_end])
+    X_test, y_test = X[train_end:test_end], y[train_end:test_end]
+    predicted = model.predict(X_test) if kind == "regression" else model.predict_proba(X_test)[:, 1]
+    return scores(kind, y_test, predicted)
+
+
+def fit_final(task):
+    """Refits one model on the whole history, with feature names as the shipped models have."""
+    name, directory, params = task
+    spec = MODELS[name]
+    X = pd.DataFrame(np.load(directory / "X.npy"), columns=spec["features"])
+    y = np.load(directory / "y.npy")
+    if spec["kind"] == "classification":
+        y = y.astype(int)
+    return make_estimator(spec["kind"], params, n_jobs=-1).fit(X, y)
+
+
+def parameter_sets(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def search(directories, grid, workers=None):
+    """
+    Time-series CV of every parameter set, all fits spread over a process
+    pool. Returns {name: {"params": best, "cv": mean metrics, "folds": ..., "search": ...}}.
+    """
+    candidates = parameter_sets(grid)
+    tasks = []
+    for name, directory in directories.items():
+        with open(directory / "folds.json", encoding="utf-8") as f:
+            folds = json.load(f)
+        tasks += [(name, directory, params, fold) for params in candidates for fold in folds]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(evaluate_fold, tasks))
+
+    fold_metrics = {}
+    for (name, _, params, _), result in zip(tasks, results):
+        fold_metrics.setdefault((name, json.dumps(params)), []).append(result)
+
+    summary = {}
+    for name in directories:
+        metric = SELECTION_METRIC[MODELS[name]["kind"]]
+        by_params = []
+        for params in candidates:
+            folds = fold_metrics[(name, json.dumps(params))]
+            mean = {key: float(np.mean([fold[key] for fold in folds])) for key in folds[0]}
+            by_params.append({"params": params, "cv": mean, "folds": folds})
+        best = min(by_params, key=lambda candidate: candidate["cv"][metric])
+        summary[name] = {**best, "metric": metric,
+                         "search": [{"params": c["params"], metric: c["cv"][metric]} for c in by_params]}
+    return summary
+
+
+def train(data_path=TRAINING_DATA, grid=PARAM_GRID, n_splits=5, target_shift=1, workers=None,
+          models_dir=MODELS_DIR, cache_dir=FOLD_CACHE_DIR):
+    """Runs the search and writes a new version; returns its directory."""
+    data_hash = file_hash(data_path)
+    preprocessed = {}
+
+    def data():
+        if "frame" not in preprocessed:
+            preprocessed["frame"] = preprocess_data(load_training_data(data_path))
+        return preprocessed["frame"]
+
+    directories = {name: fold_cache(name, data_hash, target_shift, n_splits, cache_dir, data) for name in MODELS}
+    summary = search(directories, grid, workers)
+
+    with ProcessPoolExecutor(max_workers=min(len(MODELS), workers or os.cpu_count())) as pool:
+        models = dict(zip(MODELS, pool.map(fit_final, [(name, directories[name], summary[name]["params"])
+                                                       for name in MODELS])))
+
+    created = datetime.datetime.now(datetime.timezone.utc)
+    version = f"{created:%Y%m%d-%H%M%S}-{data_hash[:8]}"
+    directory = Path(models_dir) / "versions" / version
+    directory.mkdir(parents=True)
+    metadata = {
+        "version": version,
+        "created_at": created.isoformat(),
+        "data": {"file": Path(data_path).name, "sha256": data_hash},
+        "target_shift_days": target_shift,
+        "cv_splits": n_splits,
+        "xgboost": xgboost.__version__,
+        "models": {},
+    }
+    for name, model in models.items():
+        filename = model_registry.files[name]
+        joblib.dump(model, directory / filename)
+        metadata["models"][name] = {"file": filename, "features": MODELS[name]["features"],
+                                    "target": MODELS[name]["target"],
+                                    "rows": len(np.load(directories[name] / "y.npy", mmap_mode="r")), **summary[name]}
+    with open(directory / "metadata.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    return directory
+
+
+def promote(version_dir, models_dir=MODELS_DIR):
+    """Makes a version the served one: each file is swapped in with one rename."""
+    version_dir = Path(version_dir)
+    for name in [model_registry.files[name] for name in MODELS] + ["metadata.json"]:
+        tmp_path = Path(models_dir) / f"{name}.{os.getpid()}.tmp"
+        shutil.copyfile(version_dir / name, tmp_path)
+        os.replace(tmp_path, Path(models_dir) / name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(TRAINING_DATA), help="daily history, .csv or .parquet")
+    parser.add_argument("--splits", type=int, default=5, help="time-series CV folds")
+    parser.add_argument("--target-shift", type=int, default=1, help="days between the features and the target")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--quick", action="store_true", help="search a small grid")
+    parser.add_argument("--promote", action="store_true", help="serve the new models")
+    args = parser.parse_args(argv)
+
+    directory = train(args.data, QUICK_GRID if args.quick else PARAM_GRID, args.splits, args.target_shift, args.workers)
+    with open(directory / "metadata.json", encoding="utf-8") as f:
+        metadata = json.load(f)
+    for name, result in metadata["models"].items():
+        metric = result["metric"]
+        print(f"{name:<16} {metric} {result['cv'][metric]:.4f}  {result['params']}")
+    print(f"Version {metadata['version']} written to {directory}")
+
+    if args.promote:
+        promote(directory)
+        print("Promoted: the app serves the new models")
+
+
+if __name__ == "__main__":
+    main()
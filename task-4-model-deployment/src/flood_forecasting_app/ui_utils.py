@@ -1,7 +1,20 @@
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+from downsampling import downsample_indices
+from instrumentation import stage
 
+# Lines are reduced to about this many points, whatever the date range
+MAX_PLOT_POINTS = 1500
+# Lines with more points than this are drawn with WebGL
+WEBGL_POINTS = 1000
 
+
+def _scatter(n_points):
+    return go.Scattergl if n_points > WEBGL_POINTS else go.Scatter
+
+
+@stage("feature_evolution")
 def get_feature_evolution(data):
     try:
         yesterday_date = data.index[-2]
@@ -29,13 +42,16 @@ def get_feature_evolution(data):
         return None, None
 
 
+@stage("plot")
 def plot_and_display_data_predictions(
     data, discharge_col="Longai_discharge (m³/s)", predicted_discharge_col="predicted_discharge", 
-    flood_col="flood", proba_col="proba"
+    flood_col="flood", proba_col="proba", max_points=MAX_PLOT_POINTS, x_range=None, method="minmax",
+    band=("q10", "q90")
 ):
     """
     Plots river discharge levels, marks predicted flood days with red dots, 
-    and includes predicted discharge with a dashed green transition line.
+    and includes predicted discharge with a dashed green transition line
+    (through the forecast rows, if any) and past predictions as a dotted line.
 
     Parameters:
     - data (pd.DataFrame): DataFrame containing river discharge data.
@@ -43,29 +59,79 @@ def plot_and_display_data_predictions(
     - predicted_discharge_col (str): Column name for predicted discharge.
     - flood_col (str): Column name indicating if a flood is predicted (1 for flood, 0 otherwise).
     - proba_col (str): Column name for the predicted flood probability.
+    - max_points (int): The observed and past predicted lines are downsampled to
+      about this many points (None to draw every day). Flood days are always kept.
+    - x_range (tuple): Optional (start, end) dates to zoom on; the lines are
+      downsampled within that range only, so zooming in shows more detail.
+    - method (str): "minmax" (keeps every peak) or "lttb".
+    - band (tuple): Suffixes of the ensemble quantile columns (see ensemble.py);
+      when the data has them, the predicted discharge is drawn with its band.
     """
 
     try:
-        data.set_index('date', inplace=True)
+        data = data.set_index('date')
         fig = go.Figure()
         
+        # Forecast rows (appended by a multi-day prediction) are not observations
+        forecast = data["forecast"].astype(bool) if "forecast" in data.columns else pd.Series(False, index=data.index)
+        observed = data[~forecast]
+        shown = observed if x_range is None else observed.loc[pd.Timestamp(x_range[0]):pd.Timestamp(x_range[1])]
+
+        # Flood rows and the days their markers are drawn on stay in the line
+        flood_positions = np.flatnonzero(shown[flood_col].to_numpy() == 1)
+        keep = np.concatenate([flood_positions, flood_positions + 1])
+        line = shown.iloc[downsample_indices(shown.index, shown[discharge_col], max_points, method, keep)]
+
         # Plot known river discharge levels
-        fig.add_trace(go.Scatter(
-            x=data.index, 
-            y=data[discharge_col], 
+        fig.add_trace(_scatter(len(line))(
+            x=line.index, 
+            y=line[discharge_col], 
             mode='lines',
             name='River Discharge Level',
             line=dict(color='blue')
         ))
 
-        # Add predicted discharge with a dashed green line from the last known value
-        last_date = data.index[-1]  # Last date in the dataset
+        last_date = observed.index[-1]  # Last observed date in the dataset
         if predicted_discharge_col in data.columns and not data[predicted_discharge_col].isna().all():
-            next_date = last_date + pd.Timedelta(days=1)  # Next day's timestamp
-
+            # Past predictions, plotted on the day they were made for
+            past = shown[predicted_discharge_col].iloc[:-1].dropna()
+            past = past.iloc[downsample_indices(past.index, past, max_points, method)]
+            if not past.empty:
+                fig.add_trace(_scatter(len(past))(
+                    x=past.index + pd.Timedelta(days=1), 
+                    y=past, 
+                    mode='lines',
+                    name='Past Predicted Discharge',
+                    line=dict(color='green', dash='dot', width=1)
+                ))
+
+            # Add predicted discharge with a dashed green line from the last known value
+            upcoming = data.loc[last_date:, predicted_discharge_col]
+            upcoming_dates = [last_date, *(upcoming.index + pd.Timedelta(days=1))]
+            low_col, high_col = (f"{predicted_discharge_col}_{suffix}" for suffix in band)
+            if low_col in data.columns and high_col in data.columns:
+                # Ensemble band, filled between its upper and lower edges
+                start = data.loc[last_date, discharge_col]
+                fig.add_trace(go.Scatter(
+                    x=upcoming_dates,
+                    y=[start, *data.loc[last_date:, high_col]],
+                    mode='lines',
+                    line=dict(width=0),
+                    showlegend=False,
+                    hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=upcoming_dates,
+                    y=[start, *data.loc[last_date:, low_col]],
+                    mode='lines',
+                    name=f'Predicted Discharge ({band[0]}-{band[1]})',
+                    line=dict(width=0),
+                    fill='tonexty',
+                    fillcolor='rgba(0, 128, 0, 0.15)'
+                ))
             fig.add_trace(go.Scatter(
-                x=[last_date, next_date], 
-                y=[data.loc[last_date, discharge_col], data.loc[last_date, predicted_discharge_col]],
+                x=upcoming_dates, 
+                y=[data.loc[last_date, discharge_col], *upcoming],
                 mode='lines+markers',
                 name='Predicted Discharge',
                 line=dict(color='green', dash='dash'),
@@ -75,6 +141,15 @@ def plot_and_display_data_predictions(
         # Shift flood data to next date
         flood_data = data[data[flood_col] == 1].copy()
         flood_data.index += pd.Timedelta(days=1)  # Move flood predictions to the next day
+        if x_range is not None:
+            flood_data = flood_data.loc[pd.Timestamp(x_range[0]):pd.Timestamp(x_range[1]) + pd.Timedelta(days=1)]
+
+        # Flood probability, with its ensemble band on the forecast days
+        hover = [f"Predicted Flood<br>Probability: {p:.2f}" for p in flood_data[proba_col]]
+        proba_low, proba_high = (f"{proba_col}_{suffix}" for suffix in band)
+        if proba_low in flood_data.columns and proba_high in flood_data.columns:
+            hover = [text + (f" ({low:.2f}-{high:.2f})" if not np.isnan(low) else "")
+                     for text, low, high in zip(hover, flood_data[proba_low], flood_data[proba_high])]
 
         fig.add_trace(go.Scatter(
             x=flood_data.index, 
@@ -82,7 +157,7 @@ def plot_and_display_data_predictions(
             mode='markers',
             name='Predicted Flood',
             marker=dict(size=12, color='red', symbol='circle'),
-            text=[f"Predicted Flood<br>Probability: {p:.2f}" for p in flood_data[proba_col]],
+            text=hover,
             hoverinfo='text'
         ))
 
@@ -93,6 +168,8 @@ def plot_and_display_data_predictions(
             yaxis_title='Discharge Level',
             template='plotly_white'
         )
+        if x_range is not None:
+            fig.update_xaxes(range=[pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])])
 
         return fig
 
@@ -0,0 +1,159 @@
+"""
+Benchmark harness of the pipeline stages (opt-in):
+
+    pytest tests/benchmarks --benchmark                  # compare with the baselines
+    pytest tests/benchmarks --benchmark --benchmark-save # store new baselines
+
+Each stage is timed over repeated rounds (best round kept) and its peak
+memory is measured in one extra round with tracemalloc, which tracks the
+Python and NumPy allocations. A stage fails when its time or peak memory
+exceeds its baseline by more than --benchmark-threshold (1.5x by default).
+
+Times are not compared in seconds, which depend on the machine and its
+load: every round of a stage is paired with a round of a fixed
+calibration workload (pandas, NumPy and plain Python), and stages are
+stored and compared as multiples of it. Baselines saved on one machine
+thus apply on another.
+"""
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BASELINES_FILE = Path(__file__).resolve().parent / "baselines.json"
+
+# Differences below these are noise, whatever the ratio
+TIME_SLACK = 0.001
+MEMORY_SLACK_MB = 0.25
+
+_results_key = pytest.StashKey[dict]()
+
+
+def calibration_workload():
+    """Fixed mix of the work the stages do: pandas rolling windows, NumPy sorting, Python loops."""
+    values = np.random.default_rng(0).random(100_000)
+    pd.Series(values).rolling(7).sum()
+    np.sort(values)
+    total = 0.0
+    for value in values[:20_000].tolist():
+        total += value
+    return total
+
+
+def measure(function, *args, min_time=0.3, min_rounds=5, max_rounds=50):
+    """
+    Best and median wall time over several rounds, the same in calibration
+    rounds, and the peak traced memory of one round. Each round of the stage
+    follows a calibration round, so both see the same machine load.
+    """
+    result = function(*args)  # warm-up: model loads, caches
+    calibration_workload()
+    timings, calibrations = [], []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or (time.perf_counter() - started < min_time and len(timings) < max_rounds):
+        round_start = time.perf_counter()
+        calibration_workload()
+        calibrations.append(time.perf_counter() - round_start)
+        round_start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - round_start)
+
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        "seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "calibration_seconds": min(calibrations),
+        "units": min(timings) / min(calibrations),
+        "rounds": len(timings),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def load_baselines():
+    if not BASELINES_FILE.exists():
+        return {}
+    with open(BASELINES_FILE, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    return load_baselines()
+
+
+@pytest.fixture
+def bench(request, baselines):
+    """bench(stage, size, function, *args): measures a stage, compares it with its baseline, returns its result."""
+    config = request.config
+    results = config.stash.setdefault(_results_key, {})
+    threshold = config.getoption("--benchmark-threshold")
+
+    def run(stage, size, function, *args):
+        result, measured = measure(function, *args)
+        assert result is not None, f"{stage} returned None"
+        key = f"{stage}[{size}]"
+        results[key] = measured
+
+        baseline = baselines.get(key)
+        if baseline is None or config.getoption("--benchmark-save"):
+            return result
+        failures = []
+        # The baseline's time on this machine
+        expected = baseline["units"] * measured["calibration_seconds"]
+        if measured["seconds"] > max(expected * threshold, expected + TIME_SLACK):
+            failures.append(f"{measured['seconds'] * 1000:.2f} ms vs {expected * 1000:.2f} ms "
+                            f"({measured['units']:.3f} vs {baseline['units']:.3f} calibration rounds)")
+        if measured["peak_mb"] > max(baseline["peak_mb"] * threshold, baseline["peak_mb"] + MEMORY_SLACK_MB):
+            failures.append(f"peak {measured['peak_mb']:.2f} MB vs {baseline['peak_mb']:.2f} MB")
+        if failures:
+            pytest.fail(f"{key} regressed past {threshold}x its baseline: " + ", ".join(failures))
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(_results_key, None)
+    if not results:
+        return
+    baselines = load_baselines()
+    terminalreporter.section("benchmarks")
+    calibration = statistics.median(measured["calibration_seconds"] for measured in results.values())
+    terminalreporter.write_line(f"calibration round: {calibration * 1000:.2f} ms (median over the stages)")
+    terminalreporter.write_line(f"{'stage':<42}{'best (ms)':>12}{'median (ms)':>13}{'peak (MB)':>11}{'vs base':>9}")
+    for key, measured in results.items():
+        baseline = baselines.get(key)
+        if config.getoption("--benchmark-save"):
+            ratio = "saved"
+        else:
+            ratio = f"{measured['units'] / baseline['units']:.2f}x" if baseline else "new"
+        terminalreporter.write_line(
+            f"{key:<42}{measured['seconds'] * 1000:>12.2f}{measured['median_seconds'] * 1000:>13.2f}"
+            f"{measured['peak_mb']:>11.2f}{ratio:>9}")
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    results = config.stash.get(_results_key, None)
+    if not results or not config.getoption("--benchmark-save"):
+        return
+    stored = load_baselines()
+    stored.update({key: {"units": round(measured["units"], 4), "peak_mb": round(measured["peak_mb"], 3)}
+                   for key, measured in results.items()})
+    with open(BASELINES_FILE, "w", encoding="utf-8") as f:
+        # Times are in calibration rounds; the machine is only kept for reference
+        json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                   "results": dict(sorted(stored.items()))}, f, indent=2)
+        f.write("\n")
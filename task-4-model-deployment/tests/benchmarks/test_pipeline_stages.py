@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_collection_utils import (DAILY_COLUMNS, HOURLY_COLUMNS, SECONDS_PER_DAY, get_features_from_response,
+                                   get_target_from_response, merge_features_target)
+from ensemble import add_ensemble_bands
+from meteo_encoding import decode_responses, encode_response
+from modeling_utils import predict_flood, preprocess_data
+from ui_utils import get_feature_evolution, plot_and_display_data_predictions
+
+pytestmark = pytest.mark.benchmark
+
+# Window lengths in days, the last ten years of the history at most
+SIZES = {"7d": 7, "1y": 365, "10y": 3650}
+
+
+@pytest.fixture(scope="module", params=list(SIZES))
+def window(request, history):
+    data = history.iloc[-SIZES[request.param]:].reset_index(drop=True)
+    data["date"] = pd.to_datetime(data["date"])
+    data["wind_direction_10m_dominant"] = data["wind_direction_10m_dominant (°)"]
+    return request.param, data
+
+
+@pytest.fixture(scope="module")
+def responses(window):
+    """The window as the archive and flood APIs would return it."""
+    _, data = window
+    start = data["date"].iloc[0].value // 10**9
+    daily = (start, SECONDS_PER_DAY, [data[column].to_numpy() for column in DAILY_COLUMNS])
+    hourly = (start, 3600, [np.repeat(data[column].to_numpy(), 24) for column in HOURLY_COLUMNS])
+    archive = decode_responses(encode_response(24.80, 92.35, daily=daily, hourly=hourly))
+    discharge = (start, SECONDS_PER_DAY, [data["Longai_discharge (m³/s)"].to_numpy()])
+    flood = decode_responses(encode_response(24.80, 92.35, daily=discharge))
+    return archive, flood
+
+
+@pytest.fixture(scope="module")
+def predicted(window):
+    _, data = window
+    return predict_flood(data, horizon=3, backfill=True)
+
+
+def test_get_features_from_response(bench, window, responses):
+    size, _ = window
+    archive, _ = responses
+    bench("get_features_from_response", size, get_features_from_response, archive)
+
+
+def test_merge_features_target(bench, window, responses):
+    size, _ = window
+    archive, flood = responses
+    features = get_features_from_response(archive)
+    target = get_target_from_response(flood)
+    bench("merge_features_target", size, merge_features_target, features, target)
+
+
+def test_preprocess_data(bench, window):
+    size, data = window
+    bench("preprocess_data", size, preprocess_data, data)
+
+
+def test_predict_flood(bench, window):
+    size, data = window
+    bench("predict_flood", size, predict_flood, data, 3, True)
+
+
+def test_add_ensemble_bands(bench, window, predicted):
+    size, _ = window
+    bench("add_ensemble_bands", size, add_ensemble_bands, predicted.copy())
+
+
+def test_get_feature_evolution(bench, window, predicted):
+    size, _ = window
+    observed = predicted[~predicted["forecast"]]
+    bench("get_feature_evolution", size, get_feature_evolution, observed)
+
+
+def test_plot_and_display_data_predictions(bench, window, predicted):
+    size, _ = window
+    bench("plot_and_display_data_predictions", size, plot_and_display_data_predictions, predicted)
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# The app modules import each other by plain name, as when run by Streamlit
+APP_DIR = Path(__file__).resolve().parents[1] / "src" / "flood_forecasting_app"
+sys.path.insert(0, str(APP_DIR))
+
+HISTORY_CSV = Path(__file__).resolve().parents[2] / "task-2-data-preprocessing" / "DATA FILES" / "AllData_B4_EDA.csv"
+
+
+@pytest.fixture(scope="session")
+def history():
+    """Ten years of daily features and gauge discharges, in the fetch_and_process_data layout."""
+    data = pd.read_csv(HISTORY_CSV).rename(columns={"Date": "date"})
+    data["precipitation_sum (mm)"] = data["rain_sum (mm)"]
+    return data
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption("--benchmark", action="store_true", help="run the benchmarks of tests/benchmarks")
+    group.addoption("--benchmark-save", action="store_true", help="store the benchmark results as the new baselines")
+    group.addoption("--benchmark-threshold", type=float, default=1.5,
+                    help="fail when a stage is this many times slower, or bigger, than its baseline")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing and memory benchmark, opt-in with --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,134 @@
+import queue
+
+import pandas as pd
+import pytest
+
+import refresh_scheduler
+from alerting import AlertEngine, QueueSink
+from refresh_scheduler import RefreshScheduler
+
+RULES = {"Longai": {"levels": {"warning": 100, "danger": 200}, "rise_per_day": 50,
+                    "flood_proba": 0.5, "flood_days": 2}}
+LEVELS = {"Longai": {"levels": {"warning": 100, "danger": 200}}}
+
+
+@pytest.fixture
+def engine():
+    return AlertEngine(rules=RULES, sinks=[QueueSink(queue.Queue())], hysteresis=0.1)
+
+
+def hourly(day, hour):
+    return f"2024-06-{day:02d}T{hour:02d}:00:00"
+
+
+def test_levels_do_not_flap_around_the_threshold(engine):
+    raised = engine.observe("Longai", hourly(1, 0), 101)
+    hovering = [engine.observe("Longai", hourly(2, hour), value) for hour, value in enumerate([99, 101, 95, 100])]
+    cleared = engine.observe("Longai", hourly(3, 0), 89)
+
+    assert [(a["rule"], a["state"]) for a in raised] == [("level:warning", "raised")]
+    assert all(not alerts for alerts in hovering)
+    assert [(a["rule"], a["state"]) for a in cleared] == [("level:warning", "cleared")]
+
+
+def test_rate_of_rise_is_measured_over_the_window(engine):
+    engine.observe("Longai", hourly(1, 0), 10)
+    assert engine.observe("Longai", hourly(1, 12), 30) == []  # 40 per day
+    alerts = engine.observe("Longai", hourly(1, 18), 60)      # 66.7 per day
+
+    assert [(a["rule"], a["state"]) for a in alerts] == [("rise", "raised")]
+    assert alerts[0]["value"] == pytest.approx(66.667, abs=1e-3)
+
+
+def test_flood_probability_needs_consecutive_days(engine):
+    assert engine.observe("Longai", "2024-06-01", 0, 0.7) == []
+    assert engine.observe("Longai", "2024-06-02", 0, 0.3) == []
+    assert engine.observe("Longai", "2024-06-03", 0, 0.6) == []
+    alerts = engine.observe("Longai", "2024-06-04", 0, 0.8)
+
+    assert [(a["rule"], a["state"]) for a in alerts] == [("flood_proba", "raised")]
+
+
+def test_replayed_windows_alert_once_and_the_state_survives_restarts(tmp_path):
+    data = pd.DataFrame({
+        "date": pd.date_range("2024-06-01", periods=6, freq="D"),
+        "Longai": [50, 150, 250, 260, 120, 40],
+        "forecast": [False] * 5 + [True],
+    })
+    sink = queue.Queue()
+    state_path = tmp_path / "state.json"
+
+    first = AlertEngine(rules=RULES, sinks=[QueueSink(sink)], state_path=state_path).observe_frame(data)
+    replayed = AlertEngine(rules=RULES, sinks=[QueueSink(sink)], state_path=state_path).observe_frame(data)
+
+    assert ("level:danger", "cleared") in [(a["rule"], a["state"]) for a in first]
+    assert all(a["time"] < "2024-06-06" for a in first)  # forecast rows are not observations
+    assert replayed == []
+    assert sink.qsize() == len(first)
+
+
+def test_a_revised_latest_observation_is_evaluated_again(engine):
+    data = pd.DataFrame({"date": pd.date_range("2024-06-01", periods=3, freq="D"), "Longai": [50, 80, 150]})
+    first = engine.observe_frame(data)
+    revised = engine.observe_frame(data.assign(Longai=[50, 80, 250]))
+    unchanged = engine.observe_frame(data.assign(Longai=[50, 80, 250]))
+    lowered = engine.observe_frame(data.assign(Longai=[50, 80, 150]))
+
+    assert [(a["rule"], a["state"]) for a in first] == [("level:warning", "raised"), ("rise", "raised")]
+    assert [(a["rule"], a["state"]) for a in revised] == [("level:danger", "raised")]
+    assert unchanged == []
+    assert [(a["rule"], a["state"]) for a in lowered] == [("level:danger", "cleared")]
+
+
+def test_processes_taking_turns_to_refresh_alert_once(tmp_path, monkeypatch):
+    data = pd.DataFrame({"date": pd.date_range("2024-06-01", periods=3, freq="D"), "Longai": [50, 150, 250],
+                         "forecast": [False] * 3})
+    monkeypatch.setattr(refresh_scheduler, "run_pipeline", lambda *args, **kwargs: data)
+    sink = queue.Queue()
+    # Both engines are created before either refresh, as in the app and the standalone worker
+    schedulers = [RefreshScheduler(snapshot_dir=tmp_path, alert_engine=AlertEngine(
+        rules=RULES, sinks=[QueueSink(sink)], state_path=tmp_path / "state.json")) for _ in range(2)]
+
+    assert all(scheduler.refresh_once() for scheduler in schedulers)
+    assert [alert["rule"] for alert in sink.queue] == ["level:warning", "rise", "level:danger"]
+
+
+def days(values):
+    return pd.DataFrame({"date": pd.date_range("2024-06-01", periods=len(values), freq="D"), "Longai": values})
+
+
+def transitions(alerts):
+    return [(a["rule"], a["state"], a["time"][:10]) for a in alerts]
+
+
+def test_a_revised_earlier_day_is_evaluated_again_with_the_days_after_it(tmp_path):
+    state_path = tmp_path / "state.json"
+    first = AlertEngine(rules=LEVELS, hysteresis=0.1, state_path=state_path).observe_frame(
+        days([50, 80, 150, 160, 170]))
+    # A restarted engine still has the checkpoints of the unsettled days
+    engine = AlertEngine(rules=LEVELS, hysteresis=0.1, state_path=state_path)
+    revised = engine.observe_frame(days([50, 250, 150, 160, 170]))
+
+    assert transitions(first) == [("level:warning", "raised", "2024-06-03")]
+    # The warning already sent stays raised; danger is raised on the revised day and cleared the day after
+    assert transitions(revised) == [("level:danger", "raised", "2024-06-02"), ("level:danger", "cleared", "2024-06-03")]
+    assert engine.observe_frame(days([50, 250, 150, 160, 170])) == []
+
+
+def test_hysteresis_follows_the_revised_history(engine):
+    engine.rules = LEVELS
+    engine.observe_frame(days([50, 150, 95, 97]))  # warning raised on the 2nd, held by the hysteresis
+
+    # The 3rd revised within the hysteresis band: the warning raised on the 2nd still holds
+    assert engine.observe_frame(days([50, 150, 92, 97])) == []
+    # Revised below it: cleared on the 3rd, and 97 on the 4th is under the threshold again
+    assert transitions(engine.observe_frame(days([50, 150, 85, 97]))) == [("level:warning", "cleared", "2024-06-03")]
+    assert transitions(engine.observe("Longai", "2024-06-05", 95)) == []
+
+
+def test_days_older_than_the_revisable_window_are_settled():
+    engine = AlertEngine(rules=LEVELS, revisable_days=2)
+    engine.observe_frame(days([50, 80, 150, 160, 170]))
+
+    assert engine.observe_frame(days([250, 250, 150, 160, 170])) == []
+    assert len(engine.states["Longai"].observed) == 3  # the last day and the two before it
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from archive_ingest import build_archive, load_archive
+
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    path = tmp_path_factory.mktemp("archive") / "history.parquet"
+    build_archive(path, gauge_rainfall=False)
+    return path
+
+
+def test_archive_matches_the_training_history(archive, history):
+    columns = ["rain_sum (mm)", "Longai_discharge (m³/s)", "Kushi_discharge (m³/s)",
+               "pressure_msl (hPa)", "soil_moisture_100_to_255cm (m³/m³)", "flooded"]
+    data = load_archive(columns, path=archive)
+
+    assert list(data.columns) == ["date"] + columns
+    assert data["date"].dtype == "datetime64[ns]"
+    assert data["rain_sum (mm)"].dtype == np.float32
+    assert data["flooded"].dtype == "Int8"
+
+    expected = history.assign(date=pd.to_datetime(history["date"]))[["date"] + columns]
+    merged = expected.merge(data, on="date", suffixes=("", "_archive"))
+    assert len(merged) == len(expected)
+    for column in columns:
+        np.testing.assert_allclose(merged[f"{column}_archive"].astype(float), merged[column], rtol=1e-6)
+
+
+def test_load_archive_window(archive):
+    data = load_archive(["rain_sum (mm)"], "2022-06-01", "2022-06-30", path=archive)
+
+    assert len(data) == 30
+    assert data["date"].iloc[0] == pd.Timestamp("2022-06-01")
+    assert data["date"].iloc[-1] == pd.Timestamp("2022-06-30")
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_inference import PREDICTION_COLUMNS, file_tasks, normalize_input, run, score_chunk
+from modeling_utils import predict_flood
+
+
+@pytest.fixture(scope="module")
+def archive(history, tmp_path_factory):
+    path = tmp_path_factory.mktemp("batch") / "history.csv"
+    history.iloc[-200:].rename(columns={"date": "Date"}).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope="module")
+def expected(archive):
+    # The whole file scored at once: every rolling window sees all the days before it
+    data, _ = normalize_input(pd.read_csv(archive))
+    return predict_flood(data, backfill=True)
+
+
+def assert_same_predictions(result, expected):
+    assert list(pd.to_datetime(result["date"])) == list(pd.to_datetime(expected["date"]))
+    for column in PREDICTION_COLUMNS:
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-6, err_msg=column)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 6, 7, 45])
+def test_chunks_carry_the_rolling_context(archive, expected, chunk_size):
+    result = pd.concat([score_chunk(*task) for task in file_tasks(archive, chunk_size, ())], ignore_index=True)
+    assert_same_predictions(result, expected)
+
+
+def test_pool_writes_the_predictions_in_input_order(archive, expected, tmp_path):
+    output = tmp_path / "predictions.parquet"
+    assert run(file_tasks(archive, 25, ["flooded"]), output, workers=2) == len(expected)
+
+    result = pd.read_parquet(output)
+    assert list(result.columns) == ["date", "flooded"] + PREDICTION_COLUMNS
+    assert_same_predictions(result, expected)
@@ -0,0 +1,151 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_collection_utils
+from data_collection_utils import (DAILY_COLUMNS, HOURLY_COLUMNS, SECONDS_PER_DAY, fetch_meteo_data,
+                                   get_features_from_response, get_target_from_response)
+from locations import ARCHIVE_COORDS, GAUGES
+from meteo_encoding import decode_responses, encode_response
+from openmeteo_stub import StubServer
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    server = StubServer().start()
+    monkeypatch.chdir(tmp_path)  # the HTTP cache file
+    monkeypatch.setattr(data_collection_utils, "ARCHIVE_URL", f"{server.url}/v1/archive")
+    monkeypatch.setattr(data_collection_utils, "HTTP_CACHE", True)
+    monkeypatch.setattr(data_collection_utils, "_clients", {})
+    yield server
+    server.stop()
+
+
+def test_recent_windows_bypass_the_http_cache(server):
+    for _ in range(2):
+        assert fetch_meteo_data("2020-06-01", "2020-06-10") is not None
+    assert server.requests == 1  # settled days: served from the cache
+
+    end_date = datetime.date.today()
+    for _ in range(2):
+        assert fetch_meteo_data(str(end_date - datetime.timedelta(days=30)), str(end_date)) is not None
+    assert server.requests == 3
+
+
+def legacy_features(response):
+    # Reference: the pandas decoding get_features_from_response replaced (hourly groupby mean, merge on the date)
+    def frame(section, columns):
+        data = {"date": pd.date_range(pd.to_datetime(section.Time(), unit="s", utc=True),
+                                      pd.to_datetime(section.TimeEnd(), unit="s", utc=True),
+                                      freq=pd.Timedelta(seconds=section.Interval()), inclusive="left").date}
+        for i, column in enumerate(columns):
+            data[column] = section.Variables(i).ValuesAsNumpy()
+        return pd.DataFrame(data)
+
+    daily_avg = frame(response.Hourly(), HOURLY_COLUMNS).groupby("date").mean(numeric_only=True).reset_index()
+    for column, decimals in HOURLY_COLUMNS.items():
+        daily_avg[column] = daily_avg[column].round(decimals)
+    return frame(response.Daily(), DAILY_COLUMNS).merge(daily_avg, on="date")
+
+
+def archive_response(history, first_hour, n_hours, seed=0):
+    """Archive response over the history: daily values from midnight, hourly ones from `first_hour`."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-06-01").value // 10**9
+    n_days = (first_hour + n_hours + 23) // 24
+    days = history.iloc[-n_days:].rename(columns={"wind_direction_10m_dominant (°)": "wind_direction_10m_dominant"})
+    daily = (start, SECONDS_PER_DAY, [days[column].to_numpy(np.float32) for column in DAILY_COLUMNS])
+    hourly = []
+    for column in HOURLY_COLUMNS:
+        values = np.repeat(days[column].to_numpy(np.float32), 24)[first_hour:first_hour + n_hours]
+        values = values * rng.uniform(0.9, 1.1, n_hours).astype(np.float32)
+        values[rng.random(n_hours) < 0.1] = np.nan  # skipped by the means
+        hourly.append(values)
+    hourly[0][:24 - first_hour % 24] = np.nan  # a day without any value
+    return decode_responses(encode_response(24.80, 92.35, daily=daily,
+                                            hourly=(start + first_hour * 3600, 3600, hourly)))
+
+
+@pytest.mark.parametrize("first_hour, n_hours", [(0, 24 * 30), (6, 24 * 30), (0, 24 * 30 - 5), (13, 100), (5, 1)])
+def test_features_match_the_pandas_decoding(history, first_hour, n_hours):
+    # Whole days take the reshape path, windows cut inside a day the reduceat one
+    responses = archive_response(history, first_hour, n_hours)
+    expected = legacy_features(responses[0])
+    result = get_features_from_response(responses)
+
+    assert list(result.columns) == list(expected.columns)
+    assert list(result["date"].dt.date) == list(expected["date"])
+    for column in DAILY_COLUMNS + list(HOURLY_COLUMNS):
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-6, equal_nan=True, err_msg=column)
+
+
+def test_target_matches_the_pandas_decoding(history):
+    values = history["Longai_discharge (m³/s)"].to_numpy(np.float32)[-40:]
+    start = pd.Timestamp("2020-06-01").value // 10**9
+    payload = encode_response(24.80, 92.35, daily=(start, SECONDS_PER_DAY, [values])) + encode_response(
+        24.63, 91.78, daily=(start, SECONDS_PER_DAY, [values * 2]))
+
+    result = get_target_from_response(decode_responses(payload), "Kushi_discharge (m³/s)", index=1)
+    expected_dates = pd.date_range("2020-06-01", periods=40).date
+    assert list(result.columns) == ["date", "Kushi_discharge (m³/s)"]
+    assert list(result["date"].dt.date) == list(expected_dates)
+    np.testing.assert_array_equal(result["Kushi_discharge (m³/s)"], values * 2)
+
+
+class RecordingClient:
+    """Stands in for the Open-Meteo client: records each call, and answers it after a delay."""
+
+    def __init__(self, n_days, delay=0.2):
+        self.n_days = n_days
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def weather_api(self, url, params):
+        started = time.monotonic()
+        time.sleep(self.delay)
+        coords = list(zip(params["latitude"], params["longitude"])) if isinstance(params["latitude"], list) \
+            else [(params["latitude"], params["longitude"])]
+        with self.lock:
+            self.calls.append({"url": url, "coords": coords, "thread": threading.current_thread().name,
+                               "start": started, "end": time.monotonic()})
+
+        start = pd.Timestamp(params["start_date"]).value // 10**9
+        payload = b""
+        for index, (lat, lon) in enumerate(coords):
+            if url == data_collection_utils.FLOOD_URL:
+                # Each location answers with discharges of its own index
+                discharge = np.full(self.n_days, 100.0 * (index + 1), dtype=np.float32)
+                payload += encode_response(lat, lon, daily=(start, SECONDS_PER_DAY, [discharge]))
+            else:
+                daily = [np.ones(self.n_days, dtype=np.float32)] * len(DAILY_COLUMNS)
+                hourly = [np.ones(24 * self.n_days, dtype=np.float32)] * len(HOURLY_COLUMNS)
+                payload += encode_response(lat, lon, daily=(start, SECONDS_PER_DAY, daily),
+                                           hourly=(start, 3600, hourly))
+        return decode_responses(payload)
+
+
+def test_fetch_raw_data_runs_both_calls_concurrently(monkeypatch):
+    client = RecordingClient(n_days=10)
+    monkeypatch.setattr(data_collection_utils, "get_openmeteo_client", lambda cached=True: client)
+
+    features, targets = data_collection_utils.fetch_raw_data("2020-06-01", "2020-06-10")
+
+    assert len(client.calls) == 2
+    archive, = [call for call in client.calls if call["url"] == data_collection_utils.ARCHIVE_URL]
+    flood, = [call for call in client.calls if call["url"] == data_collection_utils.FLOOD_URL]
+    assert archive["coords"] == [ARCHIVE_COORDS]
+    assert flood["coords"] == list(GAUGES.values())  # the four gauges in one batched call
+    # Both ran at the same time, on the shared pool
+    assert archive["start"] < flood["end"] and flood["start"] < archive["end"]
+    assert archive["thread"].startswith("openmeteo") and flood["thread"].startswith("openmeteo")
+
+    assert len(features) == 10
+    assert list(targets) == list(GAUGES)
+    for index, (name, target) in enumerate(targets.items()):
+        assert list(target.columns) == ["date", name]
+        np.testing.assert_array_equal(target[name], 100.0 * (index + 1))
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import downsample_indices, lttb_indices, minmax_indices
+from ui_utils import plot_and_display_data_predictions
+
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(0)
+    return np.cumsum(rng.normal(size=20_000)) + 10 * np.sin(np.arange(20_000) / 300)
+
+
+def test_minmax_keeps_every_bucket_extreme(series):
+    picked = minmax_indices(series, 100)
+
+    assert len(picked) <= 200
+    assert series.argmax() in picked and series.argmin() in picked
+    for bucket in np.array_split(np.arange(len(series)), 100):
+        assert series[bucket].max() in series[picked]
+
+
+def test_lttb_returns_the_requested_number_of_points(series):
+    picked = lttb_indices(np.arange(len(series)), series, 500)
+
+    assert len(picked) == 500
+    assert picked[0] == 0 and picked[-1] == len(series) - 1
+    assert np.all(np.diff(picked) > 0)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_downsample_keeps_requested_points(series, method):
+    keep = [12_345, 17_000]
+    picked = downsample_indices(np.arange(len(series)), series, 1000, method, keep)
+
+    assert len(picked) <= 1000 + len(keep) + 2
+    assert set(keep) <= set(picked)
+
+
+def test_plot_payload_is_bounded(history):
+    data = history.assign(date=pd.to_datetime(history["date"]))
+    data = pd.concat([data] * 3, ignore_index=True)
+    data["date"] = pd.date_range("1995-01-01", periods=len(data))
+    data["predicted_discharge"] = data["Longai_discharge (m³/s)"]
+    data["flood"] = data["flooded"]
+    data["proba"] = data["flooded"].astype(float)
+
+    fig = plot_and_display_data_predictions(data, max_points=500)
+
+    line = fig.data[0]
+    assert len(line.x) <= 500 + 2 * data["flood"].sum() + 2
+    assert data["Longai_discharge (m³/s)"].max() in line.y
+    flood_days = set(data.loc[data["flood"] == 1, "date"])
+    assert flood_days <= set(pd.to_datetime(line.x))
+    assert len(fig.data[1].x) <= 500 + 2
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import modeling_utils
+from ensemble import add_ensemble_bands
+from modeling_utils import predict_flood
+from ui_utils import plot_and_display_data_predictions
+
+HORIZON = 5
+
+
+@pytest.fixture(scope="module")
+def forecast(history):
+    return predict_flood(history.iloc[-60:].reset_index(drop=True), horizon=HORIZON, backfill=True)
+
+
+def test_members_without_noise_reproduce_the_point_forecast(forecast):
+    data = add_ensemble_bands(forecast.copy(), members=4, input_spread={},
+                              model_spread={"predicted_rain": 0, "predicted_discharge": 0})
+
+    banded = data["proba_q10"].notna()
+    assert banded.sum() == HORIZON and banded.iloc[-HORIZON:].all()
+    for column in ["predicted_rain", "predicted_discharge", "proba"]:
+        np.testing.assert_allclose(data.loc[banded, f"{column}_q10"], data.loc[banded, column], rtol=1e-6)
+        np.testing.assert_allclose(data.loc[banded, f"{column}_q90"], data.loc[banded, column], rtol=1e-6)
+
+
+def test_bands_widen_over_the_horizon(forecast):
+    data = add_ensemble_bands(forecast.copy())
+    rows = data.iloc[-HORIZON:]
+
+    width = rows["predicted_discharge_q90"] - rows["predicted_discharge_q10"]
+    assert (width > 0).all() and width.iloc[-1] > width.iloc[0]
+    assert (rows["predicted_rain_q10"] <= rows["predicted_rain_q90"]).all()
+    assert data.equals(add_ensemble_bands(forecast.copy()))  # seeded: the same bands every refresh
+
+
+def test_members_are_scored_in_one_call_per_step(forecast, monkeypatch):
+    calls = []
+    get_predictor = modeling_utils.get_predictor
+
+    class Recording:
+        def __init__(self, predictor):
+            self.predictor = predictor
+            self.classes_ = predictor.classes_
+
+        def predict(self, X):
+            calls.append(len(X))
+            return self.predictor.predict(X)
+
+        def predict_proba(self, X):
+            calls.append(len(X))
+            return self.predictor.predict_proba(X)
+
+    monkeypatch.setattr(modeling_utils, "get_predictor", lambda model: Recording(get_predictor(model)))
+    add_ensemble_bands(forecast.copy(), members=32)
+
+    assert calls == [32] * 3 * HORIZON
+
+
+def test_plot_draws_the_discharge_band(forecast):
+    fig = plot_and_display_data_predictions(add_ensemble_bands(forecast.copy()))
+
+    band = [trace for trace in fig.data if trace.name == "Predicted Discharge (q10-q90)"]
+    assert len(band) == 1 and band[0].fill == "tonexty" and len(band[0].x) == HORIZON + 1
@@ -0,0 +1,81 @@
+import copy
+import gc
+import weakref
+
+import numpy as np
+import pytest
+
+import fast_inference
+from fast_inference import FastPredictor, get_predictor
+from modeling_utils import flood_features, model_registry, preprocess_data, regression_features
+
+MODELS = [
+    ("rain_model", regression_features),
+    ("discharge_model", regression_features),
+    ("flood_model", flood_features),
+]
+
+
+@pytest.fixture(scope="module")
+def features(history):
+    data = preprocess_data(history)
+    inputs = {}
+    for name, columns in MODELS:
+        X = data[columns].to_numpy(dtype=float)
+        X[::7, 1] = np.nan  # missing values follow the trees' default branches
+        inputs[name] = X
+    return inputs
+
+
+@pytest.mark.parametrize("backend", ["booster", "numpy"])
+@pytest.mark.parametrize("name", [name for name, _ in MODELS])
+def test_predictions_match_shipped_models(features, name, backend):
+    model = model_registry.get(name)
+    predictor = FastPredictor(model, backend)
+    X = features[name]
+
+    # The booster path is bit-exact; the compiled trees only differ in float32 summation order
+    rtol = 0 if backend == "booster" else 1e-5
+    if hasattr(model, "classes_"):
+        np.testing.assert_array_equal(predictor.predict(X), model.predict(X))
+        np.testing.assert_allclose(predictor.predict_proba(X), model.predict_proba(X), rtol=rtol, atol=1e-6)
+    else:
+        np.testing.assert_allclose(predictor.predict(X), model.predict(X), rtol=rtol, atol=1e-4 if rtol else 0)
+
+
+@pytest.mark.parametrize("backend", ["booster", "numpy"])
+def test_single_row(features, backend):
+    model = model_registry.get("discharge_model")
+    row = features["discharge_model"][-1]
+    result = FastPredictor(model, backend).predict(row)
+    assert result.shape == (1,)
+    assert result[0] == pytest.approx(model.predict(row.reshape(1, -1))[0], rel=1e-5)
+
+
+def test_feature_selection_is_folded_in(features):
+    model = model_registry.get("discharge_model")
+
+    class Selector:
+        # Minimal RFE stand-in: two extra columns around the model's inputs
+        support_ = np.array([False] + [True] * len(regression_features) + [False])
+        estimator_ = model
+
+    X = features["discharge_model"]
+    wide = np.column_stack([np.ones(len(X)), X, np.ones(len(X))])
+    expected = model.predict(X)
+    for backend in ["booster", "numpy"]:
+        np.testing.assert_allclose(FastPredictor(Selector(), backend).predict(wide), expected, rtol=1e-5)
+
+
+def test_predictors_are_shared_and_dropped_with_their_model():
+    cached = len(fast_inference._predictors)
+    model = copy.deepcopy(model_registry.get("discharge_model"))  # as a reload of the registry gives
+    predictor = get_predictor(model)
+    assert get_predictor(model) is predictor
+    assert get_predictor(model, "numpy") is not predictor
+
+    alive = weakref.ref(model)
+    del model
+    gc.collect()
+    assert alive() is None
+    assert len(fast_inference._predictors) == cached
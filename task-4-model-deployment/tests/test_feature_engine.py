@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engine import WINDOW_FEATURES, RollingFeatureState, compute_window_features
+from modeling_utils import preprocess_data
+
+
+def pandas_window_features(data):
+    # Reference: one pandas rolling() pass per column, as preprocess_data used to do
+    return {
+        name: (data[source].rolling(window=window, min_periods=1).sum() if how == "sum"
+               else data[source].rolling(window=window, min_periods=1).mean()).to_numpy()
+        for name, source, window, how in WINDOW_FEATURES
+    }
+
+
+@pytest.mark.parametrize("rows", [1, 5, 365, None])
+def test_window_features_match_pandas(history, rows):
+    data = history if rows is None else history.iloc[:rows]
+    expected = pandas_window_features(data)
+    result = compute_window_features(data)
+    for name in expected:
+        np.testing.assert_allclose(result[name], expected[name], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_window_features_skip_missing_values(history):
+    data = history.iloc[:30].copy()
+    data.loc[3:12, "rain_sum (mm)"] = np.nan
+    expected = pandas_window_features(data)
+    result = compute_window_features(data)
+    np.testing.assert_allclose(result["rain_last_3_days"], expected["rain_last_3_days"], equal_nan=True)
+    np.testing.assert_allclose(result["rain_last_7_days"], expected["rain_last_7_days"], equal_nan=True)
+
+
+def test_streaming_state_matches_batch(history):
+    data = history.iloc[:400]
+    expected = compute_window_features(data)
+
+    state = RollingFeatureState.from_frame(data.iloc[:100])
+    for position in range(100, len(data)):
+        features = state.update(data.iloc[position])
+        for name, value in features.items():
+            assert value == pytest.approx(expected[name][position], rel=1e-9), name
+
+
+def test_preprocess_data_leaves_input_untouched(history):
+    data = history.iloc[:30].copy()
+    columns = list(data.columns)
+    result = preprocess_data(data)
+    assert list(data.columns) == columns
+    assert pd.api.types.is_datetime64_any_dtype(result["date"])
+    for name, values in pandas_window_features(data).items():
+        np.testing.assert_allclose(result[name], values)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import forecast_cache
+from forecast_cache import ForecastCache
+
+
+class Counting:
+    """A compute callable that records its calls."""
+
+    def __init__(self, value="forecast"):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(forecast_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_concurrent_misses_compute_once():
+    cache, started, release = ForecastCache(), threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "forecast"
+
+    with ThreadPoolExecutor(8) as pool:
+        first = pool.submit(cache.get_or_compute, "key", compute)
+        started.wait(5)
+        others = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(7)]
+        release.set()
+        results = [first.result()] + [future.result() for future in others]
+
+    assert results == ["forecast"] * 8
+    assert len(calls) == 1 and cache.misses == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache, compute = ForecastCache(ttl=60), Counting()
+    cache.get_or_compute("key", compute)
+    clock[0] += 59
+    cache.get_or_compute("key", compute)
+    assert compute.calls == 1
+
+    clock[0] += 2
+    cache.get_or_compute("key", compute)
+    assert compute.calls == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ForecastCache(maxsize=2)
+    computes = {key: Counting() for key in "abc"}
+    for key in "aba":
+        cache.get_or_compute(key, computes[key])
+    cache.get_or_compute("c", computes["c"])  # evicts b, used before a
+
+    cache.get_or_compute("a", computes["a"])
+    cache.get_or_compute("b", computes["b"])
+    assert (computes["a"].calls, computes["b"].calls) == (1, 2)
+
+
+def test_failed_results_are_not_cached():
+    cache, compute = ForecastCache(), Counting(value=None)
+    assert cache.get_or_compute("key", compute) is None
+    assert cache.get_or_compute("key", compute) is None
+    assert compute.calls == 2
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    ForecastCache(disk_dir=tmp_path).get_or_compute("key", Counting())
+
+    restarted, compute = ForecastCache(disk_dir=tmp_path), Counting()
+    assert restarted.get_or_compute("key", compute) == "forecast"
+    assert compute.calls == 0 and restarted.hits == 1
+
+
+def test_disk_is_pruned_to_the_ttl_and_size(tmp_path):
+    cache = ForecastCache(maxsize=2, ttl=60, disk_dir=tmp_path)
+
+    def age(key, seconds):
+        moment = time.time() - seconds
+        os.utime(cache._disk_path(key), (moment, moment))
+
+    for key, seconds in [("a", 20), ("b", 10)]:
+        cache.get_or_compute(key, Counting())
+        age(key, seconds)
+    cache.get_or_compute("c", Counting())
+    assert sorted(tmp_path.glob("*.pkl")) == sorted([cache._disk_path("b"), cache._disk_path("c")])
+
+    age("b", 120)
+    cache.get_or_compute("d", Counting())
+    assert sorted(tmp_path.glob("*.pkl")) == sorted([cache._disk_path("c"), cache._disk_path("d")])
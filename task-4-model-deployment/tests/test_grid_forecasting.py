@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import data_collection_utils
+from data_collection_utils import DAILY_COLUMNS, HOURLY_COLUMNS, SECONDS_PER_DAY
+from grid_forecasting import BASIN_GAUGES, GRID_VARIABLES, GridData, fetch_grid_data, score_grid
+from locations import grid_points, load_locations
+from meteo_encoding import decode_responses, encode_response
+from modeling_utils import predict_flood
+
+
+def grid_from_history(history, n_cells):
+    """A grid whose cells all see the history of the Karimganj point."""
+    variables = [column if column != "river_discharge" else "Longai_discharge (m³/s)" for column in GRID_VARIABLES]
+    cell = history.reindex(columns=variables).to_numpy(dtype=np.float32)
+    values = np.ascontiguousarray(np.broadcast_to(cell, (n_cells,) + cell.shape))
+    basin = {name: history[name].to_numpy(dtype=np.float32) for name in BASIN_GAUGES}
+    return GridData(np.zeros((n_cells, 2)), pd.to_datetime(history["date"]), values, basin)
+
+
+def test_grid_scores_match_single_point_pipeline(history):
+    window = history.iloc[-400:].reset_index(drop=True)
+    # The grid stores float32: give the single-point pipeline the same inputs
+    numeric = window.columns.drop("date")
+    window[numeric] = window[numeric].astype(np.float32).astype(np.float64)
+    expected = predict_flood(window, backfill=True)
+
+    predictions = score_grid(grid_from_history(window, 3))
+
+    for cell in range(3):
+        np.testing.assert_allclose(predictions["predicted_rain"][cell], expected["predicted_rain"], rtol=1e-5)
+        np.testing.assert_allclose(predictions["predicted_discharge"][cell], expected["predicted_discharge"],
+                                   rtol=1e-5)
+        np.testing.assert_allclose(predictions["proba"][cell], expected["proba"], rtol=1e-4, atol=1e-6)
+        np.testing.assert_array_equal(predictions["flood"][cell], expected["flood"])
+
+
+def test_fetch_grid_data_fills_every_cell_in_chunks(monkeypatch):
+    start = pd.Timestamp("2024-06-01")
+    n_days = 10
+    first_time = start.value // 10**9
+    calls = []
+
+    def fake_fetch(start_date, end_date, fetch_target=False, coords=None):
+        calls.append((fetch_target, len(coords)))
+        payload = b""
+        for latitude, longitude in coords:
+            if fetch_target:
+                daily = (first_time, SECONDS_PER_DAY, [np.full(n_days, latitude)])
+                payload += encode_response(latitude, longitude, daily=daily)
+            else:
+                daily = (first_time, SECONDS_PER_DAY, [np.arange(n_days) + longitude] * len(DAILY_COLUMNS))
+                hourly = (first_time, 3600, [np.full(n_days * 24, 0.5)] * len(HOURLY_COLUMNS))
+                payload += encode_response(latitude, longitude, daily=daily, hourly=hourly)
+        return decode_responses(payload)
+
+    monkeypatch.setattr(data_collection_utils, "fetch_meteo_data", fake_fetch)
+    points = np.array([[24.0 + i, 92.0 + i] for i in range(7)])
+
+    grid = fetch_grid_data(str(start.date()), str((start + pd.Timedelta(days=n_days - 1)).date()),
+                           points, chunk_size=3)
+
+    assert grid.values.shape == (7, n_days, len(GRID_VARIABLES))
+    assert grid.values.dtype == np.float32
+    assert sorted(calls) == sorted([(True, len(BASIN_GAUGES))] + [(False, 3), (True, 3)] * 2 + [(False, 1), (True, 1)])
+    np.testing.assert_allclose(grid["rain_sum (mm)"], np.arange(n_days) + points[:, 1:], rtol=1e-6)
+    np.testing.assert_allclose(grid["river_discharge"], np.broadcast_to(points[:, :1], (7, n_days)), rtol=1e-6)
+    np.testing.assert_allclose(grid["pressure_msl (hPa)"], 0.5)
+    assert set(grid.basin) == set(BASIN_GAUGES)
+
+
+def test_grid_points_cover_the_bounding_box():
+    spec = load_locations()["grids"]["karimganj_district"]
+    points = grid_points("karimganj_district")
+
+    assert points[:, 0].min() == spec["lat_min"] and points[:, 0].max() == spec["lat_max"]
+    assert points[:, 1].min() == spec["lon_min"] and points[:, 1].max() == spec["lon_max"]
+    assert len(np.unique(points, axis=0)) == len(points)
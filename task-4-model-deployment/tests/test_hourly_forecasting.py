@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+import data_collection_utils
+from data_collection_utils import HOURLY_COLUMNS, HOURLY_EXTRA_COLUMNS, SECONDS_PER_DAY
+from hourly_forecasting import (GAUGES, HOURLY_VARIABLES, HourlyBuffer, HourlyForecaster, hourly_features,
+                                score_hours)
+from meteo_encoding import decode_responses, encode_response
+from modeling_utils import predict_flood
+
+
+def hourly_block(window):
+    """Hours whose 24-hour aggregates are exactly the daily values of `window`."""
+    rain = np.zeros((len(window), 24))
+    rain[:, 12] = window["rain_sum (mm)"]
+    low, high, mean = (window[column].to_numpy() for column in
+                       ["temperature_2m_min (°C)", "temperature_2m_max (°C)", "temperature_2m_mean (°C)"])
+    temperature = np.repeat(((24 * mean - low - high) / 22)[:, None], 24, axis=1)
+    temperature[:, 3], temperature[:, 15] = low, high
+
+    held = {column: np.repeat(window[column].to_numpy(), 24) for column in list(HOURLY_COLUMNS) + list(GAUGES)}
+    held["rain (mm)"], held["temperature_2m (°C)"] = rain.reshape(-1), temperature.reshape(-1)
+    return np.array([held[column] for column in HOURLY_VARIABLES])
+
+
+def test_scores_at_the_end_of_each_day_match_the_daily_pipeline(history):
+    window = history.iloc[-60:].reset_index(drop=True)
+    # The buffer stores float32: give the daily pipeline the same inputs
+    numeric = window.columns.drop("date")
+    window[numeric] = window[numeric].astype(np.float32).astype(np.float64)
+    expected = predict_flood(window, backfill=True)
+
+    buffer = HourlyBuffer(capacity=len(window) * 24)
+    first_hour = pd.Timestamp(window["date"][0]).value // 10**9 // 3600
+    buffer.write(first_hour + np.arange(len(window) * 24), hourly_block(window), HOURLY_VARIABLES)
+    hours, values = buffer.window()
+    predictions = score_hours(hourly_features(hours, values))
+
+    end_of_day = slice(23, None, 24)
+    for column in ["predicted_rain", "predicted_discharge", "proba"]:
+        np.testing.assert_allclose(predictions[column][end_of_day], expected[column], rtol=1e-6)
+    np.testing.assert_array_equal(predictions["flood"][end_of_day], expected["flood"])
+    assert len(predictions["proba"]) == len(window) * 24
+
+
+def test_buffer_keeps_the_last_hours_in_a_fixed_array():
+    buffer = HourlyBuffer(["a", "b"], capacity=48)
+    buffer.write(np.arange(100, 130), np.vstack([np.arange(30), -np.arange(30)]), ["a", "b"])
+    buffer.write(np.arange(140, 160), np.arange(20)[None, :] + 100, ["a"])
+
+    hours, values = buffer.window()
+
+    np.testing.assert_array_equal(hours, np.arange(112, 160))
+    np.testing.assert_array_equal(values[:18, 0], np.arange(12, 30))  # hours 112-129
+    assert np.isnan(values[18:28]).all()                                # the gap, 130-139
+    np.testing.assert_array_equal(values[28:, 0], np.arange(100, 120))
+    assert np.isnan(values[28:, 1]).all()                               # "b" was not written for those
+    assert buffer.values.shape == (48, 2) and buffer.values.dtype == np.float32
+
+
+def test_refresh_fetches_hourly_variables_and_holds_daily_discharges(monkeypatch):
+    first_time = pd.Timestamp("2024-06-01").value // 10**9
+    n_days = 3
+    calls = []
+
+    def fake_fetch(start_date, end_date, fetch_target=False, coords=None, hourly_extra=False):
+        calls.append((fetch_target, hourly_extra))
+        if fetch_target:
+            payload = b"".join(encode_response(*point, daily=(first_time, SECONDS_PER_DAY, [np.arange(n_days) + i]))
+                               for i, point in enumerate(coords))
+        else:
+            hourly = [np.arange(n_days * 24, dtype=float)] * (len(HOURLY_COLUMNS) + len(HOURLY_EXTRA_COLUMNS))
+            payload = encode_response(24.80, 92.35, hourly=(first_time, 3600, hourly))
+        return decode_responses(payload)
+
+    monkeypatch.setattr(data_collection_utils, "fetch_meteo_data", fake_fetch)
+    forecaster = HourlyForecaster(days=2)
+    assert forecaster.refresh("2024-06-03")
+
+    hours, values = forecaster.buffer.window()
+    assert sorted(calls) == [(False, True), (True, False)]
+    np.testing.assert_array_equal(values[:, HOURLY_VARIABLES.index("rain (mm)")], np.arange(24, 72))
+    np.testing.assert_array_equal(values[:, HOURLY_VARIABLES.index(list(GAUGES)[1])], np.repeat([2, 3], 24))
+    forecast = forecaster.forecast(last_hours=6)
+    assert forecast["time"][-1] == np.datetime64("2024-06-03T23:00:00")
+    assert len(forecast["proba"]) == 6
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import import_report
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 | _io
+import time:       300 |        300 |   json.decoder
+import time:      1765 |     469617 | streamlit
+import time:       400 |        400 |     numpy.core
+import time:       100 |        500 |   numpy
+import time:      2000 |       2500 | pipeline
+import time:        50 |         50 | locations
+"""
+
+
+def test_parse_keeps_the_imports_after_streamlit():
+    entries = import_report.parse_importtime(SAMPLE)
+
+    assert entries == [("numpy.core", 400, 2), ("numpy", 500, 1), ("pipeline", 2500, 0), ("locations", 50, 0)]
+
+
+def test_main_page_does_not_load_the_fetch_or_model_libraries():
+    code = "".join(f"import {module}\n" for module in import_report.page_modules("main"))
+    code += "import sys; print(' '.join(sorted(sys.modules)))"
+    loaded = set(subprocess.run([sys.executable, "-c", code], cwd=import_report.BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.split())
+
+    assert "pipeline" in loaded
+    assert not loaded & {"openmeteo_requests", "requests_cache", "retry_requests", "joblib", "xgboost"}
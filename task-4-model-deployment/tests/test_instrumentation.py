@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import data_collection_utils
+from data_collection_utils import submit_fetch
+from instrumentation import Metrics, pipeline_run, render_metrics, stage
+from openmeteo_stub import StubServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = StubServer().start()
+    monkeypatch.setattr(data_collection_utils, "ARCHIVE_URL", f"{server.url}/v1/archive")
+    monkeypatch.setattr(data_collection_utils, "FLOOD_URL", f"{server.url}/v1/flood")
+    monkeypatch.setattr(data_collection_utils, "HTTP_CACHE", False)
+    yield server
+    server.stop()
+
+
+def test_pool_fetches_are_attributed_to_the_submitting_run(server):
+    with pipeline_run("forecast") as run:
+        futures = [submit_fetch("2020-06-01", "2020-06-10"),
+                   submit_fetch("2020-06-01", "2020-06-10", fetch_target=True)]
+        assert all(future.result() is not None for future in futures)
+    with pipeline_run("other") as other:
+        pass
+
+    assert [entry["stage"] for entry in run.stages] == ["network", "network"]
+    assert run.counters["http_cache_misses"] == 2
+    assert other.stages == [] and not other.counters
+    assert 'flood_stage_seconds_count{stage="network"}' in render_metrics()  # process-wide too
+
+
+def test_concurrent_runs_keep_their_own_stages():
+    runs, ready = {}, threading.Barrier(2)
+
+    def work(name):
+        with pipeline_run(name) as run:
+            ready.wait(5)  # both runs are open at the same time
+            with stage(f"{name}_stage", rows=3):
+                pass
+        runs[name] = run
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ["first", "second"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, run in runs.items():
+        assert run.stages == [{"stage": f"{name}_stage", "seconds": run.stages[0]["seconds"], "rows": 3}]
+
+
+def test_render_lists_every_stage_and_event():
+    metrics = Metrics()
+    metrics.observe("decode", 0.5, rows=10)
+    metrics.observe("decode", 1.5)
+    metrics.observe("network", 0.25)
+    metrics.increment("http_retries", 2)
+
+    assert metrics.render().splitlines() == [
+        "# HELP flood_stage_seconds Wall time spent in each pipeline stage.",
+        "# TYPE flood_stage_seconds summary",
+        'flood_stage_seconds_sum{stage="decode"} 2.000000',
+        'flood_stage_seconds_count{stage="decode"} 2',
+        'flood_stage_seconds_sum{stage="network"} 0.250000',
+        'flood_stage_seconds_count{stage="network"} 1',
+        "# HELP flood_stage_max_seconds Slowest call of each stage.",
+        "# TYPE flood_stage_max_seconds gauge",
+        'flood_stage_max_seconds{stage="decode"} 1.500000',
+        'flood_stage_max_seconds{stage="network"} 0.250000',
+        "# HELP flood_stage_rows_total Rows processed by each stage.",
+        "# TYPE flood_stage_rows_total counter",
+        'flood_stage_rows_total{stage="decode"} 10',
+        "# HELP flood_events_total Cache hits and misses, retries and other events.",
+        "# TYPE flood_events_total counter",
+        'flood_events_total{event="http_retries"} 2',
+    ]
@@ -0,0 +1,34 @@
+import os
+
+import joblib
+import numpy as np
+
+from model_registry import ModelRegistry
+
+
+def make_registry(tmp_path, weights):
+    joblib.dump({"weights": np.asarray(weights)}, tmp_path / "model.joblib")
+    return ModelRegistry(tmp_path, {"model": "model.joblib"}, check_interval=0)
+
+
+def test_touched_files_are_not_reloaded(tmp_path):
+    registry = make_registry(tmp_path, [1.0, 2.0])
+    model, version = registry.get("model"), registry.version()
+
+    stat = os.stat(tmp_path / "model.joblib")
+    os.utime(tmp_path / "model.joblib", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert registry.get("model") is model
+    joblib.dump({"weights": np.asarray([1.0, 2.0])}, tmp_path / "model.joblib")  # same content, new file
+    assert registry.get("model") is model
+    assert registry.version() == version
+
+
+def test_changed_files_are_reloaded(tmp_path):
+    registry = make_registry(tmp_path, [1.0, 2.0])
+    model, version = registry.get("model"), registry.version()
+
+    joblib.dump({"weights": np.asarray([3.0, 4.0])}, tmp_path / "model.joblib")
+    reloaded = registry.get("model")
+    assert reloaded is not model
+    np.testing.assert_array_equal(reloaded["weights"], [3.0, 4.0])
+    assert registry.version() != version
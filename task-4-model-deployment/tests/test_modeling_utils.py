@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engine import WINDOW_FEATURES
+from modeling_utils import derived_features, predict_flood, preprocess_data, recursive_inputs
+
+PREDICTIONS = ["predicted_rain", "predicted_discharge", "flood", "proba"]
+
+
+@pytest.fixture(scope="module")
+def window(history):
+    return history.iloc[-60:].reset_index(drop=True)
+
+
+def test_horizon_appends_forecast_days(window):
+    result = predict_flood(window, horizon=4)
+
+    assert len(result) == len(window) + 3
+    assert not result["forecast"].iloc[:len(window)].any()
+    assert result["forecast"].iloc[len(window):].all()
+    expected_dates = pd.date_range(pd.Timestamp(window["date"].iloc[-1]) + pd.Timedelta(days=1), periods=3)
+    assert list(result["date"].iloc[len(window):]) == list(expected_dates)
+    # The last observed day and every forecast day are scored
+    assert result[PREDICTIONS].iloc[len(window) - 1:].notna().all().all()
+
+
+def test_forecast_days_take_the_predictions_as_observations(window):
+    result = predict_flood(window, horizon=6)
+    forecast = result["forecast"].to_numpy()
+
+    previous = result.shift(1)[forecast]
+    for prediction, columns in recursive_inputs.items():
+        for col in columns:
+            np.testing.assert_allclose(result.loc[forecast, col], previous[prediction])
+
+    # The streamed rolling features equal a full recompute over the extended frame
+    recomputed = preprocess_data(result.drop(columns=sorted(derived_features)))
+    for name in [name for name, _, _, _ in WINDOW_FEATURES] + ["rain_soil_interaction", "rivers_interaction"]:
+        np.testing.assert_allclose(result.loc[forecast, name].astype(float),
+                                   recomputed.loc[forecast, name].astype(float), rtol=1e-6, err_msg=name)
+
+
+def test_backfill_matches_scoring_each_day(window):
+    days = window.iloc[-15:].reset_index(drop=True)
+    backfilled = predict_flood(days, backfill=True)
+
+    for i in range(len(days)):
+        # Scoring the window up to day i only scores day i
+        expected = predict_flood(days.iloc[:i + 1]).iloc[-1]
+        np.testing.assert_allclose(backfilled.loc[i, PREDICTIONS].astype(float),
+                                   expected[PREDICTIONS].astype(float), rtol=1e-5, err_msg=str(i))
@@ -0,0 +1,62 @@
+import numpy as np
+import openmeteo_requests
+import pandas as pd
+import pytest
+import requests
+
+from data_collection_utils import get_features_from_response, get_target_from_response
+from openmeteo_stub import StubServer
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = StubServer(seed=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client():
+    return openmeteo_requests.Client(session=requests.Session())
+
+
+def test_stub_replays_the_history(server, client, history):
+    params = {
+        "latitude": [24.80], "longitude": [92.35], "start_date": "2020-06-01", "end_date": "2020-06-30",
+        "hourly": ["pressure_msl", "soil_moisture_0_to_7cm", "soil_moisture_7_to_28cm",
+                   "soil_moisture_28_to_100cm", "soil_moisture_100_to_255cm"],
+        "daily": ["precipitation_sum", "wind_speed_10m_max", "wind_direction_10m_dominant",
+                  "et0_fao_evapotranspiration", "wind_gusts_10m_max", "temperature_2m_max",
+                  "temperature_2m_min", "temperature_2m_mean", "rain_sum"],
+    }
+    features = get_features_from_response(client.weather_api(f"{server.url}/v1/archive", params=params))
+
+    flood_params = {"latitude": [24.80, 24.6266], "longitude": [92.35, 91.7782], "daily": "river_discharge",
+                    "start_date": "2020-06-01", "end_date": "2020-06-30"}
+    flood_responses = client.weather_api(f"{server.url}/v1/flood", params=flood_params)
+    longai = get_target_from_response(flood_responses, "Longai_discharge (m³/s)", index=0)
+    kushi = get_target_from_response(flood_responses, "Kushi_discharge (m³/s)", index=1)
+
+    expected = history.assign(date=pd.to_datetime(history["date"]))
+    merged = features.merge(longai, on="date").merge(kushi, on="date").merge(expected, on="date", suffixes=("", "_csv"))
+    assert len(merged) == 30
+    for column in ["rain_sum (mm)", "pressure_msl (hPa)", "soil_moisture_100_to_255cm (m³/m³)",
+                   "Longai_discharge (m³/s)", "Kushi_discharge (m³/s)"]:
+        np.testing.assert_allclose(merged[column], merged[f"{column}_csv"], rtol=1e-5, atol=1e-3)
+
+
+def test_stub_rejects_unknown_variables(server, client):
+    params = {"latitude": 24.8, "longitude": 92.35, "start_date": "2020-06-01", "end_date": "2020-06-02",
+              "daily": ["not_a_variable"]}
+    with pytest.raises(openmeteo_requests.OpenMeteoRequestsError, match="not_a_variable"):
+        client.weather_api(f"{server.url}/v1/archive", params=params)
+
+
+def test_stub_injects_failures():
+    server = StubServer(failure_rate=1.0, error_status=503).start()
+    try:
+        response = requests.get(f"{server.url}/v1/flood", params={"latitude": 24.8, "longitude": 92.35})
+        assert response.status_code == 503
+        assert server.requests == 1
+    finally:
+        server.stop()
@@ -0,0 +1,107 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import refresh_scheduler
+from refresh_scheduler import RefreshScheduler, forecast_window, publish_snapshot, snapshot_window
+
+
+def publish(snapshot_dir, end_date, age):
+    generated_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=age)
+    publish_snapshot(pd.DataFrame({"date": [pd.Timestamp(end_date)], "forecast": [False]}),
+                     {"start_date": str(end_date), "end_date": str(end_date), "horizon": 7,
+                      "generated_at": generated_at.isoformat()}, snapshot_dir)
+
+
+def test_first_refresh_waits_while_todays_snapshot_is_fresh(tmp_path):
+    scheduler = RefreshScheduler(interval=3600, snapshot_dir=tmp_path)
+    assert scheduler.first_delay() == 0  # nothing to serve yet
+
+    today = datetime.date.today()
+    publish(tmp_path, today, age=600)
+    assert 2990 < scheduler.first_delay() <= 3000
+
+    publish(tmp_path, today, age=7200)
+    assert scheduler.first_delay() == 0
+
+    publish(tmp_path, today - datetime.timedelta(days=1), age=60)
+    assert scheduler.first_delay() == 0
+
+
+def snapshot(end_date, horizon=3):
+    dates = pd.date_range(end=end_date, periods=5).append(pd.date_range(end_date + datetime.timedelta(days=1),
+                                                                          periods=horizon - 1))
+    data = pd.DataFrame({"date": dates, "forecast": [False] * 5 + [True] * (horizon - 1)})
+    return {"meta": {"start_date": str(dates[0].date()), "end_date": str(end_date), "horizon": horizon},
+            "data": data}
+
+
+def test_snapshot_window_cuts_the_requested_days():
+    end_date = datetime.date(2025, 6, 10)
+    window = snapshot_window(snapshot(end_date), end_date - datetime.timedelta(days=2), end_date, 2)
+
+    assert list(window["date"].dt.day) == [8, 9, 10, 11]
+    assert list(window["forecast"]) == [False, False, False, True]
+
+
+def test_snapshot_window_misses_what_it_does_not_cover():
+    end_date = datetime.date(2025, 6, 10)
+    assert snapshot_window(None, end_date, end_date, 1) is None
+    assert snapshot_window(snapshot(end_date), end_date, end_date - datetime.timedelta(days=1), 1) is None
+    assert snapshot_window(snapshot(end_date), end_date - datetime.timedelta(days=9), end_date, 1) is None
+    assert snapshot_window(snapshot(end_date), end_date, end_date, 4) is None
+
+
+def test_cold_start_falls_back_to_the_forecast_cache(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(refresh_scheduler, "cached_forecast", lambda *args: calls.append(args) or "computed")
+
+    today = datetime.date.today()
+    assert forecast_window(today, today, 1, snapshot_dir=tmp_path) == "computed"
+    assert calls == [(today, today, 1)]
+
+    publish(tmp_path, today, age=60)
+    assert len(forecast_window(today, today, 1, snapshot_dir=tmp_path)) == 1
+    assert len(calls) == 1
+
+
+def test_uncovered_windows_are_served_stale_and_computed_in_the_background(tmp_path, monkeypatch):
+    end_date = datetime.date.today()
+    published = snapshot(end_date)
+    publish_snapshot(published["data"], published["meta"], tmp_path)
+    scheduler = RefreshScheduler(snapshot_dir=tmp_path)
+    computed = pd.DataFrame({"date": pd.date_range("2024-06-01", "2024-06-30"), "forecast": False})
+    monkeypatch.setattr(refresh_scheduler, "cached_forecast", lambda *args: pytest.fail("computed in the page"))
+
+    # End date outside the snapshot: its own days only, flagged stale
+    past = forecast_window(datetime.date(2024, 6, 1), datetime.date(2024, 6, 30), 3, tmp_path, scheduler)
+    assert past.attrs["stale"] and len(past) == len(published["data"])
+    # Overlapping windows are clipped to the days the snapshot has
+    longer = forecast_window(end_date - datetime.timedelta(days=60), end_date, 2, tmp_path, scheduler)
+    assert longer.attrs["stale"] and len(longer) == 6
+
+    monkeypatch.setattr(refresh_scheduler, "cached_forecast", lambda *args: computed)
+    scheduler.serve_requests()
+    served = forecast_window(datetime.date(2024, 6, 1), datetime.date(2024, 6, 30), 3, tmp_path, scheduler)
+    assert served.equals(computed) and not served.attrs.get("stale")
+
+
+def test_a_new_day_asks_for_a_refresh(tmp_path, monkeypatch):
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    published = snapshot(yesterday)
+    publish_snapshot(published["data"], published["meta"], tmp_path)
+    scheduler = RefreshScheduler(snapshot_dir=tmp_path)
+    monkeypatch.setattr(refresh_scheduler, "cached_forecast", lambda *args: pytest.fail("computed in the page"))
+
+    data = forecast_window(datetime.date.today() - datetime.timedelta(days=2), datetime.date.today(), 3,
+                           tmp_path, scheduler)
+    assert data.attrs["stale"] and data["date"].max().date() > yesterday  # yesterday's forecast rows
+    assert scheduler._take_refresh_request()
+
+
+def test_refreshes_are_due_right_after_midnight():
+    scheduler = RefreshScheduler(interval=3600)
+    assert scheduler.next_delay(0, now=datetime.datetime(2025, 6, 10, 10, 0)) == 3600
+    assert scheduler.next_delay(1800, now=datetime.datetime(2025, 6, 10, 10, 0)) == 1800
+    assert scheduler.next_delay(0, now=datetime.datetime(2025, 6, 10, 23, 30)) == 1801
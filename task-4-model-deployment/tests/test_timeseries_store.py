@@ -0,0 +1,75 @@
+import datetime
+
+import pandas as pd
+
+from timeseries_store import TimeSeriesStore
+
+COORDS = (24.8, 92.35)
+
+
+def days(start, end, value=0.0):
+    dates = pd.date_range(start, end)
+    return pd.DataFrame({"date": dates, "river_discharge": [value] * len(dates)})
+
+
+def test_missing_ranges_are_the_gaps_between_covered_days(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    assert store.missing_ranges("flood", COORDS, "2020-01-01", "2020-01-31") == [
+        (datetime.date(2020, 1, 1), datetime.date(2020, 1, 31))]
+
+    store.append("flood", COORDS, days("2020-01-05", "2020-01-10"))
+    store.append("flood", COORDS, days("2020-01-20", "2020-01-25"))
+    assert store.missing_ranges("flood", COORDS, "2020-01-01", "2020-01-31") == [
+        (datetime.date(2020, 1, 1), datetime.date(2020, 1, 4)),
+        (datetime.date(2020, 1, 11), datetime.date(2020, 1, 19)),
+        (datetime.date(2020, 1, 26), datetime.date(2020, 1, 31))]
+    assert store.missing_ranges("flood", COORDS, "2020-01-06", "2020-01-09") == []
+    assert store.missing_ranges("archive", COORDS, "2020-01-06", "2020-01-09") == [
+        (datetime.date(2020, 1, 6), datetime.date(2020, 1, 9))]
+
+
+def test_covered_ranges_merge_when_they_touch_or_overlap(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    store.append("flood", COORDS, days("2020-01-01", "2020-01-10"))
+    store.append("flood", COORDS, days("2020-01-11", "2020-01-15"))  # adjacent
+    store.append("flood", COORDS, days("2020-02-01", "2020-02-10"))
+    assert store.covered_ranges("flood", COORDS) == [
+        (datetime.date(2020, 1, 1), datetime.date(2020, 1, 15)),
+        (datetime.date(2020, 2, 1), datetime.date(2020, 2, 10))]
+
+    store.append("flood", COORDS, days("2020-01-12", "2020-02-03"))  # bridges both
+    assert store.covered_ranges("flood", COORDS) == [(datetime.date(2020, 1, 1), datetime.date(2020, 2, 10))]
+
+
+def test_recent_days_are_stored_but_not_covered(tmp_path):
+    store = TimeSeriesStore(tmp_path, finalize_after_days=7)
+    today = datetime.date.today()
+    store.append("flood", COORDS, days(today - datetime.timedelta(days=20), today))
+
+    assert store.covered_ranges("flood", COORDS) == [(today - datetime.timedelta(days=20),
+                                                      today - datetime.timedelta(days=7))]
+    assert len(store.read("flood", COORDS, today - datetime.timedelta(days=20), today)) == 21
+
+
+def test_append_replaces_the_days_it_overlaps(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    store.append("flood", COORDS, days("2020-01-25", "2020-02-05", value=1.0))
+    store.append("flood", COORDS, days("2020-01-30", "2020-02-02", value=2.0))
+
+    data = store.read("flood", COORDS, "2020-01-25", "2020-02-05")
+    assert list(data["date"]) == list(pd.date_range("2020-01-25", "2020-02-05"))
+    assert list(data["river_discharge"]) == [1.0] * 5 + [2.0] * 4 + [1.0] * 3
+    assert store.revision == 2
+
+
+def test_stores_sharing_a_root_merge_their_coverage(tmp_path):
+    # As two processes would: each store appends without seeing the other's writes first
+    first, second = TimeSeriesStore(tmp_path), TimeSeriesStore(tmp_path)
+    first.append("flood", COORDS, days("2020-01-01", "2020-01-10"))
+    second.append("archive", COORDS, days("2020-01-01", "2020-01-10"))
+    second.append("flood", COORDS, days("2020-01-11", "2020-01-20"))
+
+    for store in [first, second, TimeSeriesStore(tmp_path)]:
+        assert store.missing_ranges("flood", COORDS, "2020-01-01", "2020-01-20") == []
+        assert store.missing_ranges("archive", COORDS, "2020-01-01", "2020-01-10") == []
+        assert store.revision == 3
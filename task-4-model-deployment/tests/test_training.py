@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+import modeling_utils
+import training
+from fast_inference import FastPredictor
+from model_registry import ModelRegistry
+from modeling_utils import model_registry, preprocess_data
+
+GRID = {"n_estimators": [20], "max_depth": [3, 4], "learning_rate": [0.1]}
+
+
+@pytest.fixture(scope="module")
+def trained(history, tmp_path_factory):
+    root = tmp_path_factory.mktemp("training")
+    data_path = root / "history.csv"
+    history.iloc[-900:].to_csv(data_path, index=False)
+    version_dir = training.train(data_path, GRID, n_splits=3, workers=2,
+                                 models_dir=root / "models", cache_dir=root / "cache")
+    return root, data_path, version_dir
+
+
+def test_writes_versioned_artifacts_with_metadata(trained, history):
+    _, data_path, version_dir = trained
+    with open(version_dir / "metadata.json", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    assert metadata["version"] == version_dir.name
+    assert metadata["data"]["sha256"] == training.file_hash(data_path)
+    flood = metadata["models"]["flood_model"]
+    assert flood["features"] == training.MODELS["flood_model"]["features"]
+    assert len(flood["search"]) == 2 and len(flood["folds"]) == 3
+    assert flood["cv"]["log_loss"] == min(candidate["log_loss"] for candidate in flood["search"])
+    assert flood["rows"] == 899  # the last day has no next-day target
+
+    # The artifacts load like the shipped ones and run on the fast paths
+    registry = ModelRegistry(version_dir, model_registry.files)
+    data = preprocess_data(history.iloc[-30:])
+    for name, spec in training.MODELS.items():
+        model = registry.get(name)
+        X = data[spec["features"]].to_numpy(dtype=float)
+        expected = model.predict_proba(X) if spec["kind"] == "classification" else model.predict(X)
+        predictor = FastPredictor(model, "numpy")
+        actual = predictor.predict_proba(X) if spec["kind"] == "classification" else predictor.predict(X)
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_fold_matrices_are_reused(trained):
+    root, data_path, _ = trained
+
+    directory = training.fold_cache("rain_model", training.file_hash(data_path), 1, 3, root / "cache",
+                                    data=lambda: pytest.fail("the fold cache was not used"))
+
+    with open(directory / "folds.json", encoding="utf-8") as f:
+        folds = json.load(f)
+    assert folds[-1][1] == 899 and folds[0][0] < folds[1][0] < folds[2][0]
+
+
+def test_promote_replaces_the_served_files(trained, tmp_path):
+    _, _, version_dir = trained
+    training.promote(version_dir, tmp_path)
+
+    for name in training.MODELS:
+        filename = model_registry.files[name]
+        assert (tmp_path / filename).read_bytes() == (version_dir / filename).read_bytes()
+    assert (tmp_path / "metadata.json").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_promoted_classifier_matches_the_shipped_one(trained, history, tmp_path, monkeypatch):
+    _, _, version_dir = trained
+    training.promote(version_dir, tmp_path)
+    shipped = model_registry.get("flood_model")
+    promoted = ModelRegistry(tmp_path, model_registry.files).get("flood_model")
+
+    for param in ("objective", "num_class"):
+        assert promoted.get_params()[param] == shipped.get_params()[param]
+    np.testing.assert_array_equal(promoted.classes_, shipped.classes_)
+    data = preprocess_data(history.iloc[-30:])
+    X = data[training.MODELS["flood_model"]["features"]].to_numpy(dtype=float)
+    assert promoted.predict_proba(X).shape == shipped.predict_proba(X).shape
+
+    # score_features serves it as it serves the shipped one
+    monkeypatch.setattr(modeling_utils, "model_registry", ModelRegistry(tmp_path, model_registry.files))
+    scores = modeling_utils.score_features(data)
+    np.testing.assert_allclose(scores["proba"], promoted.predict_proba(X)[:, 1], rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(scores["flood"], promoted.predict(X))